@@ -1,7 +1,17 @@
+import asyncio
+
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
 
 from backend.app.config import get_settings
+from backend.app.services.cache import cache_stats
+from backend.app.services.circuit_breaker import OPEN, get_endee_breaker
 from backend.app.services.endee_client import get_endee_client
+from backend.app.services.executors import executor_stats
+from backend.app.services.index_alias import get_index_alias
+from backend.app.services.metrics import get_metrics
+from backend.app.services.process import worker_info
+from backend.app.services.startup import get_startup_state
 
 router = APIRouter(tags=["health"])
 
@@ -9,19 +19,47 @@ router = APIRouter(tags=["health"])
 @router.get("/health")
 async def health() -> dict:
     settings = get_settings()
-    client = get_endee_client()
-    try:
-        description = client.describe_index()
-        endee_status = "ok"
-    except Exception:
-        description = {}
+    startup = get_startup_state()
+    breaker = get_endee_breaker()
+    description = {}
+    if breaker.state == OPEN:
+        # Don't wait on a dependency the breaker already knows is down.
         endee_status = "unavailable"
+    else:
+        try:
+            # Client construction and describe() are blocking network calls.
+            client = await asyncio.to_thread(get_endee_client)
+            description = await asyncio.to_thread(client.describe_index)
+            endee_status = "ok"
+        except Exception:
+            endee_status = "unavailable"
 
     return {
         "app": settings.app_name,
+        "status": startup.status,
+        "startup": startup.snapshot(),
         "environment": settings.environment,
-        "endee_index": settings.endee_index_name,
+        "endee_index": get_index_alias().active.name,
+        "index_alias": get_index_alias().snapshot(),
         "endee_status": endee_status,
         "endee_index_stats": description,
+        "worker": worker_info(),
+        "breakers": {"endee": breaker.stats()},
+        "executors": executor_stats(),
+        "caches": cache_stats(),
+        "metrics": get_metrics().snapshot(),
     }
 
+
+@router.get("/health/ready")
+async def ready() -> JSONResponse:
+    """
+    Readiness probe: 200 once the index check and warm-up have finished,
+    503 while the service is still warming.
+    """
+
+    startup = get_startup_state()
+    return JSONResponse(
+        status_code=200 if startup.ready else 503,
+        content={"status": startup.status},
+    )
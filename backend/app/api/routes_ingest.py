@@ -1,47 +1,155 @@
-from typing import List
+from pathlib import Path
+from typing import List, Literal
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 
 from backend.app.config import get_settings
-from backend.app.models.domain import SupportItem, SupportItemType
-from backend.app.models.schemas import IngestItemRequest
-from backend.app.services.embeddings import embed_texts
-from backend.app.services.endee_client import get_endee_client
+from backend.app.models.schemas import IngestItemRequest, IngestJobResponse
+from backend.app.services.circuit_breaker import CircuitOpenError
+from backend.app.services.embeddings import aembed_texts
+from backend.app.services.executors import ExecutorSaturatedError, run_io
+from backend.app.services.ingestion import apply_plan, item_from_payload, plan_items
+from backend.app.services.jobs import IngestJob, get_ingest_job_queue
+from backend.app.services.manifest import get_ingest_manifest
 
 router = APIRouter(prefix="/ingest", tags=["ingest"])
 
 
+def _capacity_exhausted() -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="Ingest capacity exhausted. Retry shortly.",
+        headers={"Retry-After": "1"},
+    )
+
+
+def _endee_unavailable(exc: CircuitOpenError) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="The vector database is unavailable. Retry shortly.",
+        headers={"Retry-After": str(max(1, int(exc.retry_after + 0.999)))},
+    )
+
+
 @router.post("", status_code=201)
 async def ingest_items(items: List[IngestItemRequest]) -> dict:
     settings = get_settings()
     if len(items) > settings.max_ingest_batch_size:
         raise HTTPException(
             status_code=400,
-            detail=f"Batch size exceeds maximum of {settings.max_ingest_batch_size}. Split into smaller batches.",
+            detail=f"Batch size exceeds maximum of {settings.max_ingest_batch_size}. Split into smaller batches or submit a job to /ingest/jobs.",
         )
 
-    domain_items: List[SupportItem] = []
-    texts: List[str] = []
-
-    for payload in items:
-        item = SupportItem(
-            id=payload.id,
-            type=SupportItemType(payload.type),
-            title=payload.title,
-            body=payload.body,
-            product=payload.product,
-            severity=payload.severity,
-            tags=payload.tags,
-            url=payload.url,
-            resolved=payload.resolved,
-            priority=payload.priority,
-        )
-        domain_items.append(item)
-        texts.append(item.to_text())
+    domain_items = [item_from_payload(payload.dict()) for payload in items]
+
+    manifest = get_ingest_manifest()
+    plan = plan_items(domain_items, manifest)
+    try:
+        vectors = await aembed_texts([item.to_text() for item in plan.embed])
+        await run_io("endee_upsert", apply_plan, plan, vectors, manifest)
+    except ExecutorSaturatedError as exc:
+        raise _capacity_exhausted() from exc
+    except CircuitOpenError as exc:
+        raise _endee_unavailable(exc) from exc
+
+    return {
+        "ingested": len(domain_items),
+        "embedded": len(plan.embed),
+        "metadata_updated": len(plan.metadata) + len(plan.filters),
+        "unchanged": len(plan.unchanged),
+    }
+
+
+def _job_response(job: IngestJob) -> IngestJobResponse:
+    return IngestJobResponse(
+        job_id=job.id,
+        status=job.status,
+        source=job.source,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        total=job.total,
+        processed=job.processed,
+        embedded=job.embedded,
+        metadata_updated=job.metadata_updated,
+        unchanged=job.unchanged,
+        failed_items=job.failed_items,
+        items_per_second=round(job.items_per_second, 2),
+        errors=job.errors,
+        error=job.error,
+    )
+
+
+async def _spool_body(request: Request, path: Path) -> None:
+    """
+    Stream the raw request body to `path` chunk by chunk, so payloads larger
+    than memory are fine; at most `max_ingest_upload_mb`.
+    """
+
+    settings = get_settings()
+    limit = settings.max_ingest_upload_mb * 1024 * 1024
+    size = 0
+    try:
+        with path.open("wb") as f:
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > limit:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"Upload exceeds {settings.max_ingest_upload_mb} MB.",
+                    )
+                await run_io("ingest_spool", f.write, chunk)
+    except ExecutorSaturatedError as exc:
+        path.unlink(missing_ok=True)
+        raise _capacity_exhausted() from exc
+    except HTTPException:
+        path.unlink(missing_ok=True)
+        raise
+    if not size:
+        path.unlink(missing_ok=True)
+        raise HTTPException(status_code=400, detail="Empty upload.")
+
+
+@router.post("/jobs", status_code=202, response_model=IngestJobResponse)
+async def submit_ingest_job(request: Request) -> IngestJobResponse:
+    """
+    Queue any number of items (the /ingest payload: a JSON array, or one
+    JSON object per line) for background ingestion and return the job; poll
+    GET /ingest/jobs/{job_id} for progress. The body is streamed to disk and
+    each item is validated when the job runs; invalid ones are reported in
+    the job's `errors`.
+    """
+
+    queue = get_ingest_job_queue()
+    job_id = queue.new_job_id()
+    await _spool_body(request, queue.spool_path(job_id, "items"))
+    return _job_response(queue.submit(job_id, "items"))
+
+
+@router.post("/jobs/upload", status_code=202, response_model=IngestJobResponse)
+async def upload_ingest_job(
+    request: Request, format: Literal["tickets", "faqs", "runbooks"]
+) -> IngestJobResponse:
+    """
+    Queue an uploaded file, sent as the raw request body, in the format of
+    data/tickets.csv (`format=tickets`), data/faqs.json or data/runbooks.json.
+    The body is streamed to disk, so files larger than memory are fine.
+    """
+
+    queue = get_ingest_job_queue()
+    job_id = queue.new_job_id()
+    await _spool_body(request, queue.spool_path(job_id, format))
+    return _job_response(queue.submit(job_id, format))
+
 
-    vectors = embed_texts(texts)
-    client = get_endee_client()
-    client.upsert_support_items(domain_items, vectors)
+@router.get("/jobs", response_model=List[IngestJobResponse])
+async def list_ingest_jobs(limit: int = 20) -> List[IngestJobResponse]:
+    return [_job_response(job) for job in get_ingest_job_queue().list(min(max(limit, 1), 100))]
 
-    return {"ingested": len(domain_items)}
 
+@router.get("/jobs/{job_id}", response_model=IngestJobResponse)
+async def get_ingest_job(job_id: str) -> IngestJobResponse:
+    job = get_ingest_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown ingest job '{job_id}'.")
+    return _job_response(job)
@@ -0,0 +1,90 @@
+from typing import List
+
+from fastapi import APIRouter, HTTPException
+from loguru import logger
+
+from backend.app.config import get_settings
+from backend.app.models.schemas import ItemDeleteRequest, ItemUpdateRequest
+from backend.app.services.circuit_breaker import CircuitOpenError
+from backend.app.services.executors import ExecutorSaturatedError, run_io
+from backend.app.services.ingestion import delete_items, delete_items_by_filter, update_items
+from backend.app.services.manifest import get_ingest_manifest
+from backend.app.services.search import build_filter_clauses
+
+router = APIRouter(prefix="/items", tags=["items"])
+
+
+def _write_error(exc: Exception) -> HTTPException:
+    if isinstance(exc, ExecutorSaturatedError):
+        return HTTPException(
+            status_code=429,
+            detail="Ingest capacity exhausted. Retry shortly.",
+            headers={"Retry-After": "1"},
+        )
+    if isinstance(exc, CircuitOpenError):
+        return HTTPException(
+            status_code=503,
+            detail="The vector database is unavailable. Retry shortly.",
+            headers={"Retry-After": str(max(1, int(exc.retry_after + 0.999)))},
+        )
+    if isinstance(exc, ValueError):
+        return HTTPException(status_code=400, detail=str(exc))
+    logger.opt(exception=exc).error("Item write failed: {}", exc)
+    return HTTPException(status_code=503, detail="Write failed. Check backend logs.")
+
+
+def _check_batch(size: int) -> None:
+    limit = get_settings().max_ingest_batch_size
+    if size > limit:
+        raise HTTPException(status_code=400, detail=f"At most {limit} items per request.")
+
+
+async def _write(fn, *args):
+    try:
+        result = await run_io("item_write", fn, *args, get_ingest_manifest())
+    except Exception as exc:
+        raise _write_error(exc) from exc
+    return result
+
+
+@router.patch("")
+async def patch_items(updates: List[ItemUpdateRequest]) -> dict:
+    """
+    Change metadata and filter fields (e.g. `resolved`, `priority`) of
+    indexed items without re-embedding them.
+    """
+
+    _check_batch(len(updates))
+    patches = {}
+    for update in updates:
+        fields = update.dict(exclude_unset=True)
+        fields.pop("id")
+        patches[update.id] = fields
+    updated = await _write(update_items, patches)
+    found = {item.parent_id or item.id for item in updated}
+    return {"updated": len(found), "missing": [i for i in patches if i not in found]}
+
+
+@router.delete("/{item_id}")
+async def delete_item(item_id: str) -> dict:
+    deleted = await _write(delete_items, [item_id])
+    if not deleted:
+        raise HTTPException(status_code=404, detail=f"Item '{item_id}' not found.")
+    return {"deleted": deleted}
+
+
+@router.post("/delete")
+async def delete_items_route(request: ItemDeleteRequest) -> dict:
+    """
+    Delete items by id (chunks included) or every item matching `filters`.
+    """
+
+    if bool(request.ids) == bool(request.filters):
+        raise HTTPException(status_code=400, detail="Give either ids or filters.")
+    if request.ids:
+        _check_batch(len(request.ids))
+        return {"deleted": await _write(delete_items, request.ids)}
+    filters = build_filter_clauses(request.filters)
+    if not filters:
+        raise HTTPException(status_code=400, detail="Filters must restrict at least one field.")
+    return {"deleted": await _write(delete_items_by_filter, filters)}
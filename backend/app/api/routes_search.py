@@ -1,44 +1,64 @@
+import json
 import time
+from typing import List, Optional
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 
 from loguru import logger
 
 from backend.app.config import get_settings
-from backend.app.models.schemas import SearchRequest, SearchResponse, SearchResultItemSchema
-from backend.app.services.answer import generate_answer, is_llm_enabled
-from backend.app.services.search import search_support_knowledge
+from backend.app.models.domain import SearchResultItem
+from backend.app.models.schemas import (
+    SearchBatchItem,
+    SearchBatchRequest,
+    SearchBatchResponse,
+    SearchRequest,
+    SearchResponse,
+    SearchResultItemSchema,
+)
+from backend.app.services.answer import agenerate_answer, astream_answer, is_llm_enabled
+from backend.app.services.circuit_breaker import CircuitOpenError
+from backend.app.services.executors import ExecutorSaturatedError
+from backend.app.services.metrics import get_metrics
+from backend.app.services.search import asearch_batch, asearch_support_knowledge
 
 router = APIRouter(prefix="/search", tags=["search"])
 
 
-@router.post("", response_model=SearchResponse)
-async def search_support(request: SearchRequest) -> SearchResponse:
-    settings = get_settings()
-    top_k = min(request.top_k, settings.max_top_k)
-    copy_fn = getattr(request, "model_copy", request.copy)
-    request_capped = copy_fn(update={"top_k": top_k})
-    filters_repr = None
-    if request.filters:
-        filters_repr = getattr(request.filters, "model_dump", request.filters.dict)()
-    start = time.perf_counter()
-    try:
-        results = search_support_knowledge(request_capped)
-    except Exception as exc:
-        logger.exception("Search failed: %s", exc)
-        raise HTTPException(
+def _search_error(exc: Exception) -> HTTPException:
+    """
+    Map a search failure to the HTTP error /search answers with.
+    """
+
+    if isinstance(exc, ExecutorSaturatedError):
+        return HTTPException(
+            status_code=429,
+            detail="Search capacity exhausted. Retry shortly.",
+            headers={"Retry-After": "1"},
+        )
+    if isinstance(exc, CircuitOpenError):
+        return HTTPException(
             status_code=503,
-            detail="Search failed. The vector database may be unavailable. Check backend logs.",
-        ) from exc
-    elapsed_ms = (time.perf_counter() - start) * 1000
-    logger.info(
-        "search query_len=%s top_k=%s filters=%s latency_ms=%.1f",
-        len(request.query),
-        top_k,
-        filters_repr,
-        elapsed_ms,
+            detail="The vector database is unavailable. Retry shortly.",
+            headers={"Retry-After": str(max(1, int(exc.retry_after + 0.999)))},
+        )
+    logger.opt(exception=exc).error("Search failed: {}", exc)
+    return HTTPException(
+        status_code=503,
+        detail="Search failed. The vector database may be unavailable. Check backend logs.",
     )
 
+
+def _cap_top_k(request: SearchRequest) -> SearchRequest:
+    top_k = min(request.top_k, get_settings().max_top_k)
+    copy_fn = getattr(request, "model_copy", request.copy)
+    return copy_fn(update={"top_k": top_k})
+
+
+def _build_response(
+    request: SearchRequest, results: List[SearchResultItem], llm_answer: Optional[str] = None
+) -> SearchResponse:
     tickets = []
     faqs = []
     runbooks = []
@@ -62,15 +82,123 @@ async def search_support(request: SearchRequest) -> SearchResponse:
         elif item.type.value == "runbook":
             runbooks.append(schema)
 
-    llm_answer = None
-    if request.generate_answer and is_llm_enabled():
-        llm_answer = generate_answer(request.query, results)
-
+    top_k = request.top_k
     return SearchResponse(
         query=request.query,
         tickets=tickets[:top_k],
         faqs=faqs[:top_k],
         runbooks=runbooks[:top_k],
         llm_answer=llm_answer,
+        degraded=any(item.stale for item in results),
     )
 
+
+@router.post("", response_model=SearchResponse)
+async def search_support(request: SearchRequest) -> SearchResponse:
+    request_capped = _cap_top_k(request)
+    filters_repr = None
+    if request.filters:
+        filters_repr = getattr(request.filters, "model_dump", request.filters.dict)()
+    start = time.perf_counter()
+    try:
+        results = await asearch_support_knowledge(request_capped)
+    except Exception as exc:
+        raise _search_error(exc) from exc
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    get_metrics().observe("request.search", elapsed_ms)
+    logger.info(
+        "search query_len={} top_k={} filters={} latency_ms={:.1f}",
+        len(request.query),
+        request_capped.top_k,
+        filters_repr,
+        elapsed_ms,
+    )
+
+    llm_answer = None
+    if request.generate_answer and is_llm_enabled():
+        llm_answer = await agenerate_answer(request.query, results)
+
+    return _build_response(request_capped, results, llm_answer)
+
+
+def _sse(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+@router.post("/stream")
+async def search_stream(request: SearchRequest) -> StreamingResponse:
+    """
+    Streaming variant of /search as server-sent events: a `results` event
+    with the ticket/faq/runbook buckets as soon as retrieval is done, then
+    `token` events as the suggested reply is generated, an `answer` event
+    with the full reply, and `done`. Retrieval errors are returned as plain
+    HTTP errors before the stream starts.
+    """
+
+    request_capped = _cap_top_k(request)
+    start = time.perf_counter()
+    try:
+        results = await asearch_support_knowledge(request_capped)
+    except Exception as exc:
+        raise _search_error(exc) from exc
+    get_metrics().observe("request.search_stream.results", (time.perf_counter() - start) * 1000)
+
+    async def events():
+        yield _sse("results", _build_response(request_capped, results).json())
+        if request.generate_answer and is_llm_enabled():
+            parts = []
+            try:
+                async for token in astream_answer(request.query, results):
+                    parts.append(token)
+                    yield _sse("token", json.dumps({"text": token}))
+            except Exception as exc:
+                logger.warning(f"Answer stream failed: {exc!r}")
+                yield _sse("error", json.dumps({"detail": "Answer generation failed."}))
+            yield _sse("answer", json.dumps({"llm_answer": "".join(parts) or None}))
+        get_metrics().observe("request.search_stream", (time.perf_counter() - start) * 1000)
+        yield _sse("done", "{}")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/batch", response_model=SearchBatchResponse)
+async def search_batch(batch: SearchBatchRequest) -> SearchBatchResponse:
+    """
+    Run many searches in one call: queries are embedded together and searched
+    concurrently. Each entry carries its own status, so one failed search
+    does not fail the batch. No answers are generated.
+    """
+
+    settings = get_settings()
+    if len(batch.requests) > settings.max_search_batch_size:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch size exceeds maximum of {settings.max_search_batch_size}. Split into smaller batches.",
+        )
+    requests = [_cap_top_k(request) for request in batch.requests]
+    start = time.perf_counter()
+    try:
+        outcomes = await asearch_batch(requests)
+    except Exception as exc:
+        raise _search_error(exc) from exc
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    metrics = get_metrics()
+    metrics.observe("request.search_batch", elapsed_ms)
+    metrics.observe_value("search.batch_size", len(requests))
+
+    items = []
+    for request, outcome in zip(requests, outcomes):
+        if isinstance(outcome, Exception):
+            error = _search_error(outcome)
+            items.append(SearchBatchItem(status=error.status_code, error=error.detail))
+        else:
+            items.append(SearchBatchItem(status=200, response=_build_response(request, outcome)))
+    failed = sum(1 for item in items if item.status != 200)
+    logger.info(
+        "search_batch size={} failed={} latency_ms={:.1f}", len(requests), failed, elapsed_ms
+    )
+    return SearchBatchResponse(results=items)
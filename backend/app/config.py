@@ -23,15 +23,161 @@ class Settings(BaseSettings):
         "support_knowledge",
         description="Primary Endee index name for support content",
     )
+    endee_index_precision: str = Field(
+        "int8d", description="Precision of newly created Endee indexes (binary, int8d, int16d, float16, float32)."
+    )
+    index_alias_path: str = Field(
+        ".cache/index_alias.json",
+        description=(
+            "File pointing the index name at the versioned index (and model) that reads and writes "
+            "use, switched by scripts.rebuild_index; empty always uses endee_index_name."
+        ),
+    )
+    index_alias_refresh_seconds: float = Field(
+        2.0, description="How often each process checks the index alias file for a switch."
+    )
+    rebuild_min_recall: float = Field(
+        0.8,
+        description="Mean recall@k on data/evaluation_queries.json a rebuilt index needs before the alias switches to it.",
+    )
+    rebuild_max_recall_drop: float = Field(
+        0.05, description="Largest drop in mean recall@k versus the active index a rebuild may show."
+    )
+    rebuild_recall_k: int = Field(5, description="k of the recall@k check of rebuilt indexes.")
+
+    vector_backend: str = Field(
+        "endee",
+        description="'endee': the Endee server; 'local': in-process index persisted under local_index_dir.",
+    )
+    local_index_dir: str = Field(
+        ".cache/local_index", description="Directory of the in-process vector index."
+    )
+    local_index_precision: str = Field(
+        "int8", description="Storage precision of the in-process index (int8 or float32)."
+    )
+    endee_transport: str = Field(
+        "http",
+        description="Query path to Endee: 'http' (pooled async client) or 'sdk' (Endee SDK on the I/O executor).",
+    )
+    endee_max_in_flight: int = Field(
+        32, description="Max concurrent HTTP calls to Endee per worker; further calls wait."
+    )
+    endee_max_connections: int = Field(64, description="Max pooled keep-alive connections to Endee.")
+    endee_http2: bool = Field(False, description="Use HTTP/2 to Endee (requires the 'h2' package).")
+    endee_connect_timeout_seconds: float = Field(1.0, description="Connect timeout for Endee calls.")
+    endee_query_timeout_seconds: float = Field(2.0, description="Per-call timeout for Endee queries.")
+    endee_max_retries: int = Field(
+        2, description="Retries of transient Endee failures (connection errors, 429/502/503/504)."
+    )
+    endee_retry_backoff_ms: float = Field(
+        50, description="Base of the jittered exponential backoff between Endee retries."
+    )
+    endee_breaker_failure_threshold: int = Field(
+        5, description="Consecutive Endee failures that open the circuit breaker."
+    )
+    endee_breaker_reset_seconds: float = Field(
+        10.0, description="How long an open breaker fails fast before letting a probe through."
+    )
+    fallback_cache_size: int = Field(
+        512,
+        description="Last-known results kept per query to serve while Endee is unavailable; 0 disables.",
+    )
+    fallback_cache_ttl_seconds: float = Field(
+        86400, description="How old last-known results served in degraded mode may be."
+    )
 
     embedding_model_name: str = Field(
         "sentence-transformers/all-MiniLM-L6-v2",
         description="HuggingFace / sentence-transformers model name",
     )
 
+    embedding_backend: str = Field(
+        "torch",
+        description="'torch': sentence-transformers on PyTorch; 'onnx': ONNX Runtime export of the same model (needs onnxruntime and onnx).",
+    )
+    embedding_onnx_dir: str = Field(
+        ".cache/onnx", description="Directory of ONNX exports, created on first use per model."
+    )
+    embedding_onnx_quantize: bool = Field(
+        False, description="Run the ONNX export with dynamically int8-quantised weights."
+    )
+    embedding_threads: int = Field(
+        0,
+        description="Intra-op threads of the embedding backend; 0 keeps PyTorch's setting (all cores, or a per-worker share under the prefork server).",
+    )
+    embedding_dimension: Optional[int] = Field(
+        None,
+        description="Embedding dimension of the model; avoids loading the model to probe it at startup.",
+    )
+    model_manifest_path: str = Field(
+        ".cache/model_manifest.json",
+        description="File caching the dimension of each model once loaded; empty disables.",
+    )
+    startup_mode: str = Field(
+        "background",
+        description="'background': accept traffic while the index check and warm-up run; 'blocking': finish them first.",
+    )
+    warm_model_on_startup: bool = Field(
+        True, description="Load the embedding model and encode a small batch during startup."
+    )
+
+    embedding_batch_window_ms: float = Field(
+        3.0,
+        description="How long concurrent query embeds are coalesced before one encode; 0 disables batching.",
+    )
+    embedding_max_batch: int = Field(
+        32, description="Max queries per coalesced encode; a full batch is flushed immediately."
+    )
+
+    embedding_store_dir: str = Field(
+        ".cache/embeddings",
+        description="Directory of the persistent (model, text hash) embedding store; empty disables.",
+    )
+    embedding_store_dtype: str = Field(
+        "float32", description="Storage dtype of the embedding store matrix (float32 or float16)."
+    )
+    embedding_cache_size: int = Field(
+        2048, description="Max cached query embeddings (normalised query -> vector); 0 disables."
+    )
+    embedding_cache_ttl_seconds: float = Field(3600, description="TTL for cached query embeddings.")
+    result_cache_size: int = Field(
+        1024, description="Max cached search result lists; 0 disables."
+    )
+    result_cache_ttl_seconds: float = Field(
+        300, description="TTL for cached search results; entries are also dropped on every upsert."
+    )
+    cache_invalidation_path: str = Field(
+        ".cache/cache_invalidation.sqlite",
+        description=(
+            "SQLite log through which processes sharing it (prefork workers, ingest jobs, scripts) "
+            "invalidate each other's result and answer caches; empty keeps invalidation per process."
+        ),
+    )
+    rerank_score_cache_size: int = Field(
+        20000, description="Max cached cross-encoder scores per (query, document); 0 disables."
+    )
+    rerank_score_cache_ttl_seconds: float = Field(
+        3600, description="TTL for cached cross-encoder scores."
+    )
+
+    answer_cache_size: int = Field(
+        512, description="Max cached LLM answers; 0 disables the semantic answer cache."
+    )
+    answer_cache_ttl_seconds: float = Field(3600, description="TTL for cached LLM answers.")
+    answer_cache_similarity: float = Field(
+        0.95,
+        description=(
+            "Min cosine similarity between query embeddings for a cached answer to be reused "
+            "(the context item ids must also match)."
+        ),
+    )
+
     llm_provider: str = Field(
         "openai",
-        description="LLM provider identifier (e.g. 'openai'); unused if llm_api_key is empty",
+        description=(
+            "LLM provider: 'openai' (any OpenAI-compatible API; unused if llm_api_key is "
+            "empty) or 'fake' (local deterministic replies for tests and demos)."
+        ),
     )
     llm_model: str = Field(
         "gpt-4o-mini",
@@ -41,11 +187,124 @@ class Settings(BaseSettings):
         default=None,
         description="API key for the configured LLM provider. If unset, LLM is disabled.",
     )
-    llm_timeout_seconds: int = Field(30, description="Timeout for LLM API calls.")
+    llm_base_url: str = Field(
+        "https://api.openai.com/v1", description="Base URL of the OpenAI-compatible LLM API."
+    )
+    llm_timeout_seconds: float = Field(
+        30, description="Timeout per LLM attempt (for streams: max wait between tokens)."
+    )
     llm_max_retries: int = Field(2, description="Max retries for LLM API calls on failure.")
+    llm_retry_backoff_ms: int = Field(
+        500, description="Base of the exponential, fully jittered backoff between LLM retries."
+    )
+    llm_max_concurrency: int = Field(
+        8, description="Max LLM calls in flight per process; further calls wait for a slot."
+    )
 
     max_top_k: int = Field(50, description="Server-side cap on search top_k.")
+    max_search_batch_size: int = Field(
+        1000, description="Max number of queries per /search/batch request."
+    )
+    search_batch_concurrency: int = Field(
+        16, description="Searches of one /search/batch request run concurrently."
+    )
+    retrieval_mode: str = Field(
+        "single",
+        description="'single': one Endee query split by type; 'per_type': one filtered query per type in parallel.",
+    )
+    hybrid_fusion: str = Field(
+        "rrf",
+        description="Fusion of BM25 with vector results: 'rrf', 'weighted' or 'off' (vector only).",
+    )
+    hybrid_rrf_k: int = Field(60, description="k constant of reciprocal rank fusion.")
+    hybrid_lexical_weight: float = Field(
+        0.3, description="BM25 share of the fused score in 'weighted' fusion."
+    )
+    lexical_index_path: str = Field(
+        ".cache/lexical_index.sqlite",
+        description="SQLite database of the BM25 index built during ingestion; empty disables hybrid retrieval.",
+    )
+    lexical_postings_per_term: int = Field(
+        1000,
+        description="Max postings a BM25 search scores per query term, highest impact first; 0 scores all.",
+    )
+    search_planner: str = Field(
+        "adaptive",
+        description="'adaptive': size ef/over-fetch from filter selectivity; 'fixed': ef=search_ef_default, top_k+5.",
+    )
+    search_target: str = Field(
+        "latency", description="Planner target: 'latency' (cheaper ef) or 'recall' (wider ef)."
+    )
+    search_ef_default: int = Field(128, description="Endee ef for the fixed planner.")
+    search_ef_min: int = Field(64, description="Lower bound of planned ef.")
+    search_ef_max: int = Field(512, description="Upper bound of planned ef.")
+    search_overfetch_ratio: float = Field(
+        0.5, description="Extra candidates fetched beyond top_k, as a fraction of top_k."
+    )
+    search_latency_target_ms: float = Field(
+        150, description="p95 Endee query latency the planner scales ef down to stay under."
+    )
+    filter_stats_path: str = Field(
+        ".cache/filter_stats.sqlite",
+        description="SQLite database of filter-field statistics built during ingestion; empty disables.",
+    )
+    rerank_enabled: bool = Field(
+        False, description="Re-rank the top candidates with a cross-encoder (per request overridable)."
+    )
+    rerank_model_name: str = Field(
+        "cross-encoder/ms-marco-MiniLM-L-6-v2", description="Cross-encoder used for re-ranking."
+    )
+    rerank_candidates: int = Field(
+        20, description="Number of top candidates fetched and scored by the cross-encoder."
+    )
+    rerank_batch_size: int = Field(16, description="(query, document) pairs per cross-encoder call.")
+    rerank_budget_ms: int = Field(
+        150, description="Time budget for re-ranking; over budget, the retrieval order is kept."
+    )
+    fanout_latency_budget_ms: int = Field(
+        1500, description="Shared latency budget for per-type fan-out queries."
+    )
     max_ingest_batch_size: int = Field(100, description="Max number of items per /ingest request.")
+    ingest_manifest_path: str = Field(
+        ".cache/ingest_manifest.sqlite",
+        description="SQLite manifest of ingested content hashes used to skip unchanged items; empty disables.",
+    )
+    ingest_batch_size: int = Field(
+        256, description="Items encoded and upserted per batch by the streaming ingester."
+    )
+    ingest_jobs_dir: str = Field(
+        ".cache/ingest_jobs",
+        description="Directory of the background ingest job queue (SQLite) and spooled payloads.",
+    )
+    ingest_job_workers: int = Field(
+        1, description="Background threads running ingest jobs per server process; 0 disables."
+    )
+    ingest_job_poll_seconds: float = Field(
+        1.0, description="How often idle ingest job workers check the queue."
+    )
+    max_ingest_upload_mb: int = Field(
+        1024, description="Max size of a job payload sent to /ingest/jobs or /ingest/jobs/upload."
+    )
+    chunk_size_tokens: int = Field(
+        200,
+        description="Bodies longer than this many whitespace tokens are split into chunks; 0 disables.",
+    )
+    chunk_overlap_tokens: int = Field(40, description="Tokens shared by consecutive chunks.")
+    chunk_score_mode: str = Field(
+        "max", description="Score of an item from its chunk hits: 'max' or 'sum'."
+    )
+
+    server_workers: int = Field(
+        2, description="Worker processes started by the pre-fork server (scripts/run_server_prefork.py)."
+    )
+    cpu_workers: int = Field(2, description="Worker threads for CPU-bound embedding work.")
+    cpu_queue_size: int = Field(
+        32, description="Max queued embedding jobs before requests are rejected with 429."
+    )
+    io_workers: int = Field(16, description="Worker threads for Endee and LLM calls.")
+    io_queue_size: int = Field(
+        128, description="Max queued Endee/LLM jobs before requests are rejected with 429."
+    )
 
     class Config:
         env_file = ".env"
@@ -1,3 +1,4 @@
+import asyncio
 from pathlib import Path
 
 from fastapi import FastAPI, Request
@@ -6,9 +7,13 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from loguru import logger
 
-from backend.app.api import routes_health, routes_ingest, routes_search
+from backend.app.api import routes_health, routes_ingest, routes_items, routes_search
 from backend.app.config import get_settings
-from backend.app.services.endee_client import get_endee_client
+from backend.app.services.endee_client import close_async_endee_client
+from backend.app.services.executors import shutdown_executors
+from backend.app.services.jobs import start_ingest_workers, stop_ingest_workers
+from backend.app.services.llm import close_llm_client
+from backend.app.services.startup import stop_warm_up, warm_up
 
 
 def create_app() -> FastAPI:
@@ -18,6 +23,7 @@ def create_app() -> FastAPI:
 
     app.include_router(routes_health.router)
     app.include_router(routes_ingest.router)
+    app.include_router(routes_items.router)
     app.include_router(routes_search.router)
 
     base_dir = Path(__file__).resolve().parent
@@ -40,8 +46,22 @@ def create_app() -> FastAPI:
 
     @app.on_event("startup")
     async def on_startup():
-        logger.info("Initialising Endee client on startup.")
-        get_endee_client()
+        start_ingest_workers()
+        if settings.startup_mode == "blocking":
+            logger.info("Checking Endee index and warming up before accepting traffic.")
+            await asyncio.to_thread(warm_up)
+        else:
+            # Accept traffic immediately; /health reports "warming" until done.
+            logger.info("Checking Endee index and warming up in the background.")
+            app.state.warm_up_task = asyncio.create_task(asyncio.to_thread(warm_up))
+
+    @app.on_event("shutdown")
+    async def on_shutdown():
+        stop_warm_up()
+        stop_ingest_workers()
+        await close_async_endee_client()
+        await close_llm_client()
+        shutdown_executors()
 
     return app
 
@@ -26,6 +26,34 @@ class SupportItem:
     url: Optional[str] = None
     resolved: Optional[bool] = None
     priority: Optional[int] = None
+    # Set on chunks of a long item: the original item's id and the chunk number.
+    parent_id: Optional[str] = None
+    chunk: Optional[int] = None
+
+    @classmethod
+    def from_index(
+        cls, item_id: str, meta: Dict[str, Any], filter: Dict[str, Any]
+    ) -> "SupportItem":
+        """
+        Rebuild an item from the meta and filter fields stored in the index.
+        The body is only the stored snippet, so the result is fit for
+        metadata rewrites, not for re-embedding.
+        """
+
+        return cls(
+            id=item_id,
+            type=SupportItemType(meta.get("type") or filter.get("type") or "ticket"),
+            title=meta.get("title") or "",
+            body=meta.get("snippet") or "",
+            product=meta.get("product"),
+            severity=meta.get("severity"),
+            tags=meta.get("tags") or [],
+            url=meta.get("url"),
+            resolved=meta.get("resolved"),
+            priority=filter.get("priority"),
+            parent_id=meta.get("parent_id"),
+            chunk=meta.get("chunk"),
+        )
 
     def to_text(self) -> str:
         """
@@ -47,6 +75,9 @@ class SupportItem:
         }
         if self.resolved is not None:
             out["resolved"] = self.resolved
+        if self.parent_id is not None:
+            out["parent_id"] = self.parent_id
+            out["chunk"] = self.chunk
         return out
 
     def filter(self) -> Dict[str, Any]:
@@ -73,4 +104,6 @@ class SearchResultItem:
     score: float
     url: Optional[str] = None
     resolved: Optional[bool] = None
+    # Served from the last-known results store while Endee was unavailable.
+    stale: bool = False
 
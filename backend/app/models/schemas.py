@@ -22,6 +22,18 @@ class SearchFilters(BaseModel):
     )
 
 
+class SearchParams(BaseModel):
+    ef: Optional[int] = Field(
+        default=None, ge=1, le=1024, description="Endee search breadth; planned if unset"
+    )
+    fetch_k: Optional[int] = Field(
+        default=None, ge=1, le=50, description="Candidates fetched from Endee; planned if unset"
+    )
+    target: Optional[Literal["latency", "recall"]] = Field(
+        default=None, description="Planner target; defaults to the server setting"
+    )
+
+
 class SearchRequest(BaseModel):
     query: str = Field(..., description="Natural language description of the issue")
     top_k: int = Field(
@@ -35,6 +47,13 @@ class SearchRequest(BaseModel):
         True,
         description="Whether to attempt LLM-based answer generation if configured",
     )
+    search_params: Optional[SearchParams] = Field(
+        default=None, description="Per-request overrides of the adaptive query planner"
+    )
+    rerank: Optional[bool] = Field(
+        default=None,
+        description="Re-rank candidates with the cross-encoder; defaults to the server setting",
+    )
 
 
 class SearchResultItemSchema(BaseModel):
@@ -55,6 +74,26 @@ class SearchResponse(BaseModel):
     faqs: List[SearchResultItemSchema]
     runbooks: List[SearchResultItemSchema]
     llm_answer: Optional[str] = None
+    degraded: bool = Field(
+        False,
+        description="True when some results are last-known results served while Endee was unavailable",
+    )
+
+
+class SearchBatchRequest(BaseModel):
+    requests: List[SearchRequest] = Field(
+        ..., min_items=1, description="Searches to run; answers are not generated in batch mode"
+    )
+
+
+class SearchBatchItem(BaseModel):
+    status: int = Field(..., description="HTTP status this search would have returned on /search")
+    response: Optional[SearchResponse] = None
+    error: Optional[str] = None
+
+
+class SearchBatchResponse(BaseModel):
+    results: List[SearchBatchItem] = Field(..., description="One entry per request, in order")
 
 
 class IngestItemRequest(BaseModel):
@@ -74,3 +113,47 @@ class IngestItemRequest(BaseModel):
     resolved: Optional[bool] = None
     priority: Optional[int] = Field(None, ge=0, le=999)
 
+
+
+class ItemUpdateRequest(BaseModel):
+    """
+    Partial update of an indexed item. Only the fields present are changed;
+    none of them is embedded, so the update skips the model.
+    """
+
+    id: str
+    product: Optional[str] = None
+    severity: Optional[str] = None
+    tags: Optional[List[str]] = None
+    url: Optional[str] = None
+    resolved: Optional[bool] = None
+    priority: Optional[int] = Field(None, ge=0, le=999)
+
+
+class ItemDeleteRequest(BaseModel):
+    ids: Optional[List[str]] = Field(default=None, description="Item ids to delete")
+    filters: Optional[SearchFilters] = Field(
+        default=None, description="Delete every item matching these filters"
+    )
+
+
+class IngestJobResponse(BaseModel):
+    """
+    Status and progress of a background ingest job.
+    """
+
+    job_id: str
+    status: Literal["queued", "running", "succeeded", "failed"]
+    source: Literal["items", "tickets", "faqs", "runbooks"]
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    total: Optional[int] = Field(None, description="Items in the payload, once known")
+    processed: int = Field(0, description="Items written so far")
+    embedded: int = 0
+    metadata_updated: int = 0
+    unchanged: int = 0
+    failed_items: int = Field(0, description="Rows or entries that could not be parsed")
+    items_per_second: float = 0.0
+    errors: List[str] = Field(default_factory=list, description="First parse errors")
+    error: Optional[str] = Field(None, description="Why the job failed")
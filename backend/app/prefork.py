@@ -0,0 +1,145 @@
+"""
+Pre-fork multi-worker server.
+
+`uvicorn --workers N` spawns fresh interpreters, so every worker loads its own
+copy of the embedding model. Here the parent binds the socket and loads the
+model once, then forks the workers: the weights are inherited copy-on-write
+and only touched pages are duplicated. POSIX only (needs os.fork).
+"""
+
+import gc
+import os
+import signal
+import socket
+import time
+from typing import Dict, Optional
+
+import uvicorn
+from loguru import logger
+
+from backend.app.config import get_settings
+from backend.app.services.process import WORKER_ID_ENV, process_memory
+
+
+def preload_model() -> None:
+    """
+    Load the embedding model in the parent before forking.
+
+    No inference runs here so the parent never starts torch's thread pool;
+    each worker warms itself up after the fork. `gc.freeze()` moves everything
+    allocated so far out of the collector's reach, so collections in the
+    workers don't write to (and thereby copy) the shared pages.
+
+    ONNX Runtime starts its thread pool when a session is created, so with
+    EMBEDDING_BACKEND=onnx the parent only makes sure the export exists and
+    each worker opens its own session.
+    """
+
+    from backend.app.services.embeddings import ensure_onnx_export, get_embedding_model
+
+    start = time.perf_counter()
+    if get_settings().embedding_backend == "onnx":
+        try:
+            ensure_onnx_export()
+            logger.info(f"ONNX export ready in {(time.perf_counter() - start):.1f}s.")
+            return
+        except ImportError:
+            pass
+    model = get_embedding_model()
+    model.eval()
+    gc.collect()
+    gc.freeze()
+    logger.info(
+        f"Preloaded embedding model in {(time.perf_counter() - start):.1f}s; "
+        f"parent memory: {process_memory()}"
+    )
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(sock: socket.socket, index: int, workers: int, host: str, port: int) -> None:
+    os.environ[WORKER_ID_ENV] = str(index)
+    # Split the cores between workers instead of letting each use all of them
+    # (unless EMBEDDING_THREADS is set); the ONNX backend follows this count.
+    try:
+        import torch
+
+        threads = get_settings().embedding_threads
+        torch.set_num_threads(threads or max(1, (os.cpu_count() or 1) // workers))
+    except ImportError:
+        pass
+
+    config = uvicorn.Config("backend.app.main:app", host=host, port=port, log_level="info")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _spawn(sock: socket.socket, index: int, workers: int, host: str, port: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _run_worker(sock, index, workers, host, port)
+        except BaseException:
+            logger.exception(f"Worker {index} crashed.")
+            code = 1
+        finally:
+            os._exit(code)
+    logger.info(f"Started worker {index} (pid {pid}).")
+    return pid
+
+
+def serve(host: str = "0.0.0.0", port: int = 8000, workers: Optional[int] = None) -> None:
+    """
+    Bind, preload the model, fork `workers` uvicorn workers and supervise
+    them, restarting any that exit until SIGINT/SIGTERM.
+    """
+
+    if not hasattr(os, "fork"):
+        raise RuntimeError("Pre-fork mode needs os.fork; use scripts/run_server.bat on Windows.")
+
+    workers = workers or get_settings().server_workers
+    sock = _bind(host, port)
+    preload_model()
+
+    children: Dict[int, int] = {}
+    stopping = False
+
+    def _stop(signum, _frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+
+    for index in range(workers):
+        children[_spawn(sock, index, workers, host, port)] = index
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        if index is None:
+            continue
+        if not stopping:
+            logger.warning(
+                f"Worker {index} (pid {pid}) exited with status {status}; restarting."
+            )
+            time.sleep(1.0)
+            children[_spawn(sock, index, workers, host, port)] = index
+
+    sock.close()
+    logger.info("All workers stopped.")
@@ -1,48 +1,25 @@
-import time
-from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional, Tuple
 
 from loguru import logger
 
 from backend.app.config import get_settings
 from backend.app.models.domain import SearchResultItem
+from backend.app.services.cache import get_answer_cache
+from backend.app.services.embeddings import aembed_text
+from backend.app.services.llm import get_llm_client
+
+# Number of retrieved items given to the LLM as context.
+MAX_CONTEXT_ITEMS = 5
 
 
 def is_llm_enabled() -> bool:
     settings = get_settings()
-    return bool(settings.llm_api_key)
+    return settings.llm_provider == "fake" or bool(settings.llm_api_key)
 
 
-def _call_llm(system_prompt: str, user_prompt: str) -> Optional[str]:
-    settings = get_settings()
-    try:
-        import openai
-    except ImportError:
-        return None
-    openai.api_key = settings.llm_api_key
-    response = openai.ChatCompletion.create(
-        model=settings.llm_model,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
-        temperature=0.3,
-    )
-    if response and response.choices:
-        return response.choices[0].message.get("content")
-    return None
-
-
-def generate_answer(query: str, context_items: List[SearchResultItem]) -> Optional[str]:
-    if not is_llm_enabled():
-        return None
-
-    settings = get_settings()
-    timeout = settings.llm_timeout_seconds
-    max_retries = max(0, settings.llm_max_retries)
-
+def _build_prompts(query: str, context_items: List[SearchResultItem]) -> Tuple[str, str]:
     context_text_parts = []
-    for idx, item in enumerate(context_items[:5]):
+    for idx, item in enumerate(context_items[:MAX_CONTEXT_ITEMS]):
         context_text_parts.append(
             f"[{idx+1}] ({item.type.value.upper()}) {item.title}\n"
             f"Snippet: {item.snippet}\n"
@@ -61,24 +38,85 @@ def generate_answer(query: str, context_items: List[SearchResultItem]) -> Option
         "Write a proposed response to the user and, if appropriate, "
         "include concrete troubleshooting steps and references to the context items."
     )
+    return system_prompt, user_prompt
+
+
+def _context_ids(context_items: List[SearchResultItem]) -> List[str]:
+    return [item.id for item in context_items[:MAX_CONTEXT_ITEMS]]
+
+
+async def _query_vector(query: str) -> Optional[List[float]]:
+    """
+    Query embedding for answer cache lookups (normally already in the query
+    embedding cache from retrieval); None skips the cache.
+    """
+
+    if not get_answer_cache().enabled:
+        return None
+    try:
+        return await aembed_text(query)
+    except Exception as exc:
+        logger.warning(f"Answer cache lookup skipped: {exc!r}")
+        return None
+
+
+async def agenerate_answer(query: str, context_items: List[SearchResultItem]) -> Optional[str]:
+    """
+    Generate a suggested reply through the shared LLM client. A cached answer
+    for a similar query over the same context items is returned instead when
+    there is one. Failures are logged and yield None, so search results are
+    returned without an answer.
+    """
+
+    if not is_llm_enabled():
+        return None
+
+    cache = get_answer_cache()
+    context_ids = _context_ids(context_items)
+    vector = await _query_vector(query)
+    if vector is not None:
+        cached = cache.get(vector, context_ids)
+        if cached is not None:
+            return cached
+    generation = cache.generation
+
+    system_prompt, user_prompt = _build_prompts(query, context_items)
+    try:
+        completion = await get_llm_client().complete(system_prompt, user_prompt)
+    except Exception as exc:
+        logger.opt(exception=exc).error("LLM generation failed after retries: {}", exc)
+        return None
+    if vector is not None and completion.text:
+        cache.put(vector, context_ids, completion.text, generation)
+    return completion.text or None
+
+
+async def astream_answer(query: str, context_items: List[SearchResultItem]) -> AsyncIterator[str]:
+    """
+    Stream the suggested reply as the provider produces it. A failure before
+    the first token is retried like agenerate_answer; a later one is raised.
+    Closing the generator (e.g. the client disconnected) cancels the request.
+    A cached answer is sent as a single token; a reply streamed to the end
+    is cached.
+    """
+
+    if not is_llm_enabled():
+        return
 
-    last_exc = None
-    for attempt in range(max_retries + 1):
-        try:
-            with ThreadPoolExecutor(max_workers=1) as ex:
-                future = ex.submit(_call_llm, system_prompt, user_prompt)
-                result = future.result(timeout=timeout)
-            if result is not None:
-                return result
-        except FuturesTimeoutError:
-            last_exc = TimeoutError(f"LLM call timed out after {timeout}s")
-            logger.warning("LLM attempt %s timed out", attempt + 1)
-        except Exception as exc:
-            last_exc = exc
-            logger.warning("LLM attempt %s failed: %s", attempt + 1, exc)
-        if attempt < max_retries:
-            time.sleep(1.0 * (attempt + 1))
-    if last_exc:
-        logger.exception("LLM generation failed after retries: %s", last_exc)
-    return None
+    cache = get_answer_cache()
+    context_ids = _context_ids(context_items)
+    vector = await _query_vector(query)
+    if vector is not None:
+        cached = cache.get(vector, context_ids)
+        if cached is not None:
+            yield cached
+            return
+    generation = cache.generation
 
+    system_prompt, user_prompt = _build_prompts(query, context_items)
+    parts = []
+    async for token in get_llm_client().stream(system_prompt, user_prompt):
+        parts.append(token)
+        yield token
+    if vector is not None and parts:
+        cache.put(vector, context_ids, "".join(parts), generation)
@@ -0,0 +1,506 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Generic, Hashable, Iterable, List, Optional, Tuple, TypeVar
+
+import numpy as np
+
+from backend.app.config import get_settings
+from backend.app.services.manifest import CHUNK_ID_SEPARATOR
+
+V = TypeVar("V")
+
+
+class TTLCache(Generic[V]):
+    """
+    Thread-safe LRU cache whose entries also expire after `ttl_seconds`.
+
+    A `max_size` of 0 disables the cache entirely. `invalidate()` bumps a
+    generation counter in addition to clearing entries, so a value computed
+    before an invalidation can be dropped by passing the generation observed
+    at computation time to `put`. `on_lookup`, if given, runs before every
+    `get` (used to apply invalidations made by other processes).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_size: int,
+        ttl_seconds: float,
+        on_lookup: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self.name = name
+        self.max_size = max(0, max_size)
+        self.ttl_seconds = ttl_seconds
+        self._on_lookup = on_lookup
+        self._data: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key: Hashable) -> Optional[V]:
+        if not self.enabled:
+            return None
+        if self._on_lookup is not None:
+            self._on_lookup()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: V, generation: Optional[int] = None) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._generation += 1
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._data)
+        lookups = self.hits + self.misses
+        return {
+            "size": size,
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+class SemanticAnswerCache:
+    """
+    Generated answers, looked up by query similarity rather than exact text.
+
+    An entry matches a new query when both were answered from the same set
+    of context item ids and the cosine similarity of their query vectors is
+    at least `similarity_threshold`. Entries expire after `ttl_seconds`, the
+    least recently used are evicted beyond `max_size`, and re-ingesting or
+    deleting an item drops every answer that used it. Stats and `on_lookup`
+    match TTLCache.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_size: int,
+        ttl_seconds: float,
+        similarity_threshold: float,
+        on_lookup: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self.name = name
+        self.max_size = max(0, max_size)
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._on_lookup = on_lookup
+        # entry id -> (expires_at, context ids, unit query vector, answer)
+        self._data: "OrderedDict[int, Tuple[float, Tuple[str, ...], np.ndarray, str]]" = (
+            OrderedDict()
+        )
+        self._by_context: Dict[Tuple[str, ...], set] = {}
+        self._by_item: Dict[str, set] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    @staticmethod
+    def _unit(vector: Iterable[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(array))
+        return array / norm if norm else array
+
+    def _drop(self, entry_id: int) -> None:
+        _, context, _, _ = self._data.pop(entry_id)
+        group = self._by_context[context]
+        group.discard(entry_id)
+        if not group:
+            del self._by_context[context]
+        for item_id in context:
+            entries = self._by_item[item_id]
+            entries.discard(entry_id)
+            if not entries:
+                del self._by_item[item_id]
+
+    def get(self, vector: Iterable[float], context_ids: Iterable[str]) -> Optional[str]:
+        if not self.enabled:
+            return None
+        if self._on_lookup is not None:
+            self._on_lookup()
+        context = tuple(sorted(set(context_ids)))
+        query = self._unit(vector)
+        now = time.monotonic()
+        with self._lock:
+            best_id, best_similarity = None, self.similarity_threshold
+            for entry_id in list(self._by_context.get(context, ())):
+                expires_at, _, cached, _ = self._data[entry_id]
+                if expires_at <= now:
+                    self._drop(entry_id)
+                    self.evictions += 1
+                    continue
+                similarity = float(np.dot(query, cached))
+                if similarity >= best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+            if best_id is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(best_id)
+            self.hits += 1
+            return self._data[best_id][3]
+
+    def put(
+        self,
+        vector: Iterable[float],
+        context_ids: Iterable[str],
+        answer: str,
+        generation: Optional[int] = None,
+    ) -> None:
+        if not self.enabled:
+            return
+        context = tuple(sorted(set(context_ids)))
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            entry_id = self._next_id
+            self._next_id += 1
+            self._data[entry_id] = (
+                time.monotonic() + self.ttl_seconds, context, self._unit(vector), answer
+            )
+            self._by_context.setdefault(context, set()).add(entry_id)
+            for item_id in context:
+                self._by_item.setdefault(item_id, set()).add(entry_id)
+            while len(self._data) > self.max_size:
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def invalidate_items(self, item_ids: Iterable[str]) -> None:
+        """
+        Drop answers that used any of `item_ids` (chunk ids count as their
+        parent item). Also bumps the generation, so answers being generated
+        from the old versions are not stored.
+        """
+
+        with self._lock:
+            self._generation += 1
+            for item_id in {item_id.split(CHUNK_ID_SEPARATOR)[0] for item_id in item_ids}:
+                for entry_id in list(self._by_item.get(item_id, ())):
+                    self._drop(entry_id)
+                    self.invalidations += 1
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._by_context.clear()
+            self._by_item.clear()
+            self._generation += 1
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._data)
+        lookups = self.hits + self.misses
+        return {
+            "size": size,
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "similarity_threshold": self.similarity_threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+class SharedInvalidations:
+    """
+    Cache invalidations shared by every process using the same SQLite file:
+    prefork workers, ingest jobs and the scripts.
+
+    A write appends the item ids it touched (NULL: all items) to a log;
+    before a cache lookup each process applies the entries it has not seen
+    yet. `PRAGMA data_version` only changes when another connection has
+    committed, so a lookup with nothing new does not read the log. The log
+    keeps the last KEEP_ENTRIES entries; a process that fell further behind
+    drops everything it cached.
+    """
+
+    KEEP_ENTRIES = 10000
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit mode: transactions are opened explicitly in publish.
+        self._conn = sqlite3.connect(
+            str(path), check_same_thread=False, timeout=30, isolation_level=None
+        )
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS invalidations "
+            "(seq INTEGER PRIMARY KEY AUTOINCREMENT, item_ids TEXT)"
+        )
+        # Nothing is cached yet, so earlier entries do not concern this process.
+        self._seen = self._conn.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM invalidations"
+        ).fetchone()[0]
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _unseen(self) -> List[Optional[List[str]]]:
+        rows = self._conn.execute(
+            "SELECT seq, item_ids FROM invalidations WHERE seq > ? ORDER BY seq", (self._seen,)
+        ).fetchall()
+        if not rows:
+            return []
+        missed = rows[0][0] > self._seen + 1
+        self._seen = rows[-1][0]
+        if missed:
+            return [None]
+        return [None if item_ids is None else json.loads(item_ids) for _, item_ids in rows]
+
+    def poll(self) -> List[Optional[List[str]]]:
+        """
+        Invalidations published by other processes since the last call.
+        """
+
+        with self._lock:
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._data_version:
+                return []
+            self._data_version = data_version
+            return self._unseen()
+
+    def publish(self, item_ids: Optional[List[str]]) -> List[Optional[List[str]]]:
+        """
+        Record an invalidation for the other processes. Returns the ones
+        they published that this process had not applied yet.
+        """
+
+        payload = None if item_ids is None else json.dumps(item_ids)
+        with self._lock:
+            # IMMEDIATE: no other entry can be appended between reading the
+            # unseen ones and appending this one.
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                unseen = self._unseen()
+                seq = self._conn.execute(
+                    "INSERT INTO invalidations (item_ids) VALUES (?)", (payload,)
+                ).lastrowid
+                self._conn.execute(
+                    "DELETE FROM invalidations WHERE seq <= ?", (seq - self.KEEP_ENTRIES,)
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._seen = seq
+            return unseen
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normalise query text for cache lookups: case-folded, whitespace collapsed.
+    """
+
+    return " ".join(text.split()).casefold()
+
+
+def vector_key(vector: Iterable[float]) -> str:
+    """
+    Stable, compact hash of a query vector for use in cache keys.
+    """
+
+    data = np.asarray(vector, dtype=np.float32).tobytes()
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def filters_key(filters: Optional[List[Dict[str, Any]]]) -> str:
+    return json.dumps(filters or [], sort_keys=True, separators=(",", ":"))
+
+
+@lru_cache()
+def get_embedding_cache() -> TTLCache:
+    """
+    Level one: normalised query text -> query vector.
+    """
+
+    settings = get_settings()
+    return TTLCache(
+        "query_embedding", settings.embedding_cache_size, settings.embedding_cache_ttl_seconds
+    )
+
+
+@lru_cache()
+def get_result_cache() -> TTLCache:
+    """
+    Level two: (query vector hash, filters, top_k) -> search results.
+    """
+
+    settings = get_settings()
+    return TTLCache(
+        "search_results",
+        settings.result_cache_size,
+        settings.result_cache_ttl_seconds,
+        on_lookup=sync_invalidations,
+    )
+
+
+@lru_cache()
+def get_fallback_cache() -> TTLCache:
+    """
+    Last-known results under the same keys as the result cache. Not cleared
+    on upsert: it is only read while Endee is unavailable, when slightly
+    stale results beat none.
+    """
+
+    settings = get_settings()
+    return TTLCache(
+        "last_known_results", settings.fallback_cache_size, settings.fallback_cache_ttl_seconds
+    )
+
+
+@lru_cache()
+def get_rerank_cache() -> TTLCache:
+    """
+    Cross-encoder scores: (normalised query, document id, document text hash)
+    -> score. Keyed on the text, so edited documents are re-scored.
+    """
+
+    settings = get_settings()
+    return TTLCache(
+        "rerank_scores", settings.rerank_score_cache_size, settings.rerank_score_cache_ttl_seconds
+    )
+
+
+@lru_cache()
+def get_answer_cache() -> SemanticAnswerCache:
+    """
+    Generated answers: (query vector ~ similar, context item ids) -> answer.
+    """
+
+    settings = get_settings()
+    return SemanticAnswerCache(
+        "llm_answers",
+        settings.answer_cache_size,
+        settings.answer_cache_ttl_seconds,
+        settings.answer_cache_similarity,
+        on_lookup=sync_invalidations,
+    )
+
+
+@lru_cache()
+def get_shared_invalidations() -> Optional[SharedInvalidations]:
+    """
+    Return the process-wide invalidation log, or None when
+    `cache_invalidation_path` is empty.
+    """
+
+    settings = get_settings()
+    if not settings.cache_invalidation_path:
+        return None
+    return SharedInvalidations(Path(settings.cache_invalidation_path))
+
+
+def _invalidate_local(item_ids: Optional[Iterable[str]]) -> None:
+    get_result_cache().invalidate()
+    if item_ids is None:
+        get_answer_cache().invalidate()
+    else:
+        get_answer_cache().invalidate_items(item_ids)
+
+
+def _apply(invalidations: List[Optional[List[str]]]) -> None:
+    if not invalidations:
+        return
+    if any(item_ids is None for item_ids in invalidations):
+        _invalidate_local(None)
+    else:
+        _invalidate_local({item_id for item_ids in invalidations for item_id in item_ids})
+
+
+def sync_invalidations() -> None:
+    """
+    Apply invalidations published by other processes. Runs before every
+    result and answer cache lookup.
+    """
+
+    shared = get_shared_invalidations()
+    if shared is not None:
+        _apply(shared.poll())
+
+
+def invalidate_items(item_ids: Optional[Iterable[str]]) -> None:
+    """
+    Called on every write: clears cached result lists and drops cached
+    answers built on the written items (all answers when the ids are not
+    known, e.g. after a delete by filter), in this process and, through
+    the shared invalidation log, in every other one.
+    """
+
+    if item_ids is not None:
+        item_ids = list(item_ids)
+    _invalidate_local(item_ids)
+    shared = get_shared_invalidations()
+    if shared is not None:
+        _apply(shared.publish(item_ids))
+
+
+def cache_stats() -> Dict[str, Any]:
+    return {
+        "query_embedding": get_embedding_cache().stats(),
+        "search_results": get_result_cache().stats(),
+        "last_known_results": get_fallback_cache().stats(),
+        "rerank_scores": get_rerank_cache().stats(),
+        "llm_answers": get_answer_cache().stats(),
+    }
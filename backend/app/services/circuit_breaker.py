@@ -0,0 +1,169 @@
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+from loguru import logger
+
+from backend.app.config import get_settings
+from backend.app.services.metrics import get_metrics
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    Raised instead of calling a dependency whose circuit is open. The API
+    layer maps this to HTTP 503 with Retry-After.
+    """
+
+    def __init__(self, name: str, retry_after: float) -> None:
+        super().__init__(f"Circuit '{name}' is open; retry in {retry_after:.1f}s.")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Classic three-state circuit breaker.
+
+    closed: calls pass through; `failure_threshold` consecutive failures open
+    the circuit. open: calls fail immediately with CircuitOpenError for
+    `reset_timeout_seconds`. half_open: a single probe call is let through;
+    success closes the circuit, failure opens it again.
+
+    Exceptions listed in `ignored` (client-side errors such as bad input) are
+    passed through without counting as failures.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        reset_timeout_seconds: float,
+        ignored: tuple = (ValueError,),
+    ) -> None:
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.ignored = ignored
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and self._retry_after() <= 0:
+                return HALF_OPEN
+            return self._state
+
+    def _retry_after(self) -> float:
+        return self._opened_at + self.reset_timeout_seconds - time.monotonic()
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            if self._state == OPEN:
+                remaining = self._retry_after()
+                if remaining > 0:
+                    get_metrics().increment(f"breaker.{self.name}.rejected")
+                    raise CircuitOpenError(self.name, remaining)
+                self._state = HALF_OPEN
+            # Half-open: only one probe at a time.
+            if self._probe_in_flight:
+                get_metrics().increment(f"breaker.{self.name}.rejected")
+                raise CircuitOpenError(self.name, self.reset_timeout_seconds)
+            self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info(f"Circuit '{self.name}' closed.")
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    get_metrics().increment(f"breaker.{self.name}.opened")
+                    logger.warning(
+                        f"Circuit '{self.name}' opened after {self._failures} failures; "
+                        f"failing fast for {self.reset_timeout_seconds}s."
+                    )
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def _release_probe(self) -> None:
+        with self._lock:
+            self._probe_in_flight = False
+
+    def _record_exception(self, exc: BaseException) -> None:
+        if isinstance(exc, Exception) and not isinstance(exc, self.ignored):
+            self.record_failure()
+        else:
+            # Bad input or cancellation says nothing about the dependency,
+            # but a half-open probe slot must still be freed.
+            self._release_probe()
+
+    def call(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        self.before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as exc:
+            self._record_exception(exc)
+            raise
+        self.record_success()
+        return result
+
+    async def acall(self, fn: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> T:
+        self.before_call()
+        try:
+            result = await fn(*args, **kwargs)
+        except BaseException as exc:
+            self._record_exception(exc)
+            raise
+        self.record_success()
+        return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        state = self.state
+        with self._lock:
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "retry_after_seconds": round(max(0.0, self._retry_after()), 2)
+                if state == OPEN
+                else 0.0,
+            }
+
+
+@lru_cache()
+def get_endee_breaker() -> CircuitBreaker:
+    """
+    Breaker shared by every Endee query and upsert in this process.
+    """
+
+    settings = get_settings()
+    return CircuitBreaker(
+        "endee",
+        settings.endee_breaker_failure_threshold,
+        settings.endee_breaker_reset_seconds,
+    )
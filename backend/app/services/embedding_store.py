@@ -0,0 +1,297 @@
+import hashlib
+import sqlite3
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from loguru import logger
+
+from backend.app.config import get_settings
+from backend.app.services.index_alias import get_active_index
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Persistent embedding cache for one embedding model.
+
+    Vectors live in a memory-mapped, append-only float32/float16 matrix
+    (`vectors.bin`) and a SQLite table maps the SHA-256 of each embedded text
+    to its row. Re-embedding a corpus whose texts are already stored becomes a
+    sequential read of the matrix instead of model inference.
+
+    Processes may share a store: rows are allocated from the row count in
+    SQLite inside the write transaction, the vectors are written before
+    their rows are committed, and readers re-read the count (and the
+    compaction epoch) before mapping rows, so nobody reads a row before it
+    is written or overwrites another process's rows.
+    """
+
+    GROWTH_ROWS = 4096
+
+    def __init__(self, directory: Path, model_name: str, dtype: str = "float32") -> None:
+        self.model_name = model_name
+        self.directory = Path(directory) / model_name.replace("/", "__")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._vectors_path = self.directory / "vectors.bin"
+        self._lock = threading.Lock()
+        # Autocommit mode: transactions are opened explicitly.
+        self._db = sqlite3.connect(
+            str(self.directory / "index.sqlite"),
+            check_same_thread=False,
+            timeout=30,
+            isolation_level=None,
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS rows (text_hash TEXT PRIMARY KEY, row INTEGER NOT NULL)"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT)")
+
+        self.dtype = np.dtype(dtype)
+        self.dimension: Optional[int] = None
+        self.count = 0
+        self._epoch = 0
+        self._matrix: Optional[np.memmap] = None
+        with self._lock:
+            self._sync()
+
+    def _sync(self) -> None:
+        """
+        Catch up with writes of other processes: adopt the stored dtype and
+        dimension, drop the mapping after a compaction, and map every
+        committed row.
+        """
+
+        info = dict(self._db.execute("SELECT key, value FROM info").fetchall())
+        if "dimension" in info:
+            self.dtype = np.dtype(info["dtype"])
+            self.dimension = int(info["dimension"])
+        epoch = int(info.get("epoch", 0))
+        if epoch != self._epoch:
+            self._matrix = None
+            self._epoch = epoch
+        self.count = int(info.get("count", 0))
+        if self.dimension is not None and (
+            self._matrix is None or self._matrix.shape[0] < self.count
+        ):
+            self._open(max(self.count, 1))
+
+    def _save_info(self) -> None:
+        values = {
+            "dtype": self.dtype.name,
+            "dimension": self.dimension,
+            "count": self.count,
+            "epoch": self._epoch,
+        }
+        self._db.executemany(
+            "INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)",
+            [(k, str(v)) for k, v in values.items()],
+        )
+
+    def _open(self, min_rows: int) -> None:
+        row_bytes = self.dimension * self.dtype.itemsize
+        size = self._vectors_path.stat().st_size if self._vectors_path.exists() else 0
+        capacity = size // row_bytes
+        if capacity < min_rows:
+            capacity = max(min_rows, capacity + self.GROWTH_ROWS)
+            if self._matrix is not None:
+                self._matrix.flush()
+                self._matrix = None
+            with self._vectors_path.open("ab") as f:
+                f.truncate(capacity * row_bytes)
+        if self._matrix is None or self._matrix.shape[0] < capacity:
+            self._matrix = np.memmap(
+                self._vectors_path, dtype=self.dtype, mode="r+", shape=(capacity, self.dimension)
+            )
+
+    def _rows_for(self, hashes: List[str]) -> Dict[str, int]:
+        found: Dict[str, int] = {}
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start : start + 500]
+            placeholders = ",".join("?" for _ in chunk)
+            rows = self._db.execute(
+                f"SELECT text_hash, row FROM rows WHERE text_hash IN ({placeholders})", chunk
+            ).fetchall()
+            found.update(dict(rows))
+        return found
+
+    def get_many(self, hashes: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Return float32 vectors for the hashes that are stored.
+        """
+
+        with self._lock:
+            rows = self._read_rows(hashes)
+            if self._matrix is None:
+                return {}
+            return {h: np.asarray(self._matrix[row], dtype=np.float32) for h, row in rows.items()}
+
+    def _read_rows(self, hashes: List[str]) -> Dict[str, int]:
+        # One read transaction: the count and the rows come from the same snapshot.
+        self._db.execute("BEGIN")
+        try:
+            self._sync()
+            return self._rows_for(hashes) if hashes else {}
+        finally:
+            self._db.execute("COMMIT")
+
+    def gather(self, hashes: List[str]) -> Tuple[Optional[np.ndarray], List[int]]:
+        """
+        Gather stored vectors for `hashes` into one float32 matrix.
+
+        Returns the matrix (rows for missing hashes are left uninitialised,
+        None if the store is still empty) and the positions that were missing.
+        """
+
+        with self._lock:
+            rows = self._read_rows(hashes)
+            if self._matrix is None:
+                return None, list(range(len(hashes)))
+            out = np.empty((len(hashes), self.dimension), dtype=np.float32)
+            found = [i for i, h in enumerate(hashes) if h in rows]
+            if found:
+                out[found] = self._matrix[[rows[hashes[i]] for i in found]]
+            missing = [i for i, h in enumerate(hashes) if h not in rows]
+            return out, missing
+
+    def put_many(self, hashes: List[str], vectors: np.ndarray) -> None:
+        vectors = np.asarray(vectors)
+        if not hashes:
+            return
+        with self._lock:
+            # IMMEDIATE takes the write lock before the row count is read, so
+            # concurrent writers (other processes included) get disjoint rows.
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._sync()
+                if self.dimension is None:
+                    self.dimension = int(vectors.shape[1])
+                elif vectors.shape[1] != self.dimension:
+                    raise ValueError(
+                        f"Embedding store for {self.model_name} has dimension {self.dimension}, "
+                        f"got {vectors.shape[1]}."
+                    )
+                known = self._rows_for(hashes)
+                new = [(h, v) for h, v in zip(hashes, vectors) if h not in known]
+                # Drop duplicates within the batch while keeping order.
+                seen: Set[str] = set()
+                new = [(h, v) for h, v in new if not (h in seen or seen.add(h))]
+                if not new:
+                    self._db.execute("COMMIT")
+                    return
+                start = self.count
+                self._open(start + len(new))
+                for offset, (_, vector) in enumerate(new):
+                    self._matrix[start + offset] = vector
+                self._matrix.flush()
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO rows (text_hash, row) VALUES (?, ?)",
+                    [(h, start + offset) for offset, (h, _) in enumerate(new)],
+                )
+                self.count = start + len(new)
+                self._save_info()
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                # Re-read what was committed; nothing of this write was.
+                self._sync()
+                raise
+
+    def prune(self, keep: Iterable[str]) -> int:
+        """
+        Compact the store down to the given text hashes. Returns the number
+        of rows removed.
+        """
+
+        keep_set = set(keep)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                removed = self._compact(keep_set)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            if removed:
+                self._open(max(self.count, 1))
+            return removed
+
+    def _compact(self, keep_set: Set[str]) -> int:
+        self._sync()
+        if self._matrix is None:
+            return 0
+        rows = self._db.execute("SELECT text_hash, row FROM rows ORDER BY row").fetchall()
+        kept = [(h, row) for h, row in rows if h in keep_set]
+        removed = len(rows) - len(kept)
+        if not removed:
+            return 0
+
+        # Readers in other processes keep their mapping of the old file until
+        # they see the new epoch.
+        tmp_path = self._vectors_path.with_suffix(".tmp")
+        compacted = np.memmap(
+            tmp_path, dtype=self.dtype, mode="w+", shape=(max(len(kept), 1), self.dimension)
+        )
+        for new_row, (_, old_row) in enumerate(kept):
+            compacted[new_row] = self._matrix[old_row]
+        compacted.flush()
+        del compacted
+        self._matrix = None
+        tmp_path.replace(self._vectors_path)
+
+        self._db.execute("DELETE FROM rows")
+        self._db.executemany(
+            "INSERT INTO rows (text_hash, row) VALUES (?, ?)",
+            [(h, new_row) for new_row, (h, _) in enumerate(kept)],
+        )
+        self.count = len(kept)
+        self._epoch += 1
+        self._save_info()
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        size = self._vectors_path.stat().st_size if self._vectors_path.exists() else 0
+        return {
+            "model": self.model_name,
+            "path": str(self.directory),
+            "dtype": self.dtype.name,
+            "dimension": self.dimension,
+            "count": self.count,
+            "bytes": size,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._matrix is not None:
+                self._matrix.flush()
+                self._matrix = None
+            self._db.close()
+
+
+def get_embedding_store(model_name: Optional[str] = None) -> Optional[EmbeddingStore]:
+    """
+    Return the persistent embedding store for `model_name` (by default the
+    model of the active index version), or None when it is disabled (empty
+    `embedding_store_dir`).
+    """
+
+    settings = get_settings()
+    if not settings.embedding_store_dir:
+        return None
+    return _open_embedding_store(model_name or get_active_index().model_name)
+
+
+@lru_cache()
+def _open_embedding_store(model_name: str) -> EmbeddingStore:
+    settings = get_settings()
+    store = EmbeddingStore(
+        Path(settings.embedding_store_dir), model_name, settings.embedding_store_dtype
+    )
+    logger.info(f"Using embedding store at {store.directory} ({store.count} vectors).")
+    return store
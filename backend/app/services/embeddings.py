@@ -1,50 +1,446 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
 from functools import lru_cache
-from typing import List
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Protocol, Set, Tuple, Union
 
+import numpy as np
 from loguru import logger
+import torch
 from sentence_transformers import SentenceTransformer
 
 from backend.app.config import get_settings
+from backend.app.services.cache import get_embedding_cache, normalize_query
+from backend.app.services.embedding_store import get_embedding_store, text_hash
+from backend.app.services.executors import run_cpu
+from backend.app.services.index_alias import get_active_index
+from backend.app.services.metrics import get_metrics
+
+
+class EmbeddingModel(Protocol):
+    """
+    What this service uses of a SentenceTransformer; OnnxEncoder provides the
+    same methods.
+    """
+
+    def encode(
+        self, sentences: Union[str, List[str]], convert_to_numpy: bool = True
+    ) -> np.ndarray: ...
+
+    def get_sentence_embedding_dimension(self) -> Optional[int]: ...
+
+
+def get_embedding_model(model_name: Optional[str] = None) -> EmbeddingModel:
+    """
+    Return the embedding model `model_name`, by default the model of the
+    active index version.
+    """
+
+    return _load_embedding_model(model_name or get_active_index().model_name)
+
+
+def ensure_onnx_export(model_name: Optional[str] = None) -> Path:
+    """
+    Export a model (by default the active one) to ONNX under
+    `embedding_onnx_dir` unless that was done before; returns the export
+    directory. The export is written to a temporary directory beside it and
+    renamed into place, so processes sharing `embedding_onnx_dir` never load
+    a partial export. Raises ImportError without onnxruntime or onnx.
+    """
+
+    from backend.app.services.onnx_encoder import export_onnx, is_exported
+
+    settings = get_settings()
+    quantize = settings.embedding_onnx_quantize
+    model_name = model_name or get_active_index().model_name
+    directory = Path(settings.embedding_onnx_dir) / model_name.replace("/", "__")
+    if is_exported(directory, quantize):
+        return directory
+
+    directory.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f".{directory.name}.", dir=directory.parent))
+    try:
+        export_onnx(model_name, staging, quantize=quantize)
+        try:
+            os.rename(staging, directory)
+        except OSError:
+            # Another process finished first, or an export without the
+            # requested files (e.g. no int8 copy) is in the way.
+            if not is_exported(directory, quantize):
+                retired = staging.with_name(f"{staging.name}.old")
+                os.rename(directory, retired)
+                os.rename(staging, directory)
+                shutil.rmtree(retired, ignore_errors=True)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return directory
+
+
+def _load_onnx_model(model_name: str) -> Optional[EmbeddingModel]:
+    try:
+        from backend.app.services.onnx_encoder import OnnxEncoder
+    except ImportError:
+        logger.warning("EMBEDDING_BACKEND=onnx but 'onnxruntime' is not installed; using PyTorch.")
+        return None
+
+    settings = get_settings()
+    try:
+        directory = ensure_onnx_export(model_name)
+    except ImportError as exc:
+        logger.warning(f"Cannot export {model_name} to ONNX ({exc}); using PyTorch.")
+        return None
+    quantized = settings.embedding_onnx_quantize
+    threads = settings.embedding_threads or torch.get_num_threads()
+    logger.info(
+        f"Using ONNX Runtime for {model_name} ({'int8' if quantized else 'float32'}, "
+        f"{threads} threads)."
+    )
+    return OnnxEncoder(directory, quantized=quantized, threads=threads)
 
 
 @lru_cache()
-def get_embedding_model() -> SentenceTransformer:
+def _load_embedding_model(model_name: str) -> EmbeddingModel:
     """
-    Load and cache the embedding model.
+    Load and cache an embedding model on the configured backend: the
+    SentenceTransformer itself (PyTorch) or an ONNX Runtime export of it.
 
     Using a process-wide cache avoids re-loading the model for every request
     and keeps latency predictable.
     """
 
     settings = get_settings()
-    model_name = settings.embedding_model_name
+    if settings.embedding_backend not in ("torch", "onnx"):
+        raise ValueError(f"Unknown embedding backend '{settings.embedding_backend}'.")
+    if settings.embedding_threads > 0:
+        torch.set_num_threads(settings.embedding_threads)
     logger.info(f"Loading embedding model: {model_name}")
     try:
-        model = SentenceTransformer(model_name)
+        model = None
+        if settings.embedding_backend == "onnx":
+            model = _load_onnx_model(model_name)
+        if model is None:
+            model = SentenceTransformer(model_name)
     except Exception as exc:
         logger.exception(f"Failed to load embedding model {model_name}: {exc}")
         raise
+    dimension = model.get_sentence_embedding_dimension()
+    if dimension:
+        _record_model_dimension(model_name, int(dimension))
     return model
 
 
-def embed_text(text: str) -> List[float]:
+def _read_model_manifest() -> Dict[str, Any]:
+    path = Path(get_settings().model_manifest_path)
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        logger.warning(f"Ignoring unreadable model manifest at {path}.")
+        return {}
+
+
+def _record_model_dimension(model_name: str, dimension: int) -> None:
+    settings = get_settings()
+    if not settings.model_manifest_path:
+        return
+    manifest = _read_model_manifest()
+    if manifest.get(model_name, {}).get("dimension") == dimension:
+        return
+    manifest[model_name] = {"dimension": dimension}
+    path = Path(settings.model_manifest_path)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    except OSError as exc:
+        logger.warning(f"Could not write model manifest {path}: {exc}")
+
+
+def get_embedding_dimension(model_name: Optional[str] = None) -> int:
+    """
+    Embedding dimension of a model (by default the active one), without
+    loading it when possible: taken from `embedding_dimension` in settings
+    (for the configured model), then from the model manifest written the last
+    time the model was loaded, and only then by loading the model and
+    probing it.
+    """
+
+    settings = get_settings()
+    model_name = model_name or get_active_index().model_name
+    if settings.embedding_dimension and model_name == settings.embedding_model_name:
+        return settings.embedding_dimension
+    if settings.model_manifest_path:
+        known = _read_model_manifest().get(model_name, {}).get("dimension")
+        if known:
+            return int(known)
+
+    model = get_embedding_model(model_name)
+    sample_vector = model.encode("dimension-probe", convert_to_numpy=True)
+    return int(sample_vector.shape[0])
+
+
+WARMUP_TEXTS = [
+    "504 Gateway Timeout on payments API",
+    "Users cannot log in after password reset",
+    "VPN disconnects every few minutes",
+    "How do I rotate an API key?",
+]
+
+
+def warm_embedding_model() -> None:
     """
-    Embed a single text string into a dense vector.
+    Load the model and run a small representative batch through it so the
+    first real request does not pay for lazy initialisation.
     """
 
-    model = get_embedding_model()
+    encode_texts_array(WARMUP_TEXTS)
+
+
+def _query_key(text: str, model_name: str) -> Tuple[str, str]:
+    # Vectors of different models never share a cache entry.
+    return (model_name, normalize_query(text))
+
+
+def embed_text(text: str, model_name: Optional[str] = None) -> List[float]:
+    """
+    Embed a single text string into a dense vector with `model_name`, by
+    default the model of the active index version.
+
+    Results are memoised in the query embedding cache, keyed by the model
+    and the normalised text.
+    """
+
+    model_name = model_name or get_active_index().model_name
+    cache = get_embedding_cache()
+    key = _query_key(text, model_name)
+    cached = cache.get(key)
+    if cached is not None:
+        return list(cached)
+
+    model = get_embedding_model(model_name)
     vector = model.encode(text, convert_to_numpy=True)
-    return vector.astype(float).tolist()
+    out = np.asarray(vector, dtype=np.float32).tolist()
+    cache.put(key, out)
+    return list(out)
+
+
+def encode_texts_array(texts: List[str], model_name: Optional[str] = None) -> np.ndarray:
+    """
+    Run the embedding model (by default the active one) over a batch of texts
+    and return a C-contiguous float32 matrix of shape (len(texts), dim),
+    exactly as the model produced it (no float64 upcast, no per-element
+    Python objects).
+    """
+
+    model = get_embedding_model(model_name)
+    vectors = model.encode(texts, convert_to_numpy=True)
+    return np.ascontiguousarray(vectors, dtype=np.float32)
+
+
+def encode_texts(texts: List[str], model_name: Optional[str] = None) -> List[List[float]]:
+    """
+    Run the embedding model over a batch of texts, bypassing the persistent
+    embedding store. Used for query batches, which are not worth persisting.
+    """
+
+    if not texts:
+        return []
+    return encode_texts_array(texts, model_name).tolist()
+
+
+def embed_texts_array(texts: List[str], model_name: Optional[str] = None) -> np.ndarray:
+    """
+    Embed a batch of texts into a float32 matrix of shape (len(texts), dim)
+    with `model_name`, by default the model of the active index version.
+
+    This is the ingestion path: the matrix is handed to
+    EndeeClientWrapper.upsert_support_items as-is. When the persistent
+    embedding store is enabled, texts already embedded by the same model
+    are gathered from it and only the rest are encoded.
+    """
+
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+    model_name = model_name or get_active_index().model_name
+    store = get_embedding_store(model_name)
+    if store is None:
+        return encode_texts_array(texts, model_name)
+
+    hashes = [text_hash(text) for text in texts]
+    matrix, missing = store.gather(hashes)
+    metrics = get_metrics()
+    metrics.increment("embedding_store.hits", len(texts) - len(missing))
+    metrics.increment("embedding_store.misses", len(missing))
+
+    if missing:
+        encoded = encode_texts_array([texts[i] for i in missing], model_name)
+        store.put_many([hashes[i] for i in missing], encoded)
+        if matrix is None:
+            matrix = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+        matrix[missing] = encoded
+    return matrix
 
 
 def embed_texts(texts: List[str]) -> List[List[float]]:
     """
     Embed a batch of texts into dense vectors.
+
+    List-of-lists wrapper around embed_texts_array for callers that need
+    plain Python values.
     """
 
     if not texts:
         return []
-    model = get_embedding_model()
-    vectors = model.encode(texts, convert_to_numpy=True)
-    return [v.astype(float).tolist() for v in vectors]
+    return embed_texts_array(texts).tolist()
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent single-text embed requests into one batched encode.
+
+    The first request to arrive opens a short window (`window_ms`); every
+    request arriving within it joins the same batch, which is encoded with a
+    single `encode_texts` call on the CPU executor and fanned back out to the
+    waiting callers. A batch that reaches `max_batch` is flushed immediately.
+    """
+
+    def __init__(self, window_ms: float, max_batch: int) -> None:
+        self.window_ms = window_ms
+        self.max_batch = max(1, max_batch)
+        self._pending: List[Tuple[str, Optional[str], asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # The loop only keeps weak references to tasks; hold in-flight batches here.
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def embed(self, text: str, model_name: Optional[str] = None) -> List[float]:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Pending futures are bound to the loop that created them.
+            self._loop = loop
+            self._pending = []
+            self._timer = None
+            self._tasks = set()
+
+        future: asyncio.Future = loop.create_future()
+        self._pending.append((text, model_name, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_ms / 1000, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = self._loop.create_task(self._encode_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _encode_batch(
+        self, batch: List[Tuple[str, Optional[str], asyncio.Future, float]]
+    ) -> None:
+        metrics = get_metrics()
+        flushed = time.perf_counter()
+        for _, _, _, enqueued in batch:
+            metrics.observe("embedding.batch_queue_wait", (flushed - enqueued) * 1000)
+        metrics.observe_value("embedding.batch_size", len(batch))
+
+        # Identical queries in the same window share one row of the batch;
+        # a window spanning an index switch is encoded once per model.
+        positions: Dict[Optional[str], Dict[str, int]] = {}
+        for text, model_name, _, _ in batch:
+            rows = positions.setdefault(model_name, {})
+            rows.setdefault(text, len(rows))
+
+        try:
+            vectors = {
+                model_name: await run_cpu("embed_batch", encode_texts, list(rows), model_name)
+                for model_name, rows in positions.items()
+            }
+        except Exception as exc:
+            for _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        for text, model_name, future, _ in batch:
+            if not future.done():
+                future.set_result(vectors[model_name][positions[model_name][text]])
+
+
+@lru_cache()
+def get_embedding_batcher() -> EmbeddingBatcher:
+    settings = get_settings()
+    return EmbeddingBatcher(settings.embedding_batch_window_ms, settings.embedding_max_batch)
+
+
+async def aembed_text(text: str, model_name: Optional[str] = None) -> List[float]:
+    """
+    Embed a single text with `model_name` (by default the active model)
+    without blocking the event loop.
+
+    Concurrent calls are coalesced by the EmbeddingBatcher unless the batch
+    window is configured as 0, in which case each text is encoded on its own.
+    """
+
+    model_name = model_name or get_active_index().model_name
+    if get_settings().embedding_batch_window_ms <= 0:
+        return await run_cpu("embed", embed_text, text, model_name)
+
+    cache = get_embedding_cache()
+    key = _query_key(text, model_name)
+    cached = cache.get(key)
+    if cached is not None:
+        return list(cached)
+    vector = await get_embedding_batcher().embed(text, model_name)
+    cache.put(key, vector)
+    return list(vector)
+
+
+def embed_queries(texts: List[str], model_name: Optional[str] = None) -> List[List[float]]:
+    """
+    Embed many query texts with one call of `model_name` (by default the
+    active model). Cached and repeated queries (after normalisation) are
+    encoded at most once; new vectors are added to the query embedding cache.
+    """
+
+    model_name = model_name or get_active_index().model_name
+    cache = get_embedding_cache()
+    keys = [_query_key(text, model_name) for text in texts]
+    vectors: Dict[Tuple[str, str], List[float]] = {}
+    missing: Dict[Tuple[str, str], str] = {}
+    for key, text in zip(keys, texts):
+        if key in vectors or key in missing:
+            continue
+        cached = cache.get(key)
+        if cached is not None:
+            vectors[key] = cached
+        else:
+            missing[key] = text
+    if missing:
+        for key, vector in zip(missing, encode_texts(list(missing.values()), model_name)):
+            cache.put(key, vector)
+            vectors[key] = vector
+    get_metrics().observe_value("embedding.query_batch_size", len(missing))
+    return [list(vectors[key]) for key in keys]
+
+
+async def aembed_queries(texts: List[str], model_name: Optional[str] = None) -> List[List[float]]:
+    return await run_cpu("embed_queries", embed_queries, texts, model_name)
+
+
+async def aembed_texts(texts: List[str]) -> np.ndarray:
+    """
+    Embed a batch of texts into a float32 matrix on the CPU executor without
+    blocking the event loop.
+    """
 
+    return await run_cpu("embed_batch", embed_texts_array, texts)
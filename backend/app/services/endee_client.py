@@ -1,11 +1,33 @@
-from typing import List, Dict, Any, Optional
+import asyncio
+import random
+import threading
+import time
+import weakref
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Protocol, Sequence, Union
 
+import httpx
+import msgpack
+import numpy as np
+import orjson
 from endee import Endee, Precision
+from endee.exceptions import NotFoundException
 from loguru import logger
 
 from backend.app.config import get_settings
 from backend.app.models.domain import SupportItem
-from backend.app.services.embeddings import get_embedding_model
+from backend.app.services.cache import invalidate_items
+from backend.app.services.circuit_breaker import get_endee_breaker
+from backend.app.services.embeddings import get_embedding_dimension
+from backend.app.services.index_alias import IndexVersion, get_active_index
+from backend.app.services.metrics import get_metrics
+
+# Embeddings arrive either as a float32 (n, dim) matrix (ingestion path) or as
+# plain lists (API callers, tests).
+Vectors = Union[np.ndarray, Sequence[Sequence[float]]]
 
 
 class EndeeClientWrapper:
@@ -13,40 +35,44 @@ class EndeeClientWrapper:
     Thin wrapper around the Endee Python SDK that:
     - ensures the index exists on startup
     - exposes helper methods for upsert and query
+
+    It is bound to one index version, by default the active one.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, version: Optional[IndexVersion] = None) -> None:
         settings = get_settings()
         auth_token = settings.endee_auth_token or None
 
         self._client = Endee(auth_token) if auth_token else Endee()
         self._client.set_base_url(str(settings.endee_base_url))
 
-        self.index_name = settings.endee_index_name
+        self.version = version or get_active_index()
+        self.index_name = self.version.name
         self._index = None
 
         self._ensure_index()
 
     def _ensure_index(self) -> None:
         """
-        Ensure the primary support_knowledge index exists in Endee.
-        """
-
-        settings = get_settings()
-        model_dim = self._infer_embedding_dimension()
+        Ensure the index of this version exists in Endee, creating it with the
+        version's precision if needed.
 
-        logger.info(
-            f"Ensuring Endee index '{self.index_name}' exists "
-            f"(dimension={model_dim}, space_type='cosine')."
-        )
+        The embedding dimension is only needed to create a missing index, so
+        an existing index is opened without touching the embedding model.
+        """
 
         existing = [idx["name"] for idx in self._client.list_indexes()]
         if self.index_name not in existing:
+            model_dim = self._infer_embedding_dimension()
+            logger.info(
+                f"Creating Endee index '{self.index_name}' "
+                f"(dimension={model_dim}, space_type='cosine', precision={self.version.precision})."
+            )
             self._client.create_index(
                 name=self.index_name,
                 dimension=model_dim,
                 space_type="cosine",
-                precision=Precision.INT8D,
+                precision=Precision(self.version.precision),
             )
             logger.info(f"Created Endee index '{self.index_name}'.")
         else:
@@ -56,23 +82,25 @@ class EndeeClientWrapper:
 
     def _infer_embedding_dimension(self) -> int:
         """
-        Infer embedding dimension by creating a small dummy vector.
-
-        We avoid importing the embedding model here to keep concerns
-        separated; in a more advanced setup we might share this value
-        via configuration.
+        Resolve the embedding dimension from settings or the cached model
+        manifest, falling back to loading the model and probing it.
         """
 
-        model = get_embedding_model()
-        sample_vector = model.encode("dimension-probe", convert_to_numpy=True)
-        return int(sample_vector.shape[0])
+        return get_embedding_dimension(self.version.model_name)
+
+    def list_index_names(self) -> List[str]:
+        return [idx["name"] for idx in self._client.list_indexes()]
 
     def describe_index(self) -> dict:
         return self._index.describe()
 
-    def upsert_support_items(self, items: List[SupportItem], vectors: List[List[float]]):
+    def upsert_support_items(self, items: List[SupportItem], vectors: Vectors):
         """
         Upsert a batch of support items into Endee.
+
+        A float32 matrix is kept as-is until the SDK boundary, where each row
+        is converted to the list the SDK expects exactly once; it is never
+        upcast to float64.
         """
 
         if not items:
@@ -81,8 +109,13 @@ class EndeeClientWrapper:
         if len(items) != len(vectors):
             raise ValueError("Number of items and vectors must match.")
 
+        if isinstance(vectors, np.ndarray):
+            rows = np.ascontiguousarray(vectors, dtype=np.float32).tolist()
+        else:
+            rows = vectors
+
         to_upsert: List[Dict[str, Any]] = []
-        for item, vector in zip(items, vectors):
+        for item, vector in zip(items, rows):
             to_upsert.append(
                 {
                     "id": item.id,
@@ -93,19 +126,180 @@ class EndeeClientWrapper:
             )
 
         logger.info(f"Upserting {len(to_upsert)} items into Endee index '{self.index_name}'.")
-        self._index.upsert(to_upsert)
+        get_endee_breaker().call(self._index.upsert, to_upsert)
+        invalidate_items([item.id for item in items])
+
+    def _get_vectors(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch the stored entries of `ids`; ids missing from the index are
+        left out. Endee has no multi-get, so the fetches run concurrently
+        (at most `endee_max_in_flight` at a time) as one call through the
+        Endee circuit breaker.
+        """
+
+        if not ids:
+            return {}
+
+        def _get(item_id: str) -> Optional[Dict[str, Any]]:
+            try:
+                return self._index.get_vector(item_id)
+            except NotFoundException:
+                return None
+
+        def _get_all() -> List[Optional[Dict[str, Any]]]:
+            workers = min(len(ids), max(1, get_settings().endee_max_in_flight))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="endee-get") as pool:
+                return list(pool.map(_get, ids))
+
+        fetched = get_endee_breaker().call(_get_all)
+        return {item_id: stored for item_id, stored in zip(ids, fetched) if stored is not None}
+
+    def update_support_items_metadata(self, items: List[SupportItem]) -> None:
+        """
+        Rewrite meta and filter fields of items that are already indexed,
+        without re-embedding them: the stored vectors are fetched and
+        upserted back with the new metadata.
+        """
+
+        if not items:
+            return
+
+        stored = self._get_vectors([item.id for item in items])
+        missing = [item.id for item in items if item.id not in stored]
+        if missing:
+            raise ValueError(
+                f"Items {missing[:10]} are not in Endee index '{self.index_name}'; "
+                "re-ingest them with force to write their vectors."
+            )
+        to_upsert: List[Dict[str, Any]] = []
+        for item in items:
+            to_upsert.append(
+                {
+                    "id": item.id,
+                    "vector": stored[item.id]["vector"],
+                    "meta": item.meta(),
+                    "filter": item.filter(),
+                }
+            )
+
+        logger.info(
+            f"Updating metadata of {len(to_upsert)} items in Endee index '{self.index_name}'."
+        )
+        get_endee_breaker().call(self._index.upsert, to_upsert)
+        invalidate_items([item.id for item in items])
+
+    def update_support_item_filters(self, items: List[SupportItem]) -> None:
+        """
+        Update only the filter fields of indexed items. Uses the SDK's
+        filter update endpoint when available and falls back to a metadata
+        rewrite otherwise.
+        """
+
+        if not items:
+            return
+
+        update_filters = getattr(self._index, "update_filters", None)
+        if update_filters is None:
+            self.update_support_items_metadata(items)
+            return
+
+        logger.info(f"Updating filters of {len(items)} items in Endee index '{self.index_name}'.")
+        get_endee_breaker().call(
+            update_filters, [{"id": item.id, "filter": item.filter()} for item in items]
+        )
+        invalidate_items([item.id for item in items])
+
+    def delete_support_items(self, ids: List[str]) -> int:
+        """
+        Delete items by id, concurrently (at most `endee_max_in_flight` calls
+        at a time), each through the Endee breaker. Returns the number of
+        items deleted; ids not in the index are not counted.
+        """
+
+        if not ids:
+            return 0
+
+        def _delete(item_id: str) -> bool:
+            try:
+                response = self._index.delete_vector(item_id)
+            except NotFoundException:
+                return False
+            # The SDK answers "<n> rows deleted".
+            count = str(response).split(" ", 1)[0]
+            return not count.isdigit() or int(count) > 0
+
+        logger.info(f"Deleting {len(ids)} items from Endee index '{self.index_name}'.")
+        breaker = get_endee_breaker()
+        workers = min(len(ids), max(1, get_settings().endee_max_in_flight))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="endee-delete") as pool:
+            deleted = list(pool.map(lambda item_id: breaker.call(_delete, item_id), ids))
+        invalidate_items(ids)
+        return sum(deleted)
+
+    def delete_support_items_by_filter(self, filters: List[Dict[str, Any]]) -> None:
+        """
+        Delete every item matching `filters` (same grammar as queries) in one
+        server-side call.
+        """
+
+        if not filters:
+            raise ValueError("Refusing to delete by an empty filter.")
+        logger.info(f"Deleting items matching {filters} from Endee index '{self.index_name}'.")
+        get_endee_breaker().call(self._index.delete_with_filter, filters)
+        invalidate_items(None)
+
+    def patch_support_items(self, updates: Dict[str, Dict[str, Any]]) -> List[SupportItem]:
+        """
+        Change fields of indexed items (e.g. `resolved`, `priority`) without
+        re-embedding: the stored vectors are fetched and upserted back with
+        the patched meta and filter fields. Ids missing from the index are
+        skipped. Returns the updated items.
+        """
+
+        updated: List[SupportItem] = []
+        to_upsert: List[Dict[str, Any]] = []
+        for item_id, stored in self._get_vectors(list(updates)).items():
+            item = replace(_stored_item(item_id, stored), **updates[item_id])
+            updated.append(item)
+            to_upsert.append(
+                {
+                    "id": item.id,
+                    "vector": stored["vector"],
+                    "meta": item.meta(),
+                    "filter": item.filter(),
+                }
+            )
+        if to_upsert:
+            logger.info(f"Patching {len(to_upsert)} items in Endee index '{self.index_name}'.")
+            get_endee_breaker().call(self._index.upsert, to_upsert)
+            invalidate_items([item.id for item in updated])
+        return updated
+
+    def get_support_items(self, ids: List[str]) -> List[SupportItem]:
+        """
+        Items as stored in the index (body = stored snippet); ids missing
+        from the index are left out.
+        """
+
+        return [
+            _stored_item(item_id, stored) for item_id, stored in self._get_vectors(ids).items()
+        ]
 
     def query(
         self,
-        vector: List[float],
+        vector: Union[np.ndarray, Sequence[float]],
         top_k: int = 10,
         filters: Optional[List[Dict[str, Any]]] = None,
         ef: int = 128,
     ) -> List[Dict[str, Any]]:
         """
-        Query the Endee index for nearest neighbours.
+        Query the Endee index for nearest neighbours. Fails fast with
+        CircuitOpenError while the Endee breaker is open.
         """
 
+        if isinstance(vector, np.ndarray):
+            vector = np.asarray(vector, dtype=np.float32).tolist()
+
         kwargs: Dict[str, Any] = {
             "vector": vector,
             "top_k": top_k,
@@ -114,20 +308,286 @@ class EndeeClientWrapper:
         if filters:
             kwargs["filter"] = filters
 
-        results = self._index.query(**kwargs)
-        return results
+        return get_endee_breaker().call(self._index.query, **kwargs)
+
 
+def _stored_item(item_id: str, stored: Dict[str, Any]) -> SupportItem:
+    # The SDK returns the filter fields as the JSON string Endee stores.
+    stored_filter = stored.get("filter") or {}
+    if isinstance(stored_filter, (str, bytes)):
+        stored_filter = orjson.loads(stored_filter)
+    return SupportItem.from_index(item_id, stored.get("meta") or {}, stored_filter)
 
-_endee_wrapper: Optional[EndeeClientWrapper] = None
+
+class SupportIndexBackend(Protocol):
+    """
+    Operations the rest of the app needs from the vector index. Implemented
+    by EndeeClientWrapper (Endee server) and LocalVectorIndex (in-process).
+    """
+
+    index_name: str
+
+    def describe_index(self) -> dict: ...
+
+    def list_index_names(self) -> List[str]: ...
+
+    def upsert_support_items(self, items: List[SupportItem], vectors: Vectors) -> None: ...
+
+    def update_support_items_metadata(self, items: List[SupportItem]) -> None: ...
+
+    def update_support_item_filters(self, items: List[SupportItem]) -> None: ...
+
+    def delete_support_items(self, ids: List[str]) -> int: ...
+
+    def delete_support_items_by_filter(self, filters: List[Dict[str, Any]]) -> None: ...
+
+    def patch_support_items(self, updates: Dict[str, Dict[str, Any]]) -> List[SupportItem]: ...
+
+    def get_support_items(self, ids: List[str]) -> List[SupportItem]: ...
+
+    def query(
+        self,
+        vector: Union[np.ndarray, Sequence[float]],
+        top_k: int = 10,
+        filters: Optional[List[Dict[str, Any]]] = None,
+        ef: int = 128,
+    ) -> List[Dict[str, Any]]: ...
+
+
+# One backend per index version in use: the active one, plus the next one
+# while it is being rebuilt or prepared for an alias switch.
+_endee_wrappers: Dict[str, SupportIndexBackend] = {}
+_endee_wrapper_lock = threading.Lock()
+
+
+def _create_backend(version: IndexVersion) -> SupportIndexBackend:
+    settings = get_settings()
+    if settings.vector_backend == "local":
+        from backend.app.services.local_index import LocalVectorIndex
+
+        logger.info(
+            f"Using the in-process vector index '{version.name}' at {settings.local_index_dir}."
+        )
+        return LocalVectorIndex(Path(settings.local_index_dir), version.name, version.precision)
+    if settings.vector_backend != "endee":
+        raise ValueError(f"Unknown vector backend '{settings.vector_backend}'.")
+    return EndeeClientWrapper(version)
+
+
+def get_endee_client(version: Optional[IndexVersion] = None) -> SupportIndexBackend:
+    """
+    Lazily construct and return the index backend of `version` (by default
+    the active index version): the Endee client wrapper, or the in-process
+    index when VECTOR_BACKEND=local.
+
+    Construction is serialised so that the background startup check and
+    early requests never build two wrappers.
+    """
+
+    version = version or get_active_index()
+    wrapper = _endee_wrappers.get(version.name)
+    if wrapper is None:
+        with _endee_wrapper_lock:
+            wrapper = _endee_wrappers.get(version.name)
+            if wrapper is None:
+                wrapper = _endee_wrappers[version.name] = _create_backend(version)
+    return wrapper
+
+
+def release_endee_client(version: IndexVersion) -> None:
+    """
+    Drop the backend of a version no longer in use. Calls already holding it
+    finish normally; it is re-opened if the alias switches back.
+    """
+
+    with _endee_wrapper_lock:
+        _endee_wrappers.pop(version.name, None)
+
+
+def _unzip_meta(data: bytes) -> Dict[str, Any]:
+    # Endee stores meta as zlib-compressed JSON; empty meta is sent as b"".
+    return orjson.loads(zlib.decompress(data)) if data else {}
 
 
-def get_endee_client() -> EndeeClientWrapper:
+# Status codes worth retrying: the request did not reach (or was shed by) Endee.
+TRANSIENT_STATUS_CODES = {429, 502, 503, 504}
+
+
+class AsyncEndeeClient:
     """
-    Lazily construct and return a singleton Endee client wrapper.
+    Async client for the Endee `/api/v1` HTTP API, used on the query path
+    instead of the synchronous SDK.
+
+    - one pooled keep-alive `httpx.AsyncClient` (HTTP/2 when enabled and `h2`
+      is installed)
+    - at most `endee_max_in_flight` concurrent calls; further calls wait for
+      a slot
+    - per-call timeouts
+    - transient failures (connection errors, timeouts, 429/502/503/504) are
+      retried with exponential backoff and full jitter
+
+    Search requests are JSON and responses msgpack rows, as with the SDK;
+    stored metadata is zlib-compressed JSON. Non-200 responses raise
+    httpx.HTTPStatusError. Each call names its index (by default the active
+    one), so one connection pool serves every index version.
     """
 
-    global _endee_wrapper
-    if _endee_wrapper is None:
-        _endee_wrapper = EndeeClientWrapper()
-    return _endee_wrapper
+    def __init__(self, base_url: Optional[str] = None) -> None:
+        settings = get_settings()
+        self.max_retries = settings.endee_max_retries
+        self.retry_backoff_ms = settings.endee_retry_backoff_ms
+        self.query_timeout = settings.endee_query_timeout_seconds
+        self._semaphore = asyncio.Semaphore(max(1, settings.endee_max_in_flight))
+        token = settings.endee_auth_token
+        self._headers = {"Authorization": token} if token else {}
+        self._index_info: Dict[str, Dict[str, Any]] = {}
+
+        http2 = settings.endee_http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("ENDEE_HTTP2 is set but 'h2' is not installed; using HTTP/1.1.")
+                http2 = False
+
+        self._client = httpx.AsyncClient(
+            base_url=(base_url or str(settings.endee_base_url)).rstrip("/"),
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.endee_max_connections,
+                max_keepalive_connections=settings.endee_max_connections,
+            ),
+            timeout=httpx.Timeout(
+                self.query_timeout, connect=settings.endee_connect_timeout_seconds
+            ),
+        )
+
+    async def _request(
+        self, method: str, path: str, timeout: float, op: str, **kwargs: Any
+    ) -> httpx.Response:
+        metrics = get_metrics()
+        headers = {**self._headers, **kwargs.pop("headers", {})}
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                async with self._semaphore:
+                    metrics.observe(f"endee_http.{op}.wait", (time.perf_counter() - start) * 1000)
+                    response = await self._client.request(
+                        method, path, headers=headers, timeout=timeout, **kwargs
+                    )
+                if response.status_code == 200:
+                    metrics.observe(f"endee_http.{op}", (time.perf_counter() - start) * 1000)
+                    return response
+                error: Exception = httpx.HTTPStatusError(
+                    f"Endee returned {response.status_code}: {response.text[:200]}",
+                    request=response.request,
+                    response=response,
+                )
+                if response.status_code not in TRANSIENT_STATUS_CODES:
+                    raise error
+            except httpx.TransportError as exc:
+                error = exc
+
+            if attempt >= self.max_retries:
+                metrics.increment(f"endee_http.{op}.failed")
+                raise error
+            attempt += 1
+            metrics.increment(f"endee_http.{op}.retry")
+            delay = random.uniform(0, self.retry_backoff_ms * (2 ** attempt)) / 1000
+            logger.warning(f"Endee {op} failed ({error!r}); retry {attempt} in {delay * 1000:.0f}ms.")
+            await asyncio.sleep(delay)
+
+    async def index_info(self, index_name: Optional[str] = None) -> Dict[str, Any]:
+        index_name = index_name or get_active_index().name
+        if index_name not in self._index_info:
+            response = await self._request(
+                "GET", f"/index/{index_name}/info", self.query_timeout, "info"
+            )
+            self._index_info[index_name] = response.json()
+        return self._index_info[index_name]
+
+    async def query(
+        self,
+        vector: Union[np.ndarray, Sequence[float]],
+        top_k: int = 10,
+        filters: Optional[List[Dict[str, Any]]] = None,
+        ef: int = 128,
+        index_name: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Query `index_name` (by default the active index); returns hits in the
+        same shape as the SDK's `Index.query` (id, similarity, distance,
+        meta, filter). Guarded by the Endee circuit breaker, like the SDK
+        path.
+        """
+
+        index_name = index_name or get_active_index().name
+        return await get_endee_breaker().acall(self._query, vector, top_k, filters, ef, index_name)
+
+    async def _query(
+        self,
+        vector: Union[np.ndarray, Sequence[float]],
+        top_k: int,
+        filters: Optional[List[Dict[str, Any]]],
+        ef: int,
+        index_name: str,
+    ) -> List[Dict[str, Any]]:
+        info = await self.index_info(index_name)
+        vec = np.asarray(vector, dtype=np.float32)
+        if info.get("space_type", "cosine") == "cosine":
+            vec = vec / max(float(np.sqrt(np.dot(vec, vec))), 1e-10)
+
+        body: Dict[str, Any] = {
+            "k": top_k,
+            "ef": ef,
+            "include_vectors": False,
+            "vector": vec.tolist(),
+        }
+        if filters:
+            body["filter"] = orjson.dumps(filters).decode("utf-8")
+
+        response = await self._request(
+            "POST", f"/index/{index_name}/search", self.query_timeout, "query", json=body
+        )
+        hits = []
+        for row in msgpack.unpackb(response.content, raw=False)[:top_k]:
+            hit = {
+                "id": row[1],
+                "similarity": row[0],
+                "distance": 1.0 - row[0],
+                "meta": _unzip_meta(row[2]),
+                "norm": row[4],
+            }
+            if row[3]:
+                hit["filter"] = orjson.loads(row[3])
+            hits.append(hit)
+        return hits
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+# httpx connection pools and asyncio semaphores belong to one event loop, so
+# there is one async client per running loop.
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncEndeeClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_async_endee_client() -> AsyncEndeeClient:
+    """
+    Return the async Endee client for the running event loop.
+    """
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = AsyncEndeeClient()
+    return client
+
 
+async def close_async_endee_client() -> None:
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -0,0 +1,182 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Dict, TypeVar
+
+from loguru import logger
+
+from backend.app.config import get_settings
+from backend.app.services.metrics import get_metrics
+
+T = TypeVar("T")
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """
+    Raised when a bounded executor has no free worker or queue slot left.
+    The API layer maps this to HTTP 429.
+    """
+
+    def __init__(self, name: str, capacity: int) -> None:
+        super().__init__(f"Executor '{name}' is saturated ({capacity} jobs in flight).")
+        self.name = name
+        self.capacity = capacity
+
+
+class BoundedExecutor:
+    """
+    Thread pool with a hard cap on running + queued jobs.
+
+    Blocking work (model inference, Endee SDK calls) is moved off the event
+    loop through `run`. Once `max_workers + max_queue` jobs are pending,
+    new submissions fail fast with ExecutorSaturatedError instead of queueing
+    without bound, which keeps tail latency predictable under overload.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int) -> None:
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix=f"{name}-worker"
+        )
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _acquire(self) -> None:
+        with self._lock:
+            if self._pending >= self.capacity:
+                get_metrics().increment(f"executor.{self.name}.rejected")
+                raise ExecutorSaturatedError(self.name, self.capacity)
+            self._pending += 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def _task(self, stage: str, fn: Callable[..., T], *args: Any, **kwargs: Any) -> Callable[[], T]:
+        # Called with a slot acquired; the task releases it when done.
+        metrics = get_metrics()
+        enqueued = time.perf_counter()
+
+        def _call() -> T:
+            started = time.perf_counter()
+            metrics.observe(f"executor.{self.name}.queue_wait", (started - enqueued) * 1000)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                metrics.observe(f"stage.{stage}", (time.perf_counter() - started) * 1000)
+                self._release()
+
+        return _call
+
+    async def run(self, stage: str, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Run `fn(*args, **kwargs)` on this pool and record queue wait and
+        execution latency under the given stage name.
+        """
+
+        self._acquire()
+        task = self._task(stage, fn, *args, **kwargs)
+        loop = asyncio.get_running_loop()
+        try:
+            future = loop.run_in_executor(self._pool, task)
+        except RuntimeError:
+            self._release()
+            raise
+        return await future
+
+    def call(self, stage: str, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Blocking variant of `run` for background threads (ingest jobs): runs
+        `fn` on this pool and waits for it. While the pool is saturated it
+        waits for a free slot instead of failing, so background work takes
+        its turn with requests rather than adding threads of its own.
+        """
+
+        delay = 0.01
+        while True:
+            try:
+                self._acquire()
+                break
+            except ExecutorSaturatedError:
+                time.sleep(delay)
+                delay = min(delay * 2, 0.5)
+        try:
+            future = self._pool.submit(self._task(stage, fn, *args, **kwargs))
+        except RuntimeError:
+            self._release()
+            raise
+        return future.result()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.max_workers,
+            "queue_size": self.max_queue,
+            "pending": self._pending,
+        }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+@lru_cache()
+def get_cpu_executor() -> BoundedExecutor:
+    """
+    Executor for CPU-bound work (embedding model inference).
+    """
+
+    settings = get_settings()
+    logger.info(
+        f"Starting CPU executor (workers={settings.cpu_workers}, queue={settings.cpu_queue_size})."
+    )
+    return BoundedExecutor("cpu", settings.cpu_workers, settings.cpu_queue_size)
+
+
+@lru_cache()
+def get_io_executor() -> BoundedExecutor:
+    """
+    Executor for I/O-bound work (Endee SDK calls, local index writes).
+    """
+
+    settings = get_settings()
+    logger.info(
+        f"Starting I/O executor (workers={settings.io_workers}, queue={settings.io_queue_size})."
+    )
+    return BoundedExecutor("io", settings.io_workers, settings.io_queue_size)
+
+
+async def run_cpu(stage: str, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    return await get_cpu_executor().run(stage, fn, *args, **kwargs)
+
+
+async def run_io(stage: str, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    return await get_io_executor().run(stage, fn, *args, **kwargs)
+
+
+def call_cpu(stage: str, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    return get_cpu_executor().call(stage, fn, *args, **kwargs)
+
+
+def executor_stats() -> Dict[str, Any]:
+    return {
+        "cpu": get_cpu_executor().stats(),
+        "io": get_io_executor().stats(),
+    }
+
+
+def shutdown_executors() -> None:
+    for getter in (get_cpu_executor, get_io_executor):
+        if getter.cache_info().currsize:
+            getter().shutdown()
+            getter.cache_clear()
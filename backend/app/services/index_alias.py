@@ -0,0 +1,233 @@
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from loguru import logger
+
+from backend.app.config import get_settings
+from backend.app.services.metrics import get_metrics
+
+
+@dataclass(frozen=True)
+class IndexVersion:
+    """
+    One physical index and the embedding model and precision it was built
+    with; queries against it must be encoded with the same model.
+    """
+
+    name: str
+    model_name: str
+    precision: str
+
+
+def default_index_version() -> IndexVersion:
+    """
+    The index configured in settings, used until an alias is written.
+    """
+
+    settings = get_settings()
+    if settings.vector_backend == "local":
+        precision = settings.local_index_precision
+    else:
+        precision = settings.endee_index_precision
+    return IndexVersion(settings.endee_index_name, settings.embedding_model_name, precision)
+
+
+def _read_alias(path: Path) -> Dict[str, Any]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as exc:
+        logger.warning(f"Ignoring unreadable index alias at {path}: {exc}")
+        return {}
+
+
+def _version(entry: Optional[Dict[str, Any]]) -> Optional[IndexVersion]:
+    if not entry:
+        return None
+    return IndexVersion(entry["name"], entry["model_name"], entry["precision"])
+
+
+class IndexAlias:
+    """
+    Resolves the index alias (`endee_index_name`) to the versioned index that
+    reads and writes go to.
+
+    The alias is a small JSON file shared by the API processes and the
+    scripts, replaced atomically on every switch. Each process checks its
+    mtime at most every `refresh_seconds`. A new target is first prepared
+    (`prepare`, e.g. loading its embedding model) on a background thread
+    while requests keep using the current version, then swapped in with a
+    single assignment, after which `on_switch(previous, active)` runs.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path],
+        default: IndexVersion,
+        refresh_seconds: float = 2.0,
+        prepare: Optional[Callable[[IndexVersion], None]] = None,
+        on_switch: Optional[Callable[[IndexVersion, IndexVersion], None]] = None,
+    ) -> None:
+        self.path = path
+        self.default = default
+        self.refresh_seconds = refresh_seconds
+        self._prepare = prepare
+        self._on_switch = on_switch
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._checked = time.monotonic()
+        self._mtime = self._stat()
+        self._active = self._target()
+
+    def _stat(self) -> Optional[int]:
+        if self.path is None:
+            return None
+        try:
+            return self.path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def _target(self) -> IndexVersion:
+        if self.path is None:
+            return self.default
+        return _version(_read_alias(self.path).get("active")) or self.default
+
+    @property
+    def active(self) -> IndexVersion:
+        now = time.monotonic()
+        if self.path is not None and now - self._checked >= self.refresh_seconds:
+            self._checked = now
+            if self._stat() != self._mtime and not self._refreshing:
+                self._refreshing = True
+                threading.Thread(
+                    target=self._refresh_in_background, name="index-alias", daemon=True
+                ).start()
+        return self._active
+
+    def _refresh_in_background(self) -> None:
+        try:
+            self.refresh()
+        except Exception as exc:
+            logger.warning(f"Index alias refresh failed ({exc}); keeping '{self._active.name}'.")
+        finally:
+            self._refreshing = False
+
+    def refresh(self) -> IndexVersion:
+        """
+        Re-read the alias file now and switch to its target if it changed,
+        preparing the new version first. Blocks until done.
+        """
+
+        with self._lock:
+            mtime = self._stat()
+            if mtime == self._mtime:
+                return self._active
+            target = self._target()
+            if target != self._active:
+                if self._prepare is not None:
+                    self._prepare(target)
+                previous, self._active = self._active, target
+                get_metrics().increment("index_alias.switch")
+                logger.info(f"Index alias switched from '{previous.name}' to '{target.name}'.")
+                if self._on_switch is not None:
+                    self._on_switch(previous, target)
+            self._mtime = mtime
+            return self._active
+
+    def previous(self) -> Optional[IndexVersion]:
+        if self.path is None:
+            return None
+        return _version(_read_alias(self.path).get("previous"))
+
+    def switch(self, target: IndexVersion) -> None:
+        """
+        Point the alias at `target`, keeping the version it replaces as
+        `previous` for rollback. The file is written next to the alias and
+        renamed over it, so readers see the old or the new alias, never a
+        partial one.
+        """
+
+        if self.path is None:
+            raise ValueError("Index alias is disabled (empty index_alias_path).")
+        current = self._target()
+        if current != target:
+            previous = asdict(current)
+        else:
+            previous = _read_alias(self.path).get("previous")
+        record = {"active": asdict(target), "previous": previous, "switched_at": time.time()}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(record, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
+        logger.info(f"Index alias now points at '{target.name}' (model {target.model_name}).")
+        self.refresh()
+
+    def rollback(self) -> IndexVersion:
+        """
+        Switch back to the version the last switch replaced.
+        """
+
+        previous = self.previous()
+        if previous is None:
+            raise ValueError("The index alias has no previous version to roll back to.")
+        self.switch(previous)
+        return previous
+
+    def snapshot(self) -> Dict[str, Any]:
+        previous = self.previous()
+        return {
+            "active": asdict(self._active),
+            "previous": asdict(previous) if previous is not None else None,
+        }
+
+
+def _prepare_version(version: IndexVersion) -> None:
+    # Loaded before the switch, so no request waits for the model or index.
+    from backend.app.services.embeddings import get_embedding_model
+    from backend.app.services.endee_client import get_endee_client
+
+    get_embedding_model(version.model_name)
+    get_endee_client(version)
+
+
+def _on_switch(previous: IndexVersion, active: IndexVersion) -> None:
+    # Cached query vectors and results belong to the previous model and index.
+    from backend.app.services.cache import (
+        get_embedding_cache,
+        get_fallback_cache,
+        invalidate_items,
+    )
+    from backend.app.services.endee_client import release_endee_client
+
+    get_embedding_cache().invalidate()
+    get_fallback_cache().invalidate()
+    invalidate_items(None)
+    release_endee_client(previous)
+
+
+@lru_cache()
+def get_index_alias() -> IndexAlias:
+    settings = get_settings()
+    path = Path(settings.index_alias_path) if settings.index_alias_path else None
+    return IndexAlias(
+        path,
+        default_index_version(),
+        settings.index_alias_refresh_seconds,
+        prepare=_prepare_version,
+        on_switch=_on_switch,
+    )
+
+
+def get_active_index() -> IndexVersion:
+    """
+    The index version reads and writes currently go to.
+    """
+
+    return get_index_alias().active
@@ -1,137 +1,558 @@
 import csv
 import json
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from itertools import islice
 from pathlib import Path
-from typing import List
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TypeVar
 
 from loguru import logger
 
+from backend.app.config import get_settings
 from backend.app.models.domain import SupportItem, SupportItemType
-from backend.app.services.embeddings import embed_texts
-from backend.app.services.endee_client import get_endee_client
+from backend.app.services.embeddings import embed_texts_array
+from backend.app.services.endee_client import SupportIndexBackend, Vectors, get_endee_client
+from backend.app.services.executors import call_cpu
+from backend.app.services.index_alias import IndexVersion, get_active_index
+from backend.app.services.lexical import get_lexical_index
+from backend.app.services.planner import get_filter_statistics
+from backend.app.services.manifest import (
+    CHUNK_ID_SEPARATOR,
+    IngestManifest,
+    IngestPlan,
+    get_ingest_manifest,
+)
 
 
 BASE_DIR = Path(__file__).resolve().parents[3]
 DATA_DIR = BASE_DIR / "data"
 
+T = TypeVar("T")
+
+
+def iter_tickets(path: Path) -> Iterator[SupportItem]:
+    """
+    Stream tickets from a CSV export one row at a time.
+    """
 
-def load_tickets(path: Path) -> List[SupportItem]:
-    items: List[SupportItem] = []
     with path.open(encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            resolved = None
-            if row.get("resolved", "").strip().lower() in ("true", "1", "yes"):
-                resolved = True
-            elif row.get("resolved", "").strip().lower() in ("false", "0", "no"):
-                resolved = False
-            try:
-                priority = int(row["priority"]) if row.get("priority") else None
-            except (ValueError, KeyError):
-                priority = None
-            if priority is not None and (priority < 0 or priority > 999):
-                priority = None
-            items.append(
-                SupportItem(
-                    id=row["id"],
-                    type=SupportItemType.TICKET,
-                    title=row["title"],
-                    body=row["description"],
-                    product=row.get("product") or None,
-                    severity=row.get("severity") or None,
-                    tags=[t.strip() for t in (row.get("tags") or "").split(",") if t.strip()],
-                    url=row.get("url") or None,
-                    resolved=resolved,
-                    priority=priority,
-                )
-            )
-    return items
+        for row in csv.DictReader(f):
+            yield _ticket_from_row(row)
 
 
-def load_faqs(path: Path) -> List[SupportItem]:
-    items: List[SupportItem] = []
+def iter_faqs(path: Path) -> Iterator[SupportItem]:
     with path.open(encoding="utf-8") as f:
         data = json.load(f)
     for entry in data:
-        p = entry.get("priority")
-        priority = int(p) if p is not None else None
-        if priority is not None and (priority < 0 or priority > 999):
-            priority = None
-        items.append(
-            SupportItem(
-                id=entry["id"],
-                type=SupportItemType.FAQ,
-                title=entry["question"],
-                body=entry["answer"],
-                product=entry.get("product"),
-                severity=None,
-                tags=entry.get("tags") or [],
-                url=entry.get("url"),
-                priority=priority,
-            )
-        )
-    return items
+        yield _faq_from_entry(entry)
 
 
-def load_runbooks(path: Path) -> List[SupportItem]:
-    items: List[SupportItem] = []
+def iter_runbooks(path: Path) -> Iterator[SupportItem]:
     with path.open(encoding="utf-8") as f:
         data = json.load(f)
     for entry in data:
-        steps = "\n".join(entry.get("steps", []))
-        p = entry.get("priority")
-        priority = int(p) if p is not None else None
-        if priority is not None and (priority < 0 or priority > 999):
-            priority = None
-        items.append(
-            SupportItem(
-                id=entry["id"],
-                type=SupportItemType.RUNBOOK,
-                title=entry["title"],
-                body=steps,
-                product=entry.get("product"),
-                severity=entry.get("severity"),
-                tags=entry.get("tags") or [],
-                url=entry.get("url"),
-                priority=priority,
+        yield _runbook_from_entry(entry)
+
+
+def load_tickets(path: Path) -> List[SupportItem]:
+    return list(iter_tickets(path))
+
+
+def load_faqs(path: Path) -> List[SupportItem]:
+    return list(iter_faqs(path))
+
+
+def load_runbooks(path: Path) -> List[SupportItem]:
+    return list(iter_runbooks(path))
+
+
+def _ticket_from_row(row: Dict[str, Any]) -> SupportItem:
+    resolved = None
+    if row.get("resolved", "").strip().lower() in ("true", "1", "yes"):
+        resolved = True
+    elif row.get("resolved", "").strip().lower() in ("false", "0", "no"):
+        resolved = False
+    try:
+        priority = int(row["priority"]) if row.get("priority") else None
+    except (ValueError, KeyError):
+        priority = None
+    if priority is not None and (priority < 0 or priority > 999):
+        priority = None
+    return SupportItem(
+        id=row["id"],
+        type=SupportItemType.TICKET,
+        title=row["title"],
+        body=row["description"],
+        product=row.get("product") or None,
+        severity=row.get("severity") or None,
+        tags=[t.strip() for t in (row.get("tags") or "").split(",") if t.strip()],
+        url=row.get("url") or None,
+        resolved=resolved,
+        priority=priority,
+    )
+
+
+def _faq_from_entry(entry: Dict[str, Any]) -> SupportItem:
+    p = entry.get("priority")
+    priority = int(p) if p is not None else None
+    if priority is not None and (priority < 0 or priority > 999):
+        priority = None
+    return SupportItem(
+        id=entry["id"],
+        type=SupportItemType.FAQ,
+        title=entry["question"],
+        body=entry["answer"],
+        product=entry.get("product"),
+        severity=None,
+        tags=entry.get("tags") or [],
+        url=entry.get("url"),
+        priority=priority,
+    )
+
+
+def _runbook_from_entry(entry: Dict[str, Any]) -> SupportItem:
+    steps = "\n".join(entry.get("steps", []))
+    p = entry.get("priority")
+    priority = int(p) if p is not None else None
+    if priority is not None and (priority < 0 or priority > 999):
+        priority = None
+    return SupportItem(
+        id=entry["id"],
+        type=SupportItemType.RUNBOOK,
+        title=entry["title"],
+        body=steps,
+        product=entry.get("product"),
+        severity=entry.get("severity"),
+        tags=entry.get("tags") or [],
+        url=entry.get("url"),
+        priority=priority,
+    )
+
+
+def item_from_payload(payload: Dict[str, Any]) -> SupportItem:
+    """
+    Build an item from an /ingest payload (the fields of IngestItemRequest).
+    """
+
+    return SupportItem(
+        id=payload["id"],
+        type=SupportItemType(payload["type"]),
+        title=payload["title"],
+        body=payload["body"],
+        product=payload.get("product"),
+        severity=payload.get("severity"),
+        tags=payload.get("tags"),
+        url=payload.get("url"),
+        resolved=payload.get("resolved"),
+        priority=payload.get("priority"),
+    )
+
+
+def iter_sample_items(data_dir: Path = DATA_DIR) -> Iterator[SupportItem]:
+    """
+    Stream all tickets, FAQs and runbooks found in the data/ directory,
+    in that order.
+    """
+
+    sources = [
+        ("tickets", data_dir / "tickets.csv", iter_tickets),
+        ("FAQs", data_dir / "faqs.json", iter_faqs),
+        ("runbooks", data_dir / "runbooks.json", iter_runbooks),
+    ]
+    for label, path, loader in sources:
+        if path.exists():
+            logger.info(f"Loading {label} from {path}")
+            yield from loader(path)
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """
+    Group an iterable into lists of at most `size` elements without
+    materialising it.
+    """
+
+    it = iter(items)
+    while True:
+        batch = list(islice(it, max(1, size)))
+        if not batch:
+            return
+        yield batch
+
+
+@dataclass
+class IngestStats:
+    ingested: int = 0
+    skipped: int = 0
+    batches: int = 0
+    embedded: int = 0
+    metadata_updated: int = 0
+    unchanged: int = 0
+    deleted: int = 0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def items_per_second(self) -> float:
+        return self.ingested / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+class IngestCheckpoint:
+    """
+    Records the id of the last item whose batch was upserted, so an
+    interrupted run can resume from there. Sources are streamed in a
+    deterministic order, which makes "skip up to and including last_id"
+    a valid resume point.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.last_id: Optional[str] = None
+        self.ingested = 0
+        if path.exists():
+            data = json.loads(path.read_text(encoding="utf-8"))
+            self.last_id = data.get("last_id")
+            self.ingested = int(data.get("ingested", 0))
+
+    def skip_completed(self, items: Iterable[SupportItem], stats: IngestStats) -> Iterator[SupportItem]:
+        it = iter(items)
+        if self.last_id is None:
+            yield from it
+            return
+        logger.info(f"Resuming ingestion after item '{self.last_id}' ({self.ingested} already ingested).")
+        for item in it:
+            stats.skipped += 1
+            if item.id == self.last_id:
+                break
+        else:
+            # Sources are read once, so the run cannot start over by itself.
+            raise ValueError(
+                f"Checkpoint {self.path} resumes after '{self.last_id}', which is not in "
+                "this source; delete the checkpoint to ingest from the start."
             )
+        yield from it
+
+    def save(self, last_id: str, ingested: int) -> None:
+        self.last_id = last_id
+        self.ingested = ingested
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps({"last_id": last_id, "ingested": ingested}), encoding="utf-8")
+        tmp.replace(self.path)
+
+    def clear(self) -> None:
+        if self.path.exists():
+            self.path.unlink()
+
+
+def split_windows(text: str, size: int, overlap: int) -> List[str]:
+    """
+    Split text into windows of at most `size` whitespace tokens, each
+    overlapping the previous one by `overlap` tokens.
+    """
+
+    words = text.split()
+    if size <= 0 or len(words) <= size:
+        return [text.strip()]
+    step = max(1, size - overlap)
+    windows = []
+    for start in range(0, len(words), step):
+        windows.append(" ".join(words[start : start + size]))
+        if start + size >= len(words):
+            break
+    return windows
+
+
+def chunk_items(items: List[SupportItem]) -> List[SupportItem]:
+    """
+    Replace items whose body exceeds `chunk_size_tokens` with overlapping
+    chunks `<id>#<n>`. Each chunk keeps the parent's title and fields, so it
+    is embedded as title + its part of the body and passes the same filters.
+    Short items are returned as they are.
+    """
+
+    settings = get_settings()
+    chunks: List[SupportItem] = []
+    for item in items:
+        windows = split_windows(
+            item.body, settings.chunk_size_tokens, settings.chunk_overlap_tokens
         )
-    return items
+        if len(windows) == 1:
+            chunks.append(item)
+            continue
+        for n, window in enumerate(windows):
+            chunk_id = f"{item.id}{CHUNK_ID_SEPARATOR}{n}"
+            chunks.append(replace(item, id=chunk_id, body=window, parent_id=item.id, chunk=n))
+    return chunks
 
 
-def ingest_all() -> None:
+def plan_items(
+    items: List[SupportItem], manifest: Optional[IngestManifest] = None, force: bool = False
+) -> IngestPlan:
     """
-    Ingest all sample data files from the data/ directory into Endee.
+    Chunk items and decide which chunks need encoding. Without a manifest (or
+    with `force`) every chunk is re-embedded. With a manifest, chunks left
+    over from an earlier, longer version of an item are marked superseded.
     """
 
-    tickets_file = DATA_DIR / "tickets.csv"
-    faqs_file = DATA_DIR / "faqs.json"
-    runbooks_file = DATA_DIR / "runbooks.json"
+    chunks = chunk_items(items)
+    if manifest is None:
+        return IngestPlan(embed=chunks)
+    plan = IngestPlan(embed=chunks) if force else manifest.plan(chunks)
+    current = {chunk.id for chunk in chunks}
+    for ids in manifest.chunk_ids([item.id for item in items]).values():
+        plan.superseded.extend(item_id for item_id in ids if item_id not in current)
+    return plan
 
-    items: List[SupportItem] = []
 
-    if tickets_file.exists():
-        logger.info(f"Loading tickets from {tickets_file}")
-        items.extend(load_tickets(tickets_file))
-    if faqs_file.exists():
-        logger.info(f"Loading FAQs from {faqs_file}")
-        items.extend(load_faqs(faqs_file))
-    if runbooks_file.exists():
-        logger.info(f"Loading runbooks from {runbooks_file}")
-        items.extend(load_runbooks(runbooks_file))
+def apply_plan(
+    plan: IngestPlan,
+    vectors: Vectors,
+    manifest: Optional[IngestManifest] = None,
+    run_id: Optional[str] = None,
+    client: Optional[SupportIndexBackend] = None,
+) -> None:
+    """
+    Write a planned batch to Endee (or `client`): full upserts for re-embedded
+    items, metadata/filter-only updates for the rest, then record it in the
+    manifest. The BM25 index and the filter statistics are updated as well.
+    """
 
-    if not items:
-        logger.warning("No data found to ingest. Ensure CSV/JSON files exist in data/.")
-        return
+    client = client or get_endee_client()
+    client.upsert_support_items(plan.embed, vectors)
+    client.update_support_items_metadata(plan.metadata)
+    client.update_support_item_filters(plan.filters)
+    if plan.superseded:
+        client.delete_support_items(plan.superseded)
+    # Unchanged items are indexed too if they predate these local indexes.
+    lexical = get_lexical_index()
+    if lexical is not None:
+        lexical.upsert(plan.written + [i for i in plan.unchanged if i.id not in lexical])
+    filter_stats = get_filter_statistics()
+    if filter_stats is not None:
+        filter_stats.update(plan.written + [i for i in plan.unchanged if i.id not in filter_stats])
+    for local in (lexical, filter_stats):
+        if local is not None:
+            local.remove(plan.superseded)
+    if manifest is not None:
+        manifest.remove(plan.superseded)
+        manifest.record(plan.written, run_id=run_id)
+        if run_id is not None and plan.unchanged:
+            manifest.mark_seen([item.id for item in plan.unchanged], run_id)
+
+
+# Fields that can be changed in place: they are stored in meta/filter only and
+# are not part of the embedding text.
+PATCHABLE_FIELDS = ("product", "severity", "tags", "url", "resolved", "priority")
+
+
+def _stored_ids(ids: List[str], manifest: Optional[IngestManifest]) -> Dict[str, List[str]]:
+    """
+    Ids under which each item is stored: its chunk ids if the manifest
+    recorded it as chunked, otherwise the id itself.
+    """
+
+    recorded = manifest.chunk_ids(list(ids)) if manifest is not None else {}
+    return {item_id: recorded.get(item_id) or [item_id] for item_id in ids}
+
+
+def _remove_local(ids: List[str], manifest: Optional[IngestManifest]) -> None:
+    for local in (get_lexical_index(), get_filter_statistics()):
+        if local is not None:
+            local.remove(ids)
+    if manifest is not None:
+        manifest.remove(ids)
+
+
+def delete_items(ids: List[str], manifest: Optional[IngestManifest] = None) -> int:
+    """
+    Delete items (and their chunks) from the index, the BM25 index, the
+    filter statistics and the manifest. Returns the number of stored
+    entries the index deleted (0 if none of them was indexed).
+    """
 
-    texts = [item.to_text() for item in items]
-    vectors = embed_texts(texts)
+    stored = [i for chunk_ids in _stored_ids(ids, manifest).values() for i in chunk_ids]
+    deleted = get_endee_client().delete_support_items(stored)
+    _remove_local(stored, manifest)
+    return deleted
 
-    client = get_endee_client()
-    client.upsert_support_items(items, vectors)
 
-    logger.info(f"Ingested {len(items)} support items into Endee.")
+def delete_items_by_filter(
+    filters: List[Dict[str, Any]], manifest: Optional[IngestManifest] = None
+) -> int:
+    """
+    Delete every item matching `filters` with one index call. The ids to
+    remove from the local structures are read from the filter fields the
+    manifest recorded for this index (without a manifest, from the filter
+    statistics or the BM25 index) before the delete; returns how many of
+    those were removed.
+    """
+
+    if manifest is not None:
+        ids = manifest.matching_ids(filters)
+    else:
+        local = get_filter_statistics() or get_lexical_index()
+        ids = local.matching_ids(filters) if local is not None else []
+    get_endee_client().delete_support_items_by_filter(filters)
+    _remove_local(ids, manifest)
+    return len(ids)
+
+
+def update_items(
+    updates: Dict[str, Dict[str, Any]], manifest: Optional[IngestManifest] = None
+) -> List[SupportItem]:
+    """
+    Apply partial updates `{item id: {field: value}}` of PATCHABLE_FIELDS
+    without running the embedding model; chunked items are updated chunk by
+    chunk. Returns the updated stored items.
+    """
+
+    for item_id, fields in updates.items():
+        unknown = set(fields) - set(PATCHABLE_FIELDS)
+        if unknown:
+            raise ValueError(f"Fields {sorted(unknown)} of '{item_id}' cannot be updated in place.")
+    stored_ids = _stored_ids(list(updates), manifest)
+    patches = {
+        stored: fields for item_id, fields in updates.items() for stored in stored_ids[item_id]
+    }
+    updated = get_endee_client().patch_support_items(patches)
+    lexical = get_lexical_index()
+    if lexical is not None:
+        lexical.update_metadata(updated)
+    filter_stats = get_filter_statistics()
+    if filter_stats is not None:
+        filter_stats.update(updated)
+    if manifest is not None:
+        manifest.record_metadata(updated)
+    return updated
+
+
+def ingest_stream(
+    items: Iterable[SupportItem],
+    batch_size: Optional[int] = None,
+    checkpoint_path: Optional[Path] = None,
+    manifest: Optional[IngestManifest] = None,
+    force: bool = False,
+    prune_missing: bool = False,
+    on_batch: Optional[Callable[[IngestStats], None]] = None,
+    version: Optional[IndexVersion] = None,
+) -> IngestStats:
+    """
+    Encode and upsert a stream of items in bounded batches.
+
+    At most two batches are held in memory: while batch N is being written
+    on a background thread, batch N+1 is read and encoded. Progress and
+    throughput are logged per batch. If `checkpoint_path` is set, the last
+    written id is persisted after each batch and a re-run resumes after it;
+    the checkpoint is removed once the stream completes.
+
+    With a manifest, only items whose embedding text changed are encoded,
+    metadata-only changes skip the model, and unchanged items are skipped.
+    `prune_missing` additionally deletes items recorded by earlier runs that
+    are no longer present in the stream (not done for resumed runs, which do
+    not see every item). `on_batch` is called with the running stats after
+    each written batch.
+
+    Items are written to `version` (by default the index version active when
+    the run starts) and encoded with its model, even if the alias switches
+    during the run. Encoding runs on the CPU executor, so ingest jobs share
+    its `cpu_workers` with API requests instead of competing with them for
+    cores.
+    """
+
+    settings = get_settings()
+    version = version or get_active_index()
+    client = get_endee_client(version)
+    batch_size = batch_size or settings.ingest_batch_size
+    checkpoint = IngestCheckpoint(checkpoint_path) if checkpoint_path else None
+    stats = IngestStats()
+    if checkpoint is not None:
+        stats.ingested = checkpoint.ingested
+        items = checkpoint.skip_completed(items, stats)
+
+    run_id = uuid.uuid4().hex
+    start = time.perf_counter()
+    resumed_from = stats.ingested
+
+    def _write(batch: List[SupportItem], plan: IngestPlan, vectors: Vectors) -> None:
+        apply_plan(plan, vectors, manifest, run_id, client)
+        stats.ingested += len(batch)
+        stats.batches += 1
+        stats.embedded += len(plan.embed)
+        stats.metadata_updated += len(plan.metadata) + len(plan.filters)
+        stats.unchanged += len(plan.unchanged)
+        if checkpoint is not None:
+            checkpoint.save(batch[-1].id, stats.ingested)
+        elapsed = time.perf_counter() - start
+        rate = (stats.ingested - resumed_from) / elapsed if elapsed else 0.0
+        logger.info(
+            f"Ingested {stats.ingested} items ({stats.batches} batches, {rate:.1f} items/s; "
+            f"embedded={stats.embedded} metadata_updated={stats.metadata_updated} "
+            f"unchanged={stats.unchanged})."
+        )
+        if on_batch is not None:
+            on_batch(stats)
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-upsert") as writer:
+        in_flight: Optional[Future] = None
+        for batch in batched(items, batch_size):
+            plan = plan_items(batch, manifest, force)
+            texts = [item.to_text() for item in plan.embed]
+            vectors = call_cpu("ingest_encode", embed_texts_array, texts, version.model_name)
+            if in_flight is not None:
+                in_flight.result()
+            in_flight = writer.submit(_write, batch, plan, vectors)
+        if in_flight is not None:
+            in_flight.result()
+
+    if prune_missing and manifest is not None:
+        if stats.skipped:
+            logger.info("Skipping deletion of missing items for a resumed run.")
+        else:
+            stale = manifest.stale_ids(run_id)
+            if stale:
+                client.delete_support_items(stale)
+                _remove_local(stale, manifest)
+                stats.deleted = len(stale)
+
+    stats.elapsed_seconds = time.perf_counter() - start
+    stats.ingested -= resumed_from
+    if checkpoint is not None:
+        checkpoint.clear()
+    return stats
+
+
+def ingest_all(
+    batch_size: Optional[int] = None,
+    checkpoint_path: Optional[Path] = None,
+    force: bool = False,
+) -> IngestStats:
+    """
+    Ingest all sample data files from the data/ directory into Endee.
+
+    Unchanged items are skipped and items removed from the files are deleted
+    when the ingest manifest is enabled; `force` re-embeds everything.
+    """
+
+    stats = ingest_stream(
+        iter_sample_items(),
+        batch_size=batch_size,
+        checkpoint_path=checkpoint_path,
+        manifest=get_ingest_manifest(),
+        force=force,
+        prune_missing=True,
+    )
+    if not stats.ingested and not stats.skipped:
+        logger.warning("No data found to ingest. Ensure CSV/JSON files exist in data/.")
+        return stats
+
+    logger.info(
+        f"Ingested {stats.ingested} support items into Endee in {stats.elapsed_seconds:.1f}s "
+        f"({stats.items_per_second:.1f} items/s; embedded={stats.embedded}, "
+        f"metadata_updated={stats.metadata_updated}, unchanged={stats.unchanged}, "
+        f"deleted={stats.deleted})."
+    )
+    return stats
 
 
 if __name__ == "__main__":
     ingest_all()
-
@@ -0,0 +1,457 @@
+import csv
+import json
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, List, Optional, TextIO
+
+from loguru import logger
+
+from backend.app.config import get_settings
+from backend.app.models.domain import SupportItem
+from backend.app.models.schemas import IngestItemRequest
+from backend.app.services.ingestion import (
+    IngestStats,
+    _faq_from_entry,
+    _runbook_from_entry,
+    _ticket_from_row,
+    ingest_stream,
+    item_from_payload,
+)
+from backend.app.services.manifest import get_ingest_manifest
+from backend.app.services.startup import get_startup_state
+
+# Job sources: /ingest payloads as a JSON array or JSON lines, or an uploaded
+# file in the format of data/tickets.csv, data/faqs.json or data/runbooks.json.
+JOB_SOURCES = ("items", "tickets", "faqs", "runbooks")
+MAX_JOB_ERRORS = 100
+# A JSON array element not complete within this many characters fails the job
+# (instead of reading the rest of a malformed payload into memory).
+MAX_ENTRY_CHARS = 16 * 1024 * 1024
+_WHITESPACE = re.compile(r"\s*")
+# A running job whose progress has not been updated for this long is
+# considered abandoned by a stopped process and is re-queued.
+STALE_JOB_SECONDS = 600
+
+_COLUMNS = (
+    "id, status, source, path, created_at, started_at, finished_at, total, processed, "
+    "embedded, metadata_updated, unchanged, failed_items, errors, error"
+)
+
+
+@dataclass
+class IngestJob:
+    id: str
+    status: str
+    source: str
+    path: str
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    total: Optional[int] = None
+    processed: int = 0
+    embedded: int = 0
+    metadata_updated: int = 0
+    unchanged: int = 0
+    failed_items: int = 0
+    errors: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def items_per_second(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+
+class IngestJobQueue:
+    """
+    SQLite-backed queue of ingest jobs. Payloads are spooled to files next
+    to the database, so a job survives a restart; jobs left `running` by a
+    stopped process are re-queued by `recover()` and resume from their
+    ingest checkpoint. Claims are atomic, so worker threads of several
+    server processes can share one queue.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        directory.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            str(directory / "jobs.sqlite"), check_same_thread=False, isolation_level=None
+        )
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ingest_jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    total INTEGER,
+                    processed INTEGER NOT NULL DEFAULT 0,
+                    embedded INTEGER NOT NULL DEFAULT 0,
+                    metadata_updated INTEGER NOT NULL DEFAULT 0,
+                    unchanged INTEGER NOT NULL DEFAULT 0,
+                    failed_items INTEGER NOT NULL DEFAULT 0,
+                    errors TEXT NOT NULL DEFAULT '[]',
+                    error TEXT,
+                    updated_at REAL
+                )
+                """
+            )
+
+    @staticmethod
+    def _job(row: tuple) -> IngestJob:
+        values = list(row)
+        values[13] = json.loads(values[13])
+        return IngestJob(*values)
+
+    def spool_path(self, job_id: str, source: str) -> Path:
+        suffix = {"items": ".jsonl", "tickets": ".csv"}.get(source, ".json")
+        return self.directory / f"{job_id}{suffix}"
+
+    def checkpoint_path(self, job_id: str) -> Path:
+        return self.directory / f"{job_id}.checkpoint.json"
+
+    def new_job_id(self) -> str:
+        return uuid.uuid4().hex
+
+    def submit(self, job_id: str, source: str, total: Optional[int] = None) -> IngestJob:
+        """
+        Queue a job whose payload has been written to `spool_path(job_id, source)`.
+        """
+
+        if source not in JOB_SOURCES:
+            raise ValueError(f"Unknown ingest job source '{source}'.")
+        path = str(self.spool_path(job_id, source))
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO ingest_jobs (id, status, source, path, created_at, total) "
+                "VALUES (?, 'queued', ?, ?, ?, ?)",
+                (job_id, source, path, time.time(), total),
+            )
+        logger.info(f"Queued ingest job {job_id} ({source}).")
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM ingest_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._job(row) if row else None
+
+    def list(self, limit: int = 20) -> List[IngestJob]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM ingest_jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [self._job(row) for row in rows]
+
+    def claim(self) -> Optional[IngestJob]:
+        """
+        Mark the oldest queued job as running and return it, or None.
+        """
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id FROM ingest_jobs WHERE status = 'queued' "
+                    "ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE ingest_jobs SET status = 'running', started_at = ?, "
+                        "updated_at = ?, processed = 0, failed_items = 0, errors = '[]' "
+                        "WHERE id = ?",
+                        (time.time(), time.time(), row[0]),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(row[0]) if row else None
+
+    def recover(self) -> int:
+        """
+        Re-queue jobs left running by a process that stopped mid-job, i.e.
+        without progress for `STALE_JOB_SECONDS` (jobs of live sibling
+        processes keep updating theirs).
+        """
+
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE ingest_jobs SET status = 'queued' "
+                "WHERE status = 'running' AND updated_at < ?",
+                (time.time() - STALE_JOB_SECONDS,),
+            )
+        if cursor.rowcount:
+            logger.warning(f"Re-queued {cursor.rowcount} interrupted ingest jobs.")
+        return cursor.rowcount
+
+    def update(self, job_id: str, **values: Any) -> None:
+        if "errors" in values:
+            values["errors"] = json.dumps(values["errors"][:MAX_JOB_ERRORS])
+        values["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in values)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE ingest_jobs SET {assignments} WHERE id = ?", (*values.values(), job_id)
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def iter_job_items(job: IngestJob, on_error: Callable[[str], None]) -> Iterator[SupportItem]:
+    """
+    Stream the items of a job's payload. Rows or entries that cannot be
+    turned into an item (for `items` jobs, that fail IngestItemRequest's
+    validation) are reported to `on_error` and skipped.
+    """
+
+    path = Path(job.path)
+    if job.source == "tickets":
+        with path.open(encoding="utf-8", newline="") as f:
+            entries: Iterable[Any] = csv.DictReader(f)
+            yield from _parse_entries(entries, _ticket_from_row, "row", on_error, start=2)
+        return
+    if job.source == "items":
+        with path.open(encoding="utf-8") as f:
+            if f.read(4096).lstrip().startswith("["):
+                f.seek(0)
+                yield from _parse_entries(_iter_json_array(f), _payload_item, "item", on_error)
+            else:
+                f.seek(0)
+                lines = (line for line in f if line.strip())
+                yield from _parse_entries(lines, _line_item, "line", on_error)
+        return
+    with path.open(encoding="utf-8") as f:
+        entries = json.load(f)
+    if not isinstance(entries, list):
+        raise ValueError(f"Expected a JSON array of {job.source}.")
+    parser = _faq_from_entry if job.source == "faqs" else _runbook_from_entry
+    yield from _parse_entries(entries, parser, "entry", on_error)
+
+
+def _payload_item(entry: Any) -> SupportItem:
+    # Rows are checked against the /ingest schema, as the API checks its body.
+    return item_from_payload(IngestItemRequest.parse_obj(entry).dict())
+
+
+def _line_item(line: str) -> SupportItem:
+    return _payload_item(json.loads(line))
+
+
+def _iter_json_array(f: TextIO, chunk_size: int = 1 << 16) -> Iterator[Any]:
+    """
+    Yield the elements of the JSON array in `f`, decoding one element at a
+    time from a buffer of a few chunks, so the array is never held in memory
+    as a whole.
+    """
+
+    decoder = json.JSONDecoder()
+    buffer = f.read(chunk_size).lstrip()
+    if not buffer.startswith("["):
+        raise ValueError("Expected a JSON array of items.")
+    pos, separated = 1, True
+    while True:
+        pos = _WHITESPACE.match(buffer, pos).end()
+        if pos == len(buffer):
+            chunk = f.read(chunk_size)
+            if not chunk:
+                raise ValueError("Unterminated JSON array of items.")
+            buffer, pos = chunk, 0
+            continue
+        if buffer[pos] == "]":
+            return
+        if not separated:
+            if buffer[pos] != ",":
+                raise ValueError(f"Expected ',' between items, found {buffer[pos]!r}.")
+            pos, separated = pos + 1, True
+            continue
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            chunk = f.read(chunk_size)
+            if not chunk or len(buffer) - pos > MAX_ENTRY_CHARS:
+                raise
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        if end == len(buffer):
+            # A bare number may continue in the next chunk.
+            chunk = f.read(chunk_size)
+            if chunk:
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+        yield value
+        pos, separated = end, False
+
+
+def _parse_entries(
+    entries: Iterable[Any],
+    parser: Callable[[Any], SupportItem],
+    label: str,
+    on_error: Callable[[str], None],
+    start: int = 1,
+) -> Iterator[SupportItem]:
+    for n, entry in enumerate(entries, start=start):
+        try:
+            item = parser(entry)
+            if not item.id or not item.title:
+                raise ValueError("missing id or title")
+        except (KeyError, TypeError, ValueError, AttributeError) as exc:
+            on_error(f"{label} {n}: {exc!r}")
+            continue
+        yield item
+
+
+def run_job(queue: IngestJobQueue, job: IngestJob) -> None:
+    """
+    Ingest a claimed job with the streaming ingester (batched encoding and
+    upserts, manifest-based skipping of unchanged items), recording progress
+    after every batch. The spooled payload is removed once the job succeeds.
+    """
+
+    errors: List[str] = []
+    failed = 0
+
+    def _on_error(message: str) -> None:
+        nonlocal failed
+        failed += 1
+        if len(errors) < MAX_JOB_ERRORS:
+            errors.append(message)
+
+    def _on_batch(stats: IngestStats) -> None:
+        queue.update(
+            job.id,
+            processed=stats.ingested,
+            embedded=stats.embedded,
+            metadata_updated=stats.metadata_updated,
+            unchanged=stats.unchanged,
+            failed_items=failed,
+            errors=errors,
+        )
+
+    logger.info(f"Running ingest job {job.id} ({job.source}).")
+    try:
+        stats = ingest_stream(
+            iter_job_items(job, _on_error),
+            checkpoint_path=queue.checkpoint_path(job.id),
+            manifest=get_ingest_manifest(),
+            on_batch=_on_batch,
+        )
+    except Exception as exc:
+        logger.opt(exception=exc).error("Ingest job {} failed: {}", job.id, exc)
+        queue.update(
+            job.id,
+            status="failed",
+            finished_at=time.time(),
+            failed_items=failed,
+            errors=errors,
+            error=repr(exc),
+        )
+        return
+
+    queue.update(
+        job.id,
+        status="succeeded",
+        finished_at=time.time(),
+        total=stats.ingested + stats.skipped + failed,
+        processed=stats.ingested + stats.skipped,
+        failed_items=failed,
+        errors=errors,
+    )
+    Path(job.path).unlink(missing_ok=True)
+    logger.info(
+        f"Ingest job {job.id} done: {stats.ingested} items in {stats.elapsed_seconds:.1f}s "
+        f"({stats.items_per_second:.1f} items/s, {failed} failed)."
+    )
+
+
+class IngestJobWorkers:
+    """
+    Background threads draining the ingest job queue. Each runs one job at a
+    time; idle workers poll every `poll_seconds`. Jobs are only started once
+    startup (Endee index check, model warm-up) has finished.
+    """
+
+    def __init__(self, queue: IngestJobQueue, workers: int, poll_seconds: float) -> None:
+        self.queue = queue
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"ingest-job-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if not get_startup_state().ready:
+                self._stop.wait(self.poll_seconds)
+                continue
+            try:
+                job = self.queue.claim()
+                if job is None:
+                    self.queue.recover()
+            except sqlite3.OperationalError as exc:
+                # Another process holds the write lock.
+                logger.debug(f"Ingest job queue busy: {exc}")
+                job = None
+            if job is None:
+                self._stop.wait(self.poll_seconds)
+                continue
+            run_job(self.queue, job)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Stop polling. A job still running is left to finish in its daemon
+        thread, or is re-queued at the next start if the process exits first.
+        """
+
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
+
+
+@lru_cache()
+def get_ingest_job_queue() -> IngestJobQueue:
+    return IngestJobQueue(Path(get_settings().ingest_jobs_dir))
+
+
+_workers: Optional[IngestJobWorkers] = None
+
+
+def start_ingest_workers() -> None:
+    global _workers
+    settings = get_settings()
+    if _workers is not None or settings.ingest_job_workers <= 0:
+        return
+    _workers = IngestJobWorkers(
+        get_ingest_job_queue(), settings.ingest_job_workers, settings.ingest_job_poll_seconds
+    )
+    _workers.start()
+    logger.info(f"Started {settings.ingest_job_workers} ingest job workers.")
+
+
+def stop_ingest_workers() -> None:
+    global _workers
+    if _workers is not None:
+        _workers.stop()
+        _workers = None
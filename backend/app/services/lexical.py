@@ -0,0 +1,402 @@
+import json
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter
+from dataclasses import replace
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from backend.app.config import get_settings
+from backend.app.models.domain import SearchResultItem, SupportItem, SupportItemType
+from backend.app.services.local_index import matches_filters
+
+# Identifier-like tokens ("err_conn_reset", "vpn-gw-3", "tck-1001", "v1.2") are
+# kept whole and also split into their parts.
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_./:][a-z0-9]+)*")
+_SPLIT_RE = re.compile(r"[-_./:]")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it of on or our that the "
+    "this to was were what when where which who why will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    tokens: List[str] = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        tokens.append(token)
+        if _SPLIT_RE.search(token):
+            tokens.extend(part for part in _SPLIT_RE.split(token) if part not in _STOPWORDS)
+    return tokens
+
+
+def lexical_text(item: SupportItem) -> str:
+    """
+    Text indexed for an item: the embedding text plus the fields people
+    search for verbatim (id, product, tags).
+    """
+
+    return " ".join([item.to_text(), item.id, item.product or "", *(item.tags or [])])
+
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS lexical_docs (
+        id TEXT PRIMARY KEY,
+        length INTEGER NOT NULL,
+        meta TEXT NOT NULL,
+        filter TEXT NOT NULL
+    )
+    """,
+    # impact: the BM25 term-frequency factor when the posting was written,
+    # by which a search picks the postings of a term to score first.
+    """
+    CREATE TABLE IF NOT EXISTS lexical_postings (
+        term TEXT NOT NULL,
+        id TEXT NOT NULL,
+        tf INTEGER NOT NULL,
+        impact REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (term, id)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS lexical_terms (
+        term TEXT PRIMARY KEY,
+        df INTEGER NOT NULL
+    ) WITHOUT ROWID
+    """,
+    "CREATE TABLE IF NOT EXISTS lexical_totals (docs INTEGER NOT NULL, length INTEGER NOT NULL)",
+    "INSERT INTO lexical_totals SELECT 0, 0 WHERE NOT EXISTS (SELECT 1 FROM lexical_totals)",
+)
+
+_DERIVED = (
+    "CREATE INDEX IF NOT EXISTS lexical_postings_id ON lexical_postings (id)",
+    "CREATE INDEX IF NOT EXISTS lexical_postings_impact ON lexical_postings (term, impact DESC)",
+    # Document count and total length for BM25 follow every insert and delete.
+    """
+    CREATE TRIGGER IF NOT EXISTS lexical_docs_added AFTER INSERT ON lexical_docs BEGIN
+        UPDATE lexical_totals SET docs = docs + 1, length = length + new.length;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS lexical_docs_removed AFTER DELETE ON lexical_docs BEGIN
+        UPDATE lexical_totals SET docs = docs - 1, length = length - old.length;
+        DELETE FROM lexical_postings WHERE id = old.id;
+    END
+    """,
+    # So does the document frequency of every term.
+    """
+    CREATE TRIGGER IF NOT EXISTS lexical_postings_added AFTER INSERT ON lexical_postings BEGIN
+        INSERT INTO lexical_terms VALUES (new.term, 1)
+            ON CONFLICT (term) DO UPDATE SET df = df + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS lexical_postings_removed AFTER DELETE ON lexical_postings BEGIN
+        UPDATE lexical_terms SET df = df - 1 WHERE term = old.term;
+        DELETE FROM lexical_terms WHERE term = old.term AND df = 0;
+    END
+    """,
+)
+
+
+class BM25Index:
+    """
+    BM25 inverted index over support items, stored in SQLite: one row per
+    item (length, meta, filter fields) and one per (term, item) posting.
+
+    Every write touches only the rows of the items written, in one
+    transaction, so API processes, workers and ingestion runs sharing the
+    file see each other's updates without reloading and never overwrite
+    each other. A search reads the document frequency of its query terms
+    and at most `postings_per_term` postings of each (0: all), those with
+    the highest impact first, so common terms cost no more than rare ones.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        k1: float = 1.2,
+        b: float = 0.75,
+        postings_per_term: int = 1000,
+    ) -> None:
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.postings_per_term = postings_per_term
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            str(path) if path is not None else ":memory:", check_same_thread=False, timeout=30
+        )
+        self._lock = threading.Lock()
+        with self._lock:
+            # Readers do not block the writer (and vice versa) across processes.
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            with self._conn:
+                for statement in _SCHEMA:
+                    self._conn.execute(statement)
+                self._migrate()
+                for statement in _DERIVED:
+                    self._conn.execute(statement)
+
+    def _migrate(self) -> None:
+        # Indexes written before impacts and document frequencies were stored.
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(lexical_postings)")}
+        if "impact" not in columns:
+            self._conn.execute(
+                "ALTER TABLE lexical_postings ADD COLUMN impact REAL NOT NULL DEFAULT 0"
+            )
+            docs, length = self._conn.execute("SELECT docs, length FROM lexical_totals").fetchone()
+            if docs:
+                self._conn.execute(
+                    "UPDATE lexical_postings SET impact = tf * 1.0 / (tf + ? * (1 - ? + ? * "
+                    "(SELECT length FROM lexical_docs d WHERE d.id = lexical_postings.id) / ?))",
+                    (self.k1, self.b, self.b, length / docs),
+                )
+        if not self._conn.execute("SELECT 1 FROM lexical_terms LIMIT 1").fetchone():
+            self._conn.execute(
+                "INSERT INTO lexical_terms SELECT term, COUNT(*) FROM lexical_postings GROUP BY term"
+            )
+
+    def _impact(self, tf: int, length: int, avg_length: float) -> float:
+        return tf / (tf + self.k1 * (1 - self.b + self.b * length / avg_length))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT docs FROM lexical_totals").fetchone()[0]
+
+    def __contains__(self, item_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM lexical_docs WHERE id = ?", (item_id,)
+            ).fetchone()
+        return row is not None
+
+    def upsert(self, items: Iterable[SupportItem]) -> None:
+        docs: Dict[str, Tuple[str, int, str, str]] = {}
+        counts: Dict[str, Counter] = {}
+        for item in items:
+            tokens = tokenize(lexical_text(item))
+            docs[item.id] = (
+                item.id,
+                len(tokens),
+                json.dumps(item.meta(), default=str),
+                json.dumps(item.filter(), default=str),
+            )
+            counts[item.id] = Counter(tokens)
+        if not docs:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM lexical_docs WHERE id = ?", [(i,) for i in docs])
+            self._conn.executemany("INSERT INTO lexical_docs VALUES (?, ?, ?, ?)", docs.values())
+            n, total_length = self._conn.execute(
+                "SELECT docs, length FROM lexical_totals"
+            ).fetchone()
+            avg_length = total_length / n or 1.0
+            self._conn.executemany(
+                "INSERT INTO lexical_postings VALUES (?, ?, ?, ?)",
+                [
+                    (term, item_id, tf, self._impact(tf, docs[item_id][1], avg_length))
+                    for item_id, terms in counts.items()
+                    for term, tf in terms.items()
+                ],
+            )
+
+    def remove(self, ids: Iterable[str]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM lexical_docs WHERE id = ?", [(i,) for i in ids])
+
+    def update_metadata(self, items: Iterable[SupportItem]) -> None:
+        """
+        Replace the stored meta and filter fields of indexed items, keeping
+        their term counts (for updates that do not touch the text).
+        """
+
+        rows = [
+            (json.dumps(item.meta(), default=str), json.dumps(item.filter(), default=str), item.id)
+            for item in items
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE lexical_docs SET meta = ?, filter = ? WHERE id = ?", rows
+            )
+
+    def matching_ids(self, filters: List[Dict[str, Any]]) -> List[str]:
+        with self._lock:
+            return [
+                item_id
+                for item_id, values in self._conn.execute("SELECT id, filter FROM lexical_docs")
+                if matches_filters(json.loads(values), filters)
+            ]
+
+    def _filters_of(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        placeholders = ",".join("?" for _ in ids)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, filter FROM lexical_docs WHERE id IN ({placeholders})", ids
+            ).fetchall()
+        return {item_id: json.loads(values) for item_id, values in rows}
+
+    def search(
+        self, query: str, top_k: int, filters: Optional[List[Dict[str, Any]]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Return up to `top_k` (id, BM25 score) pairs for docs matching at
+        least one query term and all `filters`.
+        """
+
+        terms = sorted(set(tokenize(query)))
+        if not terms:
+            return []
+        placeholders = ",".join("?" for _ in terms)
+        limit = self.postings_per_term or -1
+        with self._lock:
+            n, total_length = self._conn.execute(
+                "SELECT docs, length FROM lexical_totals"
+            ).fetchone()
+            if not n:
+                return []
+            df = dict(
+                self._conn.execute(
+                    f"SELECT term, df FROM lexical_terms WHERE term IN ({placeholders})", terms
+                )
+            )
+            postings = {
+                term: self._conn.execute(
+                    "SELECT p.id, p.tf, d.length FROM lexical_postings p "
+                    "JOIN lexical_docs d ON d.id = p.id WHERE p.term = ? "
+                    "ORDER BY p.impact DESC LIMIT ?",
+                    (term, limit),
+                ).fetchall()
+                for term in df
+            }
+
+        avg_length = total_length / n
+        k1, b = self.k1, self.b
+        scores: Dict[str, float] = {}
+        for term, rows in postings.items():
+            idf = math.log(1 + (n - df[term] + 0.5) / (df[term] + 0.5))
+            for item_id, tf, length in rows:
+                norm = k1 * (1 - b + b * length / avg_length)
+                scores[item_id] = scores.get(item_id, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+        if not filters:
+            return ranked[:top_k]
+
+        # Filter fields are read for the best-ranked candidates only.
+        hits: List[Tuple[str, float]] = []
+        for start in range(0, len(ranked), 200):
+            window = ranked[start : start + 200]
+            values = self._filters_of([item_id for item_id, _ in window])
+            for item_id, score in window:
+                if item_id in values and matches_filters(values[item_id], filters):
+                    hits.append((item_id, score))
+                    if len(hits) == top_k:
+                        return hits
+        return hits
+
+    def result_items(self, ids: List[str]) -> Dict[str, SearchResultItem]:
+        """
+        Search results (score 0.0) built from the stored meta of `ids`;
+        ids no longer indexed are left out.
+        """
+
+        if not ids:
+            return {}
+        placeholders = ",".join("?" for _ in ids)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, meta FROM lexical_docs WHERE id IN ({placeholders})", ids
+            ).fetchall()
+        return {item_id: _result_item(item_id, json.loads(meta)) for item_id, meta in rows}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _result_item(item_id: str, meta: Dict[str, Any]) -> SearchResultItem:
+    return SearchResultItem(
+        id=meta.get("parent_id") or item_id,
+        type=SupportItemType(meta.get("type", "ticket")),
+        title=meta.get("title") or meta.get("question") or "Untitled",
+        snippet=meta.get("snippet") or "",
+        product=meta.get("product"),
+        severity=meta.get("severity"),
+        score=0.0,
+        url=meta.get("url"),
+        resolved=meta.get("resolved"),
+    )
+
+
+@lru_cache()
+def get_lexical_index() -> Optional[BM25Index]:
+    """
+    Return the process-wide BM25 index, or None when hybrid retrieval is
+    disabled (HYBRID_FUSION=off or empty LEXICAL_INDEX_PATH).
+    """
+
+    settings = get_settings()
+    if settings.hybrid_fusion == "off" or not settings.lexical_index_path:
+        return None
+    return BM25Index(
+        Path(settings.lexical_index_path), postings_per_term=settings.lexical_postings_per_term
+    )
+
+
+def fuse_results(
+    vector_results: List[SearchResultItem],
+    lexical_hits: List[Tuple[str, float]],
+    index: BM25Index,
+) -> List[SearchResultItem]:
+    """
+    Combine ANN and BM25 rankings.
+
+    rrf: score = sum over both lists of 1 / (k + rank), divided by its
+    maximum 2 / (k + 1) so it stays within [0, 1].
+    weighted: score = (1 - w) * cosine + w * bm25 / max(bm25).
+
+    Items only found lexically are built from the metadata in the BM25 index;
+    chunk hits are reported under their parent item.
+    """
+
+    if not lexical_hits:
+        return vector_results
+    settings = get_settings()
+    by_id: Dict[str, SearchResultItem] = {r.id: r for r in vector_results}
+    lexical_items = index.result_items([doc_id for doc_id, _ in lexical_hits])
+    # Chunks of one item collapse onto their best-ranked hit.
+    collapsed: Dict[str, float] = {}
+    for doc_id, score in lexical_hits:
+        lexical_item = lexical_items.get(doc_id)
+        if lexical_item is None:
+            continue
+        if lexical_item.id not in collapsed:
+            collapsed[lexical_item.id] = score
+            by_id.setdefault(lexical_item.id, lexical_item)
+    lexical_hits = list(collapsed.items())
+
+    fused: Dict[str, float] = {}
+    if settings.hybrid_fusion == "weighted":
+        w = settings.hybrid_lexical_weight
+        top_bm25 = lexical_hits[0][1] or 1.0
+        for result in vector_results:
+            fused[result.id] = (1 - w) * result.score
+        for item_id, score in lexical_hits:
+            fused[item_id] = fused.get(item_id, 0.0) + w * score / top_bm25
+    else:
+        k = settings.hybrid_rrf_k
+        for rank, result in enumerate(vector_results, start=1):
+            fused[result.id] = 1.0 / (k + rank)
+        for rank, (item_id, _) in enumerate(lexical_hits, start=1):
+            fused[item_id] = fused.get(item_id, 0.0) + 1.0 / (k + rank)
+        scale = (k + 1) / 2.0
+        fused = {item_id: score * scale for item_id, score in fused.items()}
+
+    ordered = sorted(fused.items(), key=lambda kv: kv[1], reverse=True)
+    return [replace(by_id[item_id], score=round(score, 6)) for item_id, score in ordered]
@@ -0,0 +1,312 @@
+import asyncio
+import json
+import random
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+from loguru import logger
+
+from backend.app.config import get_settings
+from backend.app.services.metrics import get_metrics
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+Messages = List[Dict[str, str]]
+
+
+class LLMHTTPError(RuntimeError):
+    def __init__(self, status_code: int, body: str) -> None:
+        super().__init__(f"LLM provider returned {status_code}: {body[:200]}")
+        self.status_code = status_code
+
+
+@dataclass
+class Completion:
+    text: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+class OpenAIProvider:
+    """
+    OpenAI-compatible `/chat/completions` over one pooled `httpx.AsyncClient`.
+    Cancelling a call closes its HTTP request.
+    """
+
+    def __init__(self, base_url: str, api_key: str, model: str, max_connections: int) -> None:
+        self.model = model
+        self._client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            headers={"Authorization": f"Bearer {api_key}"},
+            limits=httpx.Limits(
+                max_connections=max_connections, max_keepalive_connections=max_connections
+            ),
+            # Deadlines are enforced per call by LLMClient.
+            timeout=None,
+        )
+
+    def _body(self, messages: Messages, stream: bool) -> Dict[str, Any]:
+        body: Dict[str, Any] = {"model": self.model, "messages": messages, "temperature": 0.3}
+        if stream:
+            body["stream"] = True
+            body["stream_options"] = {"include_usage": True}
+        return body
+
+    async def complete(self, messages: Messages) -> Completion:
+        response = await self._client.post("/chat/completions", json=self._body(messages, False))
+        if response.status_code != 200:
+            raise LLMHTTPError(response.status_code, response.text)
+        data = response.json()
+        usage = data.get("usage") or {}
+        choices = data.get("choices") or [{}]
+        return Completion(
+            text=(choices[0].get("message") or {}).get("content") or "",
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0),
+        )
+
+    async def stream(self, messages: Messages, usage: Dict[str, int]) -> AsyncIterator[str]:
+        """
+        Yield content deltas; token usage from the final chunk is written
+        into `usage`.
+        """
+
+        async with self._client.stream(
+            "POST", "/chat/completions", json=self._body(messages, True)
+        ) as response:
+            if response.status_code != 200:
+                raise LLMHTTPError(response.status_code, (await response.aread()).decode())
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                payload = line[len("data: ") :]
+                if payload == "[DONE]":
+                    break
+                chunk = json.loads(payload)
+                if chunk.get("usage"):
+                    usage.update(chunk["usage"])
+                for choice in chunk.get("choices") or []:
+                    text = (choice.get("delta") or {}).get("content")
+                    if text:
+                        yield text
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+class FakeLLMProvider:
+    """
+    Local stand-in provider for tests and demos (LLM_PROVIDER=fake). Replies
+    with `reply`, or an echo of the last prompt line, after `delay_seconds`;
+    the first `fail_times` calls fail with a retryable 503. Counts calls,
+    cancellations and the peak number of concurrent calls.
+    """
+
+    def __init__(
+        self, reply: Optional[str] = None, delay_seconds: float = 0.0, fail_times: int = 0
+    ) -> None:
+        self.reply = reply
+        self.delay_seconds = delay_seconds
+        self.fail_times = fail_times
+        self.calls = 0
+        self.cancelled = 0
+        self.active = 0
+        self.max_active = 0
+
+    def _reply(self, messages: Messages) -> str:
+        if self.reply is not None:
+            return self.reply
+        last_line = messages[-1]["content"].strip().splitlines()[-1]
+        return f"Suggested reply (fake provider): {last_line}"
+
+    async def _begin(self) -> None:
+        self.calls += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay_seconds)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.active -= 1
+        if self.calls <= self.fail_times:
+            raise LLMHTTPError(503, "fake provider failure")
+
+    async def complete(self, messages: Messages) -> Completion:
+        await self._begin()
+        text = self._reply(messages)
+        prompt_tokens = sum(len(m["content"].split()) for m in messages)
+        return Completion(text, prompt_tokens, len(text.split()))
+
+    async def stream(self, messages: Messages, usage: Dict[str, int]) -> AsyncIterator[str]:
+        await self._begin()
+        words = self._reply(messages).split(" ")
+        for i, word in enumerate(words):
+            yield word if i == len(words) - 1 else word + " "
+        usage.update(
+            prompt_tokens=sum(len(m["content"].split()) for m in messages),
+            completion_tokens=len(words),
+        )
+
+    async def aclose(self) -> None:
+        pass
+
+
+def _create_provider():
+    settings = get_settings()
+    if settings.llm_provider == "fake":
+        return FakeLLMProvider()
+    return OpenAIProvider(
+        settings.llm_base_url,
+        settings.llm_api_key or "",
+        settings.llm_model,
+        settings.llm_max_concurrency,
+    )
+
+
+class LLMClient:
+    """
+    Shared async LLM client for answer generation.
+
+    - at most `llm_max_concurrency` calls in flight per process; further
+      calls wait for a slot (reported as `llm.wait`)
+    - each attempt is bounded by `llm_timeout_seconds` (for streams: the gap
+      between tokens) and cancelled, not abandoned, when it runs over
+    - timeouts, connection errors and 408/409/429/5xx are retried up to
+      `llm_max_retries` times with exponential backoff and full jitter;
+      streams are only retried before their first token
+    - latency (`llm.complete`, `llm.first_token`, `llm.stream`), retries,
+      failures and token usage (`llm.tokens.prompt`, `llm.tokens.completion`)
+      are recorded in the metrics registry
+    """
+
+    def __init__(self, provider=None) -> None:
+        settings = get_settings()
+        self.provider = provider or _create_provider()
+        self.timeout = settings.llm_timeout_seconds
+        self.max_retries = max(0, settings.llm_max_retries)
+        self.retry_backoff_ms = settings.llm_retry_backoff_ms
+        self._semaphore = asyncio.Semaphore(max(1, settings.llm_max_concurrency))
+
+    @staticmethod
+    def _messages(system_prompt: str, user_prompt: str) -> Messages:
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
+
+    @staticmethod
+    def _retryable(exc: Exception) -> bool:
+        if isinstance(exc, LLMHTTPError):
+            return exc.status_code in RETRYABLE_STATUS_CODES
+        return isinstance(exc, (asyncio.TimeoutError, httpx.TransportError))
+
+    async def _backoff(self, attempt: int, exc: Exception) -> None:
+        get_metrics().increment("llm.retry")
+        delay = random.uniform(0, self.retry_backoff_ms * (2 ** attempt)) / 1000
+        logger.warning(f"LLM call failed ({exc!r}); retry {attempt} in {delay * 1000:.0f}ms.")
+        await asyncio.sleep(delay)
+
+    def _failed(self, exc: Exception) -> None:
+        metrics = get_metrics()
+        metrics.increment("llm.failed")
+        if isinstance(exc, asyncio.TimeoutError):
+            metrics.increment("llm.timeout")
+
+    @staticmethod
+    def _record_usage(prompt_tokens: int, completion_tokens: int) -> None:
+        metrics = get_metrics()
+        metrics.increment("llm.tokens.prompt", prompt_tokens)
+        metrics.increment("llm.tokens.completion", completion_tokens)
+
+    async def complete(self, system_prompt: str, user_prompt: str) -> Completion:
+        metrics = get_metrics()
+        messages = self._messages(system_prompt, user_prompt)
+        attempt = 0
+        while True:
+            waited = time.perf_counter()
+            try:
+                async with self._semaphore:
+                    start = time.perf_counter()
+                    metrics.observe("llm.wait", (start - waited) * 1000)
+                    completion = await asyncio.wait_for(
+                        self.provider.complete(messages), self.timeout
+                    )
+                metrics.observe("llm.complete", (time.perf_counter() - start) * 1000)
+                self._record_usage(completion.prompt_tokens, completion.completion_tokens)
+                return completion
+            except Exception as exc:
+                if not self._retryable(exc) or attempt >= self.max_retries:
+                    self._failed(exc)
+                    raise
+                attempt += 1
+                await self._backoff(attempt, exc)
+
+    async def stream(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        metrics = get_metrics()
+        messages = self._messages(system_prompt, user_prompt)
+        attempt = 0
+        while True:
+            sent = False
+            usage: Dict[str, int] = {}
+            waited = time.perf_counter()
+            try:
+                async with self._semaphore:
+                    start = time.perf_counter()
+                    metrics.observe("llm.wait", (start - waited) * 1000)
+                    tokens = self.provider.stream(messages, usage)
+                    try:
+                        while True:
+                            try:
+                                token = await asyncio.wait_for(tokens.__anext__(), self.timeout)
+                            except StopAsyncIteration:
+                                break
+                            if not sent:
+                                sent = True
+                                metrics.observe(
+                                    "llm.first_token", (time.perf_counter() - start) * 1000
+                                )
+                            yield token
+                    finally:
+                        await tokens.aclose()
+                metrics.observe("llm.stream", (time.perf_counter() - start) * 1000)
+                self._record_usage(usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0))
+                return
+            except Exception as exc:
+                if sent or not self._retryable(exc) or attempt >= self.max_retries:
+                    self._failed(exc)
+                    raise
+                attempt += 1
+                await self._backoff(attempt, exc)
+
+    async def aclose(self) -> None:
+        await self.provider.aclose()
+
+
+# One client per event loop: its semaphore and connection pool belong to the
+# loop they were created on.
+_llm_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, LLMClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_llm_client() -> LLMClient:
+    """
+    Return the LLM client for the running event loop.
+    """
+
+    loop = asyncio.get_running_loop()
+    client = _llm_clients.get(loop)
+    if client is None:
+        client = _llm_clients[loop] = LLMClient()
+    return client
+
+
+async def close_llm_client() -> None:
+    client = _llm_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -0,0 +1,439 @@
+import json
+import sqlite3
+import threading
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+from loguru import logger
+
+from backend.app.models.domain import SupportItem
+from backend.app.services.cache import invalidate_items
+
+# Rows scored per matrix product; bounds the float32 copy made from int8 rows.
+SCAN_CHUNK_ROWS = 16384
+MAX_CACHED_MASKS = 256
+
+
+def matches_filters(values: Dict[str, Any], filters: Optional[List[Dict[str, Any]]]) -> bool:
+    """
+    Evaluate the Endee filter grammar emitted by `build_filter_clauses`
+    against one item's filter fields: a list of `{field: {op: operand}}`
+    clauses, all of which must hold. Supported ops are `$eq`, `$in` and
+    `$range` (inclusive `[lo, hi]`).
+    """
+
+    for clause in filters or []:
+        for field, condition in clause.items():
+            value = values.get(field)
+            for op, operand in condition.items():
+                if op == "$eq":
+                    ok = value == operand
+                elif op == "$in":
+                    ok = value in operand
+                elif op == "$range":
+                    ok = value is not None and operand[0] <= value <= operand[1]
+                else:
+                    raise ValueError(f"Unsupported filter operator '{op}' on '{field}'.")
+                if not ok:
+                    return False
+    return True
+
+
+class LocalVectorIndex:
+    """
+    In-process replacement for the Endee index, with the same methods as
+    EndeeClientWrapper.
+
+    Vectors are L2-normalised (cosine similarity) and stored in an append-only
+    memory-mapped matrix, either as float32 or as int8 with one float32 scale
+    per row. Ids, meta and filter fields live in SQLite and are mirrored in
+    memory. Search is an exact scan of the rows that pass the filters, so
+    results are also a recall reference for Endee's approximate search.
+    Deleted rows are tombstoned, not reclaimed.
+
+    Processes may share an index (prefork workers, ingest jobs, the
+    scripts). Every write is one SQLite transaction holding the write lock:
+    it allocates rows from the committed row count, writes their vectors
+    before committing them, and stamps the rows it touches with a new
+    sequence number. Each call first mirrors the rows stamped since the
+    sequence it last saw, so every process sees the others' writes.
+    """
+
+    GROWTH_ROWS = 4096
+
+    def __init__(self, directory: Path, index_name: str, precision: str = "int8") -> None:
+        if precision not in ("int8", "float32"):
+            raise ValueError(f"Unsupported local index precision '{precision}'.")
+        self.index_name = index_name
+        self.directory = Path(directory) / index_name
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._vectors_path = self.directory / "vectors.bin"
+        self._scales_path = self.directory / "scales.bin"
+        self._lock = threading.RLock()
+
+        # Autocommit mode: transactions are opened explicitly in _write.
+        self._db = sqlite3.connect(
+            str(self.directory / "index.sqlite"),
+            check_same_thread=False,
+            timeout=30,
+            isolation_level=None,
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            "row INTEGER PRIMARY KEY, id TEXT NOT NULL, meta TEXT NOT NULL, "
+            "filter TEXT NOT NULL, alive INTEGER NOT NULL, changed INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT)")
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(items)")}
+        if "changed" not in columns:
+            self._db.execute("ALTER TABLE items ADD COLUMN changed INTEGER NOT NULL DEFAULT 0")
+        self.precision = precision
+        self.dimension: Optional[int] = None
+
+        self._ids: List[str] = []
+        self._meta: List[Dict[str, Any]] = []
+        self._filters: List[Dict[str, Any]] = []
+        self._row_of: Dict[str, int] = {}
+        self._alive = np.zeros(0, dtype=bool)
+        # Sequence number of the last write mirrored; -1 loads every row.
+        self._seq = -1
+
+        # Filter masks over all rows, keyed by filter JSON; dropped on any write.
+        self._masks: Dict[str, np.ndarray] = {}
+        self._vectors: Optional[np.memmap] = None
+        self._scales: Optional[np.memmap] = None
+        with self._lock:
+            self._refresh()
+
+    @property
+    def count(self) -> int:
+        return len(self._ids)
+
+    @property
+    def _dtype(self) -> np.dtype:
+        return np.dtype(np.int8 if self.precision == "int8" else np.float32)
+
+    def _open(self, min_rows: int) -> None:
+        row_bytes = self.dimension * self._dtype.itemsize
+        size = self._vectors_path.stat().st_size if self._vectors_path.exists() else 0
+        capacity = size // row_bytes
+        if capacity < min_rows:
+            capacity = max(min_rows, capacity + self.GROWTH_ROWS)
+            self._flush()
+            self._vectors = self._scales = None
+            with self._vectors_path.open("ab") as f:
+                f.truncate(capacity * row_bytes)
+            with self._scales_path.open("ab") as f:
+                f.truncate(capacity * 4)
+        if self._vectors is None or self._vectors.shape[0] < capacity:
+            self._vectors = np.memmap(
+                self._vectors_path, dtype=self._dtype, mode="r+", shape=(capacity, self.dimension)
+            )
+            self._scales = np.memmap(
+                self._scales_path, dtype=np.float32, mode="r+", shape=(capacity,)
+            )
+
+    def _flush(self) -> None:
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._scales.flush()
+
+    def _encode(self, matrix: np.ndarray) -> tuple:
+        """
+        Normalise rows and quantise them for storage. int8 rows use a
+        symmetric per-row scale: v ~= q * scale.
+        """
+
+        norms = np.maximum(np.linalg.norm(matrix, axis=1), 1e-10)
+        matrix = matrix / norms[:, None]
+        if self.precision == "float32":
+            return matrix.astype(np.float32), np.ones(len(matrix), dtype=np.float32)
+        scales = np.maximum(np.abs(matrix).max(axis=1), 1e-10) / 127.0
+        quantised = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+        return quantised, scales.astype(np.float32)
+
+    def _refresh(self) -> None:
+        """
+        Mirror the rows written (by any process) since the last refresh:
+        appended rows are added, changed rows replace their meta, filter
+        fields and liveness.
+        """
+
+        info = dict(self._db.execute("SELECT key, value FROM info").fetchall())
+        seq = int(info.get("seq", 0))
+        if seq == self._seq:
+            return
+        if "dimension" in info:
+            self.precision = info["precision"]
+            self.dimension = int(info["dimension"])
+        changed = self._db.execute(
+            "SELECT row, id, meta, filter, alive FROM items WHERE changed > ? ORDER BY row",
+            (self._seq,),
+        ).fetchall()
+        appended = [row for row, *_ in changed if row >= self.count]
+        if appended:
+            self._alive = np.concatenate([self._alive, np.zeros(len(appended), dtype=bool)])
+        for row, item_id, meta, filt, is_alive in changed:
+            if row >= len(self._ids):
+                self._ids.append(item_id)
+                self._meta.append(json.loads(meta))
+                self._filters.append(json.loads(filt))
+            else:
+                self._meta[row] = json.loads(meta)
+                self._filters[row] = json.loads(filt)
+            self._alive[row] = bool(is_alive)
+            # Rows come in order, so a re-upserted id ends on its newest row.
+            if is_alive:
+                self._row_of[item_id] = row
+            elif self._row_of.get(item_id) == row:
+                del self._row_of[item_id]
+        self._masks.clear()
+        self._seq = seq
+        if self.dimension is not None and (
+            self._vectors is None or self._vectors.shape[0] < self.count
+        ):
+            self._open(max(self.count, 1))
+
+    def _write(self, apply: Callable[[int], Any]) -> Any:
+        """
+        Run `apply(seq)` in one transaction holding the write lock, after
+        catching up with committed writes; `seq` stamps the rows it writes.
+        The in-memory view is refreshed from what was committed.
+        """
+
+        with self._lock:
+            # IMMEDIATE takes the write lock before rows are allocated.
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._refresh()
+                seq = self._seq + 1
+                result = apply(seq)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO info (key, value) VALUES ('seq', ?)", (str(seq),)
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                if self._db.execute("SELECT 1 FROM info WHERE key = 'dimension'").fetchone() is None:
+                    # A first write that was rolled back does not fix the dimension.
+                    self.dimension = None
+                    self._vectors = self._scales = None
+                raise
+            self._refresh()
+            return result
+
+    def _save_info(self) -> None:
+        values = {"precision": self.precision, "dimension": self.dimension}
+        self._db.executemany(
+            "INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)",
+            [(k, str(v)) for k, v in values.items()],
+        )
+
+    def list_index_names(self) -> List[str]:
+        return sorted(p.parent.name for p in self.directory.parent.glob("*/index.sqlite"))
+
+    def describe_index(self) -> dict:
+        with self._lock:
+            self._refresh()
+        return {
+            "name": self.index_name,
+            "backend": "local",
+            "space_type": "cosine",
+            "dimension": self.dimension,
+            "precision": self.precision,
+            "count": len(self._row_of),
+            "rows": self.count,
+        }
+
+    def upsert_support_items(
+        self, items: List[SupportItem], vectors: Union[np.ndarray, Sequence[Sequence[float]]]
+    ) -> None:
+        if not items:
+            return
+        if len(items) != len(vectors):
+            raise ValueError("Number of items and vectors must match.")
+        matrix = np.asarray(vectors, dtype=np.float32)
+
+        def _append(seq: int) -> None:
+            if self.dimension is None:
+                self.dimension = int(matrix.shape[1])
+                self._save_info()
+            elif matrix.shape[1] != self.dimension:
+                raise ValueError(
+                    f"Local index '{self.index_name}' has dimension {self.dimension}, "
+                    f"got {matrix.shape[1]}."
+                )
+            encoded, scales = self._encode(matrix)
+            # Re-upserted ids get a fresh row; the old one becomes a tombstone.
+            replaced = [self._row_of[item.id] for item in items if item.id in self._row_of]
+            start = self.count
+            self._open(start + len(items))
+            self._vectors[start : start + len(items)] = encoded
+            self._scales[start : start + len(items)] = scales
+            self._flush()
+
+            rows = [
+                (
+                    start + offset,
+                    item.id,
+                    json.dumps(item.meta(), default=str),
+                    json.dumps(item.filter()),
+                    1,
+                    seq,
+                )
+                for offset, item in enumerate(items)
+            ]
+            self._db.executemany(
+                "UPDATE items SET alive = 0, changed = ? WHERE row = ?",
+                [(seq, row) for row in replaced],
+            )
+            self._db.executemany(
+                "INSERT INTO items (row, id, meta, filter, alive, changed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+        self._write(_append)
+        logger.info(f"Upserted {len(items)} items into local index '{self.index_name}'.")
+        invalidate_items([item.id for item in items])
+
+    def update_support_items_metadata(self, items: List[SupportItem]) -> None:
+        if not items:
+            return
+
+        def _update(seq: int) -> None:
+            updates = [
+                (json.dumps(item.meta(), default=str), json.dumps(item.filter()), seq, row)
+                for item in items
+                for row in [self._row_of.get(item.id)]
+                if row is not None
+            ]
+            self._db.executemany(
+                "UPDATE items SET meta = ?, filter = ?, changed = ? WHERE row = ?", updates
+            )
+
+        self._write(_update)
+        invalidate_items([item.id for item in items])
+
+    def update_support_item_filters(self, items: List[SupportItem]) -> None:
+        self.update_support_items_metadata(items)
+
+    def delete_support_items(self, ids: List[str]) -> int:
+        if not ids:
+            return 0
+        deleted = self._write(
+            lambda seq: self._tombstone(seq, [self._row_of[i] for i in ids if i in self._row_of])
+        )
+        invalidate_items(ids)
+        return deleted
+
+    def _tombstone(self, seq: int, rows: List[int]) -> int:
+        self._db.executemany(
+            "UPDATE items SET alive = 0, changed = ? WHERE row = ?", [(seq, row) for row in rows]
+        )
+        return len(rows)
+
+    def delete_support_items_by_filter(self, filters: List[Dict[str, Any]]) -> None:
+        if not filters:
+            raise ValueError("Refusing to delete by an empty filter.")
+        ids: List[str] = []
+
+        def _delete(seq: int) -> int:
+            rows = np.flatnonzero(self._alive & self._filter_mask(filters)).tolist()
+            ids.extend(self._ids[row] for row in rows)
+            return self._tombstone(seq, rows)
+
+        self._write(_delete)
+        invalidate_items(ids)
+
+    def patch_support_items(self, updates: Dict[str, Dict[str, Any]]) -> List[SupportItem]:
+        updated: List[SupportItem] = []
+        with self._lock:
+            self._refresh()
+            for item_id, fields in updates.items():
+                row = self._row_of.get(item_id)
+                if row is None:
+                    continue
+                stored = SupportItem.from_index(item_id, self._meta[row], self._filters[row])
+                updated.append(replace(stored, **fields))
+        self.update_support_items_metadata(updated)
+        return updated
+
+    def get_support_items(self, ids: List[str]) -> List[SupportItem]:
+        with self._lock:
+            self._refresh()
+            rows = [(item_id, self._row_of.get(item_id)) for item_id in ids]
+            return [
+                SupportItem.from_index(item_id, self._meta[row], self._filters[row])
+                for item_id, row in rows
+                if row is not None
+            ]
+
+    def query(
+        self,
+        vector: Union[np.ndarray, Sequence[float]],
+        top_k: int = 10,
+        filters: Optional[List[Dict[str, Any]]] = None,
+        ef: int = 128,
+    ) -> List[Dict[str, Any]]:
+        """
+        Exact cosine search over live rows passing `filters`. `ef` is accepted
+        for interface compatibility and ignored.
+        """
+
+        with self._lock:
+            self._refresh()
+            if self.dimension is None or not self._row_of:
+                return []
+            q = np.asarray(vector, dtype=np.float32)
+            q = q / max(float(np.linalg.norm(q)), 1e-10)
+
+            mask = self._alive
+            if filters:
+                mask = mask & self._filter_mask(filters)
+            candidates = np.flatnonzero(mask)
+            if candidates.size == 0:
+                return []
+
+            scores = np.empty(candidates.size, dtype=np.float32)
+            for start in range(0, candidates.size, SCAN_CHUNK_ROWS):
+                rows = candidates[start : start + SCAN_CHUNK_ROWS]
+                block = np.asarray(self._vectors[rows], dtype=np.float32)
+                scores[start : start + rows.size] = (block @ q) * self._scales[rows]
+
+            k = min(top_k, candidates.size)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [
+                {
+                    "id": self._ids[candidates[i]],
+                    "similarity": float(scores[i]),
+                    "distance": 1.0 - float(scores[i]),
+                    "meta": self._meta[candidates[i]],
+                    "filter": self._filters[candidates[i]],
+                }
+                for i in top
+            ]
+
+    def _filter_mask(self, filters: List[Dict[str, Any]]) -> np.ndarray:
+        key = json.dumps(filters, sort_keys=True)
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = np.fromiter(
+                (matches_filters(values, filters) for values in self._filters),
+                dtype=bool,
+                count=self.count,
+            )
+            if len(self._masks) >= MAX_CACHED_MASKS:
+                self._masks.pop(next(iter(self._masks)))
+            self._masks[key] = mask
+        return mask
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush()
+            self._vectors = self._scales = None
+            self._db.close()
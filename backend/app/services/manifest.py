@@ -0,0 +1,380 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+from backend.app.config import get_settings
+from backend.app.models.domain import SupportItem
+from backend.app.services.index_alias import IndexVersion, get_active_index
+
+# Chunks of a long item are stored as `<item id>#<chunk number>`.
+CHUNK_ID_SEPARATOR = "#"
+
+@dataclass
+class ItemHashes:
+    text: str
+    meta: str
+    filter: str
+
+
+def _digest(payload: str) -> str:
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def item_hashes(item: SupportItem, model_name: str) -> ItemHashes:
+    """
+    Hash the three parts of an item that end up in Endee. The embedding model
+    name is folded into the text hash so a model change forces a re-encode.
+    """
+
+    return ItemHashes(
+        text=_digest(f"{model_name}\n{item.to_text()}"),
+        meta=_digest(json.dumps(item.meta(), sort_keys=True, default=str)),
+        filter=_digest(json.dumps(item.filter(), sort_keys=True, default=str)),
+    )
+
+
+@dataclass
+class IngestPlan:
+    """
+    How each item in a batch has to be written:
+    - embed: new or text changed; needs encoding and a full upsert
+    - metadata: text unchanged but meta changed; rewrite meta/filter only
+    - filters: only filter fields changed; update filters only
+    - unchanged: nothing to do
+    - superseded: ids of chunks (or unchunked items) replaced by a new
+      chunking of the same item; deleted
+    """
+
+    embed: List[SupportItem] = field(default_factory=list)
+    metadata: List[SupportItem] = field(default_factory=list)
+    filters: List[SupportItem] = field(default_factory=list)
+    unchanged: List[SupportItem] = field(default_factory=list)
+    superseded: List[str] = field(default_factory=list)
+
+    @property
+    def written(self) -> List[SupportItem]:
+        return self.embed + self.metadata + self.filters
+
+
+# Row b is the item of row a, or one of its chunks: ids between "<a.id>#" and
+# "<a.id>$" ("$" follows "#"), which an index range scan finds.
+_SAME_ITEM = "(b.id = a.id OR (b.id >= a.id || ? AND b.id < a.id || ?))"
+_CHUNK_RANGE = (CHUNK_ID_SEPARATOR, chr(ord(CHUNK_ID_SEPARATOR) + 1))
+
+
+def _filter_json(item: SupportItem) -> str:
+    return json.dumps(item.filter(), sort_keys=True, default=str)
+
+
+class IngestManifest:
+    """
+    Local SQLite record of what has been written to each Endee index, keyed
+    by (index name, item id), used to skip re-embedding unchanged items, to
+    find items that disappeared from the source files, and (through the
+    filter fields recorded with each write) to find the items a filter
+    matches. The body written for each id is kept as well, since the index
+    only stores a snippet, so that an index can be rebuilt from another.
+    """
+
+    def __init__(self, path: Path, index_name: str, model_name: str) -> None:
+        self.path = path
+        self.index_name = index_name
+        self.model_name = model_name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS manifest (
+                    index_name TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    meta_hash TEXT NOT NULL,
+                    filter_hash TEXT NOT NULL,
+                    last_run TEXT,
+                    updated_at REAL NOT NULL,
+                    filter TEXT,
+                    body TEXT,
+                    PRIMARY KEY (index_name, id)
+                )
+                """
+            )
+            # Manifests from before filter fields or bodies were recorded:
+            # clearing a hash makes the next ingest rewrite every item's
+            # metadata (without re-embedding it) and record what is missing.
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(manifest)")}
+            if "filter" not in columns:
+                self._conn.execute("ALTER TABLE manifest ADD COLUMN filter TEXT")
+                self._conn.execute("UPDATE manifest SET filter_hash = ''")
+            if "body" not in columns:
+                self._conn.execute("ALTER TABLE manifest ADD COLUMN body TEXT")
+                self._conn.execute("UPDATE manifest SET meta_hash = ''")
+
+    def _lookup(self, ids: List[str]) -> Dict[str, Tuple[str, str, str]]:
+        found: Dict[str, Tuple[str, str, str]] = {}
+        # Stay well below SQLite's bound-parameter limit.
+        for start in range(0, len(ids), 500):
+            chunk = ids[start : start + 500]
+            placeholders = ",".join("?" for _ in chunk)
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT id, text_hash, meta_hash, filter_hash FROM manifest "
+                    f"WHERE index_name = ? AND id IN ({placeholders})",
+                    [self.index_name, *chunk],
+                ).fetchall()
+            found.update({row[0]: (row[1], row[2], row[3]) for row in rows})
+        return found
+
+    def plan(self, items: List[SupportItem]) -> IngestPlan:
+        known = self._lookup([item.id for item in items])
+        plan = IngestPlan()
+        for item in items:
+            hashes = item_hashes(item, self.model_name)
+            previous = known.get(item.id)
+            if previous is None or previous[0] != hashes.text:
+                plan.embed.append(item)
+            elif previous[1] != hashes.meta:
+                plan.metadata.append(item)
+            elif previous[2] != hashes.filter:
+                plan.filters.append(item)
+            else:
+                plan.unchanged.append(item)
+        return plan
+
+    def record(self, items: Iterable[SupportItem], run_id: Optional[str] = None) -> None:
+        now = time.time()
+        rows = []
+        for item in items:
+            hashes = item_hashes(item, self.model_name)
+            rows.append(
+                (
+                    self.index_name,
+                    item.id,
+                    hashes.text,
+                    hashes.meta,
+                    hashes.filter,
+                    run_id,
+                    now,
+                    _filter_json(item),
+                    item.body,
+                )
+            )
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO manifest (index_name, id, text_hash, meta_hash, "
+                "filter_hash, last_run, updated_at, filter, body) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def record_metadata(self, items: Iterable[SupportItem]) -> None:
+        """
+        Update the meta and filter hashes of recorded items after a
+        metadata-only write; their text hash is left as it was.
+        """
+
+        now = time.time()
+        rows = []
+        for item in items:
+            hashes = item_hashes(item, self.model_name)
+            rows.append(
+                (hashes.meta, hashes.filter, _filter_json(item), now, self.index_name, item.id)
+            )
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE manifest SET meta_hash = ?, filter_hash = ?, filter = ?, updated_at = ? "
+                "WHERE index_name = ? AND id = ?",
+                rows,
+            )
+
+    def mark_seen(self, ids: Iterable[str], run_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE manifest SET last_run = ? WHERE index_name = ? AND id = ?",
+                [(run_id, self.index_name, item_id) for item_id in ids],
+            )
+
+    def touch(self, ids: Iterable[str]) -> None:
+        """Mark recorded items as written now, e.g. after copying them unchanged."""
+
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE manifest SET updated_at = ? WHERE index_name = ? AND id = ?",
+                [(now, self.index_name, item_id) for item_id in ids],
+            )
+
+    def stale_ids(self, run_id: str) -> List[str]:
+        """
+        Ids written by an earlier ingestion run that were not seen during
+        `run_id`. Items last written through the API carry no run id and are
+        never reported.
+        """
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM manifest WHERE index_name = ? AND last_run IS NOT NULL AND last_run != ?",
+                (self.index_name, run_id),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def matching_ids(self, filters: List[Dict[str, Any]]) -> List[str]:
+        """
+        Ids whose recorded filter fields match `filters`, read from the
+        manifest of this index as of now. Rows recorded before filter fields
+        were kept are not matched until they are ingested again.
+        """
+
+        # Imported here: local_index depends on cache, which depends on this module.
+        from backend.app.services.local_index import matches_filters
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, filter FROM manifest WHERE index_name = ? AND filter IS NOT NULL",
+                (self.index_name,),
+            )
+            return [
+                item_id for item_id, values in rows if matches_filters(json.loads(values), filters)
+            ]
+
+    def page_ids(self, after: str = "", limit: int = 500) -> List[str]:
+        """
+        Up to `limit` recorded ids greater than `after`, in id order; pages
+        through the whole manifest without holding it (or its lock) at once.
+        """
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM manifest WHERE index_name = ? AND id > ? ORDER BY id LIMIT ?",
+                (self.index_name, after, limit),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def bodies(self, ids: List[str]) -> Dict[str, Optional[str]]:
+        """
+        Recorded body of each of `ids` (None if recorded before bodies were
+        kept); ids not recorded are left out.
+        """
+
+        found: Dict[str, Optional[str]] = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start : start + 500]
+            placeholders = ",".join("?" for _ in chunk)
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT id, body FROM manifest "
+                    f"WHERE index_name = ? AND id IN ({placeholders})",
+                    [self.index_name, *chunk],
+                ).fetchall()
+            found.update(rows)
+        return found
+
+    def newer_than(self, other_index: str) -> List[str]:
+        """
+        Ids of this index written more recently than the same item (or its
+        chunks) in `other_index` of the same manifest file, or not at all
+        there.
+        """
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT a.id FROM manifest a WHERE a.index_name = ? AND NOT EXISTS ("
+                "SELECT 1 FROM manifest b WHERE b.index_name = ? AND b.updated_at >= a.updated_at "
+                f"AND {_SAME_ITEM})",
+                (self.index_name, other_index, *_CHUNK_RANGE),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def missing_from(self, other_index: str) -> List[str]:
+        """
+        Ids of this index whose item is not recorded (whole or as chunks) in
+        `other_index` of the same manifest file.
+        """
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT a.id FROM manifest a WHERE a.index_name = ? AND NOT EXISTS ("
+                f"SELECT 1 FROM manifest b WHERE b.index_name = ? AND {_SAME_ITEM})",
+                (self.index_name, other_index, *_CHUNK_RANGE),
+            ).fetchall()
+            candidates = [row[0] for row in rows]
+            # Chunks of an item recorded whole in the other index.
+            parents = {
+                item_id: item_id.rsplit(CHUNK_ID_SEPARATOR, 1)[0]
+                for item_id in candidates
+                if CHUNK_ID_SEPARATOR in item_id
+            }
+            present = set()
+            for parent in set(parents.values()):
+                row = self._conn.execute(
+                    "SELECT 1 FROM manifest WHERE index_name = ? AND id = ?", (other_index, parent)
+                ).fetchone()
+                if row is not None:
+                    present.add(parent)
+        return [item_id for item_id in candidates if parents.get(item_id) not in present]
+
+    def chunk_ids(self, parent_ids: List[str]) -> Dict[str, List[str]]:
+        """
+        Ids recorded for each item, either the item itself or its chunks
+        (`<id>#<n>`).
+        """
+
+        found: Dict[str, List[str]] = {parent: [] for parent in parent_ids}
+        for start in range(0, len(parent_ids), 200):
+            chunk = parent_ids[start : start + 200]
+            clauses = " OR ".join("id = ? OR id LIKE ? ESCAPE '\\'" for _ in chunk)
+            params: List[str] = [self.index_name]
+            for parent in chunk:
+                escaped = parent.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                params += [parent, f"{escaped}{CHUNK_ID_SEPARATOR}%"]
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT id FROM manifest WHERE index_name = ? AND ({clauses})", params
+                ).fetchall()
+            for (item_id,) in rows:
+                parent = item_id if item_id in found else item_id.rsplit(CHUNK_ID_SEPARATOR, 1)[0]
+                if parent in found:
+                    found[parent].append(item_id)
+        return found
+
+    def remove(self, ids: Iterable[str]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM manifest WHERE index_name = ? AND id = ?",
+                [(self.index_name, item_id) for item_id in ids],
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def get_ingest_manifest(version: Optional[IndexVersion] = None) -> Optional[IngestManifest]:
+    """
+    Return the ingest manifest of `version` (by default the active index
+    version), or None when incremental ingestion is disabled (empty
+    `ingest_manifest_path`).
+    """
+
+    settings = get_settings()
+    if not settings.ingest_manifest_path:
+        return None
+    version = version or get_active_index()
+    return _open_manifest(settings.ingest_manifest_path, version.name, version.model_name)
+
+
+@lru_cache()
+def _open_manifest(path: str, index_name: str, model_name: str) -> IngestManifest:
+    logger.info(f"Using ingest manifest at {path} for index '{index_name}'.")
+    return IngestManifest(Path(path), index_name, model_name)
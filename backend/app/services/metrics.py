@@ -0,0 +1,110 @@
+import threading
+from collections import deque
+from typing import Deque, Dict, Any
+
+
+class LatencyRecorder:
+    """
+    Keeps a bounded window of samples for one stage and summarises them as
+    count/mean/p50/p95/p99. Samples are latencies in milliseconds unless a
+    different unit (or none, for plain distributions such as batch sizes) is given.
+    """
+
+    def __init__(self, window: int = 1024, unit: str = "ms") -> None:
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._count = 0
+        self._suffix = f"_{unit}" if unit else ""
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._samples.append(value)
+            self._count += 1
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = sorted(self._samples)
+            count = self._count
+        if not samples:
+            return {"count": count}
+
+        def pct(p: float) -> float:
+            idx = min(len(samples) - 1, int(round(p * (len(samples) - 1))))
+            return round(samples[idx], 2)
+
+        suffix = self._suffix
+        return {
+            "count": count,
+            f"mean{suffix}": round(sum(samples) / len(samples), 2),
+            f"p50{suffix}": pct(0.50),
+            f"p95{suffix}": pct(0.95),
+            f"p99{suffix}": pct(0.99),
+        }
+
+
+class MetricsRegistry:
+    """
+    Minimal in-process metrics registry: named latency recorders, unitless
+    histograms and counters.
+
+    Everything is kept in memory and exposed as plain dicts on /health; there is
+    deliberately no external metrics dependency.
+    """
+
+    def __init__(self) -> None:
+        self._latencies: Dict[str, LatencyRecorder] = {}
+        self._histograms: Dict[str, LatencyRecorder] = {}
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def latency(self, name: str) -> LatencyRecorder:
+        with self._lock:
+            recorder = self._latencies.get(name)
+            if recorder is None:
+                recorder = self._latencies[name] = LatencyRecorder()
+            return recorder
+
+    def histogram(self, name: str) -> LatencyRecorder:
+        with self._lock:
+            recorder = self._histograms.get(name)
+            if recorder is None:
+                recorder = self._histograms[name] = LatencyRecorder(unit="")
+            return recorder
+
+    def observe(self, name: str, value_ms: float) -> None:
+        self.latency(name).observe(value_ms)
+
+    def observe_value(self, name: str, value: float) -> None:
+        self.histogram(name).observe(value)
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = dict(self._latencies)
+            histograms = dict(self._histograms)
+            counters = dict(self._counters)
+        return {
+            "latency": {name: rec.summary() for name, rec in sorted(latencies.items())},
+            "histograms": {name: rec.summary() for name, rec in sorted(histograms.items())},
+            "counters": dict(sorted(counters.items())),
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._latencies.clear()
+            self._histograms.clear()
+            self._counters.clear()
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics() -> MetricsRegistry:
+    """
+    Return the process-wide metrics registry.
+    """
+
+    return _registry
@@ -0,0 +1,194 @@
+import json
+from pathlib import Path
+from typing import Dict, List, Union
+
+import numpy as np
+import onnxruntime as ort
+from loguru import logger
+from transformers import AutoTokenizer
+
+CONFIG_FILE = "encoder.json"
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model.int8.onnx"
+
+# Transformer inputs passed to the exported graph, in this order, when the
+# tokenizer produces them.
+MODEL_INPUTS = ("input_ids", "attention_mask", "token_type_ids")
+
+# SentenceTransformer.encode's default batch size.
+BATCH_SIZE = 32
+
+
+def _pooling_mode(pooling) -> str:
+    modes = [
+        mode
+        for mode, enabled in (
+            ("mean", pooling.pooling_mode_mean_tokens),
+            ("cls", pooling.pooling_mode_cls_token),
+            ("max", pooling.pooling_mode_max_tokens),
+            ("mean_sqrt_len", pooling.pooling_mode_mean_sqrt_len_tokens),
+            ("weightedmean", pooling.pooling_mode_weightedmean_tokens),
+            ("lasttoken", pooling.pooling_mode_lasttoken),
+        )
+        if enabled
+    ]
+    if len(modes) != 1 or modes[0] not in ("mean", "cls", "max"):
+        raise ValueError(f"Pooling {modes} is not supported by the ONNX encoder.")
+    return modes[0]
+
+
+def is_exported(directory: Path, quantized: bool = False) -> bool:
+    model_file = QUANTIZED_MODEL_FILE if quantized else MODEL_FILE
+    return (directory / CONFIG_FILE).exists() and (directory / model_file).exists()
+
+
+def export_onnx(model_name: str, directory: Path, quantize: bool = False) -> None:
+    """
+    Export the transformer of a sentence-transformers model to ONNX under
+    `directory`, together with its tokenizer and the tokenisation and pooling
+    settings OnnxEncoder needs to reproduce SentenceTransformer.encode. With
+    `quantize`, also write a copy with dynamically int8-quantised weights.
+
+    Only Transformer -> Pooling (mean, cls or max) -> optional Normalize
+    pipelines are supported, which covers the usual sentence-transformers
+    retrieval models.
+    """
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling, Transformer
+
+    directory.mkdir(parents=True, exist_ok=True)
+    model = SentenceTransformer(model_name, device="cpu")
+    modules = list(model)
+    if (
+        not isinstance(modules[0], Transformer)
+        or len(modules) < 2
+        or not isinstance(modules[1], Pooling)
+        or any(not isinstance(module, Normalize) for module in modules[2:])
+    ):
+        raise ValueError(f"Cannot export {model_name}: unsupported modules {modules}.")
+    transformer, pooling = modules[0], modules[1]
+
+    sample = transformer.tokenize(["onnx export sample", "a second, longer sample sentence"])
+    names = [name for name in MODEL_INPUTS if name in sample]
+
+    class HiddenStates(torch.nn.Module):
+        def __init__(self) -> None:
+            super().__init__()
+            self.model = transformer.auto_model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(names, inputs)), return_dict=True).last_hidden_state
+
+    path = directory / MODEL_FILE
+    logger.info(f"Exporting {model_name} to ONNX at {path}.")
+    axes = {name: {0: "batch", 1: "sequence"} for name in names + ["last_hidden_state"]}
+    with torch.no_grad():
+        torch.onnx.export(
+            HiddenStates().eval(),
+            tuple(sample[name] for name in names),
+            str(path),
+            input_names=names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=axes,
+            opset_version=17,
+            dynamo=False,
+        )
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        logger.info(f"Quantising {path.name} to int8.")
+        quantize_dynamic(
+            str(path), str(directory / QUANTIZED_MODEL_FILE), weight_type=QuantType.QInt8
+        )
+
+    transformer.tokenizer.save_pretrained(str(directory))
+    config = {
+        "model_name": model_name,
+        "inputs": names,
+        "max_seq_length": transformer.max_seq_length,
+        "do_lower_case": transformer.do_lower_case,
+        "pooling": _pooling_mode(pooling),
+        "normalize": len(modules) > 2,
+        "dimension": model.get_sentence_embedding_dimension(),
+    }
+    (directory / CONFIG_FILE).write_text(json.dumps(config, indent=2), encoding="utf-8")
+
+
+class OnnxEncoder:
+    """
+    Sentence encoder running an ONNX export (see `export_onnx`) with ONNX
+    Runtime on the CPU, as a drop-in for the SentenceTransformer methods this
+    service uses.
+
+    Tokenisation (tokenizer, stripping, lower-casing, truncation), pooling and
+    normalisation follow the exported model's settings, and texts are batched
+    in length order like SentenceTransformer.encode. `threads` sets the
+    session's intra-op thread pool (0: ONNX Runtime's default).
+    """
+
+    def __init__(self, directory: Path, quantized: bool = False, threads: int = 0) -> None:
+        config = json.loads((directory / CONFIG_FILE).read_text(encoding="utf-8"))
+        self.model_name = config["model_name"]
+        self.inputs: List[str] = config["inputs"]
+        self.max_seq_length: int = config["max_seq_length"]
+        self.do_lower_case: bool = config["do_lower_case"]
+        self.pooling: str = config["pooling"]
+        self.normalize: bool = config["normalize"]
+        self.dimension: int = config["dimension"]
+        self.tokenizer = AutoTokenizer.from_pretrained(str(directory))
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.inter_op_num_threads = 1
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        model_file = QUANTIZED_MODEL_FILE if quantized else MODEL_FILE
+        self.session = ort.InferenceSession(
+            str(directory / model_file), options, providers=["CPUExecutionProvider"]
+        )
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def _tokenize(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        texts = [str(text).strip() for text in texts]
+        if self.do_lower_case:
+            texts = [text.lower() for text in texts]
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation="longest_first",
+            return_tensors="np",
+            max_length=self.max_seq_length,
+        )
+        return {name: encoded[name].astype(np.int64) for name in self.inputs}
+
+    def _pool(self, hidden: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        if self.pooling == "cls":
+            pooled = hidden[:, 0]
+        elif self.pooling == "max":
+            pooled = np.where(mask[:, :, None] > 0, hidden, -1e9).max(axis=1)
+        else:
+            weights = mask[:, :, None].astype(np.float32)
+            pooled = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        if self.normalize:
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            pooled = pooled / np.maximum(norms, 1e-12)
+        return pooled
+
+    def encode(
+        self, sentences: Union[str, List[str]], convert_to_numpy: bool = True
+    ) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        vectors = np.empty((len(texts), self.dimension), dtype=np.float32)
+        # Longest first, so each batch pads to similar lengths.
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        for start in range(0, len(texts), BATCH_SIZE):
+            rows = order[start : start + BATCH_SIZE]
+            feed = self._tokenize([texts[row] for row in rows])
+            hidden = self.session.run(None, feed)[0]
+            vectors[rows] = self._pool(hidden, feed["attention_mask"])
+        return vectors[0] if single else vectors
@@ -0,0 +1,266 @@
+import json
+import math
+import sqlite3
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from backend.app.config import get_settings
+from backend.app.models.domain import SupportItem
+from backend.app.services.local_index import matches_filters
+from backend.app.services.metrics import get_metrics
+
+MAX_FETCH_K = 50
+# With chunking, several chunks of one item can take up the fetched hits, so
+# candidate counts are multiplied by this to leave top_k distinct items after
+# chunk hits are collapsed (the factor reindex's recall@k check uses as well).
+CHUNK_FETCH_FACTOR = 3
+
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS filter_items (id TEXT PRIMARY KEY, filter TEXT NOT NULL)",
+    """
+    CREATE TABLE IF NOT EXISTS filter_counts (
+        field TEXT NOT NULL,
+        value TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (field, value)
+    ) WITHOUT ROWID
+    """,
+    "CREATE TABLE IF NOT EXISTS filter_totals (items INTEGER NOT NULL)",
+    "INSERT INTO filter_totals SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM filter_totals)",
+)
+
+
+class FilterStatistics:
+    """
+    Value counts of every `SupportItem.filter()` field, maintained during
+    ingestion and used to estimate how many items a filter lets through.
+
+    Stored in SQLite: the filter values of each item, so that updates and
+    deletes adjust the counts exactly, and the counts themselves, changed by
+    the difference each write makes. Writes are single transactions holding
+    the database's write lock, so processes sharing the file never lose
+    each other's updates, and reads always see the latest counts.
+    """
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.path = path
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit mode: transactions are opened explicitly in _write.
+        self._conn = sqlite3.connect(
+            str(path) if path is not None else ":memory:",
+            check_same_thread=False,
+            timeout=30,
+            isolation_level=None,
+        )
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+
+    @property
+    def total(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT items FROM filter_totals").fetchone()[0]
+
+    def __contains__(self, item_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM filter_items WHERE id = ?", (item_id,)
+            ).fetchone()
+        return row is not None
+
+    def _stored(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        found: Dict[str, Dict[str, Any]] = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start : start + 500]
+            placeholders = ",".join("?" for _ in chunk)
+            rows = self._conn.execute(
+                f"SELECT id, filter FROM filter_items WHERE id IN ({placeholders})", chunk
+            ).fetchall()
+            found.update((item_id, json.loads(values)) for item_id, values in rows)
+        return found
+
+    def _write(self, new: Dict[str, Dict[str, Any]], removed: List[str]) -> None:
+        """
+        Replace the filter values of `new` and delete `removed` in one
+        transaction, applying the net change to the counts.
+        """
+
+        ids = list(new) + [item_id for item_id in removed if item_id not in new]
+        if not ids:
+            return
+        with self._lock:
+            # IMMEDIATE takes the write lock before the old values are read.
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                old = self._stored(ids)
+                delta: Counter = Counter()
+                for values in old.values():
+                    delta.update({(f, json.dumps(v)): -1 for f, v in values.items()})
+                for values in new.values():
+                    delta.update({(f, json.dumps(v)): 1 for f, v in values.items()})
+                self._conn.executemany(
+                    "DELETE FROM filter_items WHERE id = ?", [(item_id,) for item_id in old]
+                )
+                self._conn.executemany(
+                    "INSERT INTO filter_items VALUES (?, ?)",
+                    [(item_id, json.dumps(values)) for item_id, values in new.items()],
+                )
+                self._conn.executemany(
+                    "INSERT INTO filter_counts VALUES (?, ?, ?) ON CONFLICT (field, value) "
+                    "DO UPDATE SET count = count + excluded.count",
+                    [(f, v, n) for (f, v), n in delta.items() if n],
+                )
+                self._conn.execute("DELETE FROM filter_counts WHERE count <= 0")
+                self._conn.execute(
+                    "UPDATE filter_totals SET items = items + ?", (len(new) - len(old),)
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def update(self, items: Iterable[SupportItem]) -> None:
+        self._write({item.id: item.filter() for item in items}, [])
+
+    def remove(self, ids: Iterable[str]) -> None:
+        self._write({}, list(ids))
+
+    def matching_ids(self, filters: List[Dict[str, Any]]) -> List[str]:
+        with self._lock:
+            return [
+                item_id
+                for item_id, values in self._conn.execute("SELECT id, filter FROM filter_items")
+                if matches_filters(json.loads(values), filters)
+            ]
+
+    def _counts(self, field: str) -> Dict[Any, int]:
+        rows = self._conn.execute(
+            "SELECT value, count FROM filter_counts WHERE field = ?", (field,)
+        ).fetchall()
+        return {json.loads(value): count for value, count in rows}
+
+    def selectivity(self, filters: Optional[List[Dict[str, Any]]]) -> float:
+        """
+        Estimated fraction of items passing `filters` (1.0 without filters
+        or statistics). Clauses are assumed independent, so their fractions
+        multiply.
+        """
+
+        if not filters:
+            return 1.0
+        with self._lock:
+            total = self._conn.execute("SELECT items FROM filter_totals").fetchone()[0]
+            if not total:
+                return 1.0
+            fraction = 1.0
+            for clause in filters:
+                for field, condition in clause.items():
+                    counts = self._counts(field)
+                    for op, operand in condition.items():
+                        if op == "$eq":
+                            matched = counts.get(operand, 0)
+                        elif op == "$in":
+                            matched = sum(counts.get(value, 0) for value in operand)
+                        elif op == "$range":
+                            lo, hi = operand
+                            matched = sum(n for value, n in counts.items() if lo <= value <= hi)
+                        else:
+                            raise ValueError(f"Unsupported filter operator '{op}' on '{field}'.")
+                        fraction *= matched / total
+            return fraction
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+@lru_cache()
+def get_filter_statistics() -> Optional[FilterStatistics]:
+    """
+    Return the process-wide filter statistics, or None when
+    `filter_stats_path` is empty.
+    """
+
+    settings = get_settings()
+    if not settings.filter_stats_path:
+        return None
+    return FilterStatistics(Path(settings.filter_stats_path))
+
+
+def chunk_fetch_factor() -> int:
+    """
+    Hits to fetch per wanted item: CHUNK_FETCH_FACTOR while chunking is
+    enabled (`chunk_size_tokens` > 0), else 1.
+    """
+
+    return CHUNK_FETCH_FACTOR if get_settings().chunk_size_tokens > 0 else 1
+
+
+@dataclass
+class QueryPlan:
+    ef: int
+    fetch_k: int
+    selectivity: float = 1.0
+
+
+def plan_query(
+    top_k: int,
+    filters: Optional[List[Dict[str, Any]]],
+    target: Optional[str] = None,
+    ef: Optional[int] = None,
+    fetch_k: Optional[int] = None,
+) -> QueryPlan:
+    """
+    Choose Endee's `ef` and the number of candidates to fetch for one query.
+
+    With `search_planner=fixed`, or before any filter statistics exist, this
+    is the historical ef=`search_ef_default`, fetch_k=top_k+5. Otherwise
+    fetch_k is top_k plus `search_overfetch_ratio` of it, and ef is sized so
+    that enough of the candidates HNSW visits pass the filters:
+    `ef_per_result * fetch_k / selectivity`, where ef_per_result is 2 for the
+    latency target and 4 for the recall target, clamped to
+    [`search_ef_min`, `search_ef_max`]. Under the latency target, ef is
+    scaled down further while Endee's observed p95 exceeds
+    `search_latency_target_ms`. With chunking enabled the planned fetch_k
+    (and its cap) is multiplied by `chunk_fetch_factor()`. Explicit `ef` /
+    `fetch_k` win.
+    """
+
+    settings = get_settings()
+    target = target or settings.search_target
+    stats = get_filter_statistics()
+    total = stats.total if stats is not None and settings.search_planner != "fixed" else 0
+    factor = chunk_fetch_factor()
+    max_k = MAX_FETCH_K * factor
+
+    if not total:
+        plan = QueryPlan(ef=settings.search_ef_default, fetch_k=min((top_k + 5) * factor, max_k))
+    else:
+        selectivity = max(stats.selectivity(filters), 1.0 / total)
+        wanted = top_k + math.ceil(top_k * settings.search_overfetch_ratio)
+        planned_k = min(wanted * factor, max_k)
+        per_result = 4 if target == "recall" else 2
+        planned_ef = per_result * planned_k / selectivity
+        if target == "latency":
+            p95 = get_metrics().latency("stage.endee_query").summary().get("p95_ms")
+            if p95 and p95 > settings.search_latency_target_ms:
+                planned_ef *= settings.search_latency_target_ms / p95
+        planned_ef = min(max(int(planned_ef), settings.search_ef_min), settings.search_ef_max)
+        plan = QueryPlan(ef=planned_ef, fetch_k=planned_k, selectivity=selectivity)
+
+    if ef is not None:
+        plan.ef = ef
+    if fetch_k is not None:
+        plan.fetch_k = min(fetch_k, max_k)
+    plan.fetch_k = max(plan.fetch_k, min(top_k, MAX_FETCH_K))
+    get_metrics().observe_value("search.plan.ef", plan.ef)
+    get_metrics().observe_value("search.plan.selectivity", plan.selectivity)
+    return plan
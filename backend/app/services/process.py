@@ -0,0 +1,59 @@
+import os
+import resource
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+WORKER_ID_ENV = "APP_WORKER_ID"
+
+# Fields of /proc/self/smaps_rollup worth reporting; PSS is the one that
+# reflects weights shared copy-on-write between pre-forked workers.
+_SMAPS_FIELDS = {
+    "Rss": "rss_kb",
+    "Pss": "pss_kb",
+    "Shared_Clean": "shared_clean_kb",
+    "Shared_Dirty": "shared_dirty_kb",
+    "Private_Clean": "private_clean_kb",
+    "Private_Dirty": "private_dirty_kb",
+}
+
+
+def _read_kb_fields(path: Path, fields: Dict[str, str]) -> Dict[str, int]:
+    values: Dict[str, int] = {}
+    try:
+        with path.open() as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in fields:
+                    values[fields[key]] = int(rest.split()[0])
+    except (OSError, ValueError, IndexError):
+        return {}
+    return values
+
+
+def process_memory() -> Dict[str, int]:
+    """
+    Memory of the current process in kB. On Linux this includes PSS and the
+    shared/private split; elsewhere only the peak RSS is available.
+    """
+
+    memory = _read_kb_fields(Path("/proc/self/smaps_rollup"), _SMAPS_FIELDS)
+    if not memory:
+        memory = _read_kb_fields(Path("/proc/self/status"), {"VmRSS": "rss_kb"})
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kB on Linux and bytes on macOS.
+    memory["peak_rss_kb"] = peak // 1024 if os.uname().sysname == "Darwin" else peak
+    return memory
+
+
+def worker_id() -> Optional[int]:
+    value = os.environ.get(WORKER_ID_ENV)
+    return int(value) if value is not None else None
+
+
+def worker_info() -> Dict[str, Any]:
+    return {
+        "pid": os.getpid(),
+        "parent_pid": os.getppid(),
+        "worker_id": worker_id(),
+        "memory": process_memory(),
+    }
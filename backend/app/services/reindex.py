@@ -0,0 +1,277 @@
+import json
+import re
+import time
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from loguru import logger
+
+from backend.app.config import get_settings
+from backend.app.models.domain import SupportItem, SupportItemType
+from backend.app.services.embeddings import encode_texts_array
+from backend.app.services.endee_client import get_endee_client
+from backend.app.services.index_alias import (
+    IndexVersion,
+    default_index_version,
+    get_index_alias,
+)
+from backend.app.services.ingestion import DATA_DIR, IngestStats, batched, ingest_stream
+from backend.app.services.manifest import IngestManifest, get_ingest_manifest
+from backend.app.services.planner import CHUNK_FETCH_FACTOR
+from backend.app.services.search import build_filter_clauses
+
+EVALUATION_QUERIES_PATH = DATA_DIR / "evaluation_queries.json"
+
+# Expected ids in the evaluation queries are grouped by plural type name.
+EXPECTED_ID_KEYS = {
+    SupportItemType.TICKET: "tickets",
+    SupportItemType.FAQ: "faqs",
+    SupportItemType.RUNBOOK: "runbooks",
+}
+
+# Catch-up passes before a switch; each replays what was written to the
+# active index during the previous one, so they converge quickly.
+MAX_CATCH_UP_PASSES = 5
+
+
+@dataclass
+class RebuildResult:
+    version: IndexVersion
+    stats: IngestStats
+    recall: Dict[str, float]
+    baseline: Optional[Dict[str, float]] = None
+    switched: bool = False
+    reason: str = ""
+
+
+def mean_recall(recall: Dict[str, float]) -> float:
+    return sum(recall.values()) / len(recall) if recall else 0.0
+
+
+def next_version_name(base: str, existing: Iterable[str]) -> str:
+    """
+    `<base>_v<n>`, one above the highest existing version of `base`; the
+    first rebuild of the unversioned index is `<base>_v2`.
+    """
+
+    pattern = re.compile(rf"^{re.escape(base)}_v(\d+)$")
+    versions = [int(match.group(1)) for match in map(pattern.match, existing) if match]
+    return f"{base}_v{max(versions, default=1) + 1}"
+
+
+def load_evaluation_queries(path: Path = EVALUATION_QUERIES_PATH) -> List[Dict[str, Any]]:
+    with path.open(encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _parent_ids(hits: List[Dict[str, Any]]) -> List[str]:
+    ids: Dict[str, None] = {}
+    for hit in hits:
+        ids.setdefault((hit.get("meta") or {}).get("parent_id") or hit["id"])
+    return list(ids)
+
+
+def evaluate_recall(
+    version: IndexVersion, queries: List[Dict[str, Any]], k: int
+) -> Dict[str, float]:
+    """
+    Mean recall@k per item type of one index version, queried directly with
+    vectors from its own model: the metric of scripts.evaluate_retrieval,
+    without the API, lexical fusion or re-ranking.
+    """
+
+    if not queries:
+        return {}
+    client = get_endee_client(version)
+    vectors = encode_texts_array([entry["query"] for entry in queries], version.model_name)
+    totals = {key: 0.0 for key in EXPECTED_ID_KEYS.values()}
+    for entry, vector in zip(queries, vectors):
+        for support_type, key in EXPECTED_ID_KEYS.items():
+            expected = entry["expected_ids"].get(key, [])
+            if not expected:
+                totals[key] += 1.0
+                continue
+            filters = build_filter_clauses(None, support_type)
+            hits = client.query(vector, top_k=k * CHUNK_FETCH_FACTOR, filters=filters)
+            returned = _parent_ids(hits)[:k]
+            totals[key] += sum(1 for item_id in expected if item_id in returned) / len(expected)
+    return {key: total / len(queries) for key, total in totals.items()}
+
+
+def _rejection(
+    recall: Dict[str, float], baseline: Optional[Dict[str, float]]
+) -> Optional[str]:
+    """
+    Why a rebuilt index must not be switched to, or None if it passes.
+    """
+
+    settings = get_settings()
+    mean = mean_recall(recall)
+    if mean < settings.rebuild_min_recall:
+        return f"mean recall@k {mean:.3f} is below {settings.rebuild_min_recall:.3f}"
+    if baseline is not None:
+        before = mean_recall(baseline)
+        if mean < before - settings.rebuild_max_recall_drop:
+            return f"mean recall@k fell from {before:.3f} to {mean:.3f}"
+    return None
+
+
+def iter_index_items(
+    version: IndexVersion, manifest: IngestManifest, ids: Optional[Iterable[str]] = None
+) -> Iterator[SupportItem]:
+    """
+    Stream the items of an index version as written: `ids` (default: every
+    id in its manifest, in id order) in pages, each page's stored meta and
+    filter fields fetched from the index in one batch and its bodies read
+    from the manifest. Chunks come back as chunks. Ids missing from the
+    index are skipped.
+    """
+
+    client = get_endee_client(version)
+    pages = _id_pages(manifest) if ids is None else batched(ids, 500)
+    for page in pages:
+        bodies = manifest.bodies(page)
+        unrecorded = [item_id for item_id in page if bodies.get(item_id) is None]
+        if unrecorded:
+            raise ValueError(
+                f"The manifest of '{version.name}' has no body for {unrecorded[:5]}; "
+                "re-run ingestion once to record them."
+            )
+        stored = {item.id: item for item in client.get_support_items(page)}
+        for item_id in page:
+            if item_id not in stored:
+                logger.warning(f"'{item_id}' is in the manifest but not in '{version.name}'.")
+                continue
+            yield replace(stored[item_id], body=bodies[item_id])
+
+
+def _id_pages(manifest: IngestManifest) -> Iterator[List[str]]:
+    page = manifest.page_ids()
+    while page:
+        yield page
+        page = manifest.page_ids(after=page[-1])
+
+
+def catch_up(
+    active: IndexVersion, target: IndexVersion, delete_missing: bool = True
+) -> int:
+    """
+    Replay onto `target` what was written to `active` after the target got
+    it: items written to the active index more recently than to the target
+    are copied over, and (with `delete_missing`) items no longer in the
+    active index are deleted from the target. Returns the number of ids
+    replayed.
+    """
+
+    source, manifest = get_ingest_manifest(active), get_ingest_manifest(target)
+    changed = source.newer_than(target.name)
+    gone = manifest.missing_from(active.name) if delete_missing else []
+    if changed:
+        ingest_stream(iter_index_items(active, source, changed), manifest=manifest, version=target)
+        # Copies the target already had are skipped without being recorded.
+        manifest.touch(changed)
+    if gone:
+        get_endee_client(target).delete_support_items(gone)
+        manifest.remove(gone)
+    if changed or gone:
+        logger.info(
+            f"Replayed {len(changed)} writes and {len(gone)} deletes from '{active.name}' "
+            f"onto '{target.name}'."
+        )
+    return len(changed) + len(gone)
+
+
+def rebuild_index(
+    model_name: Optional[str] = None,
+    precision: Optional[str] = None,
+    name: Optional[str] = None,
+    items: Optional[Iterable[SupportItem]] = None,
+    batch_size: Optional[int] = None,
+    checkpoint_path: Optional[Path] = None,
+    queries_path: Path = EVALUATION_QUERIES_PATH,
+    switch: bool = True,
+) -> RebuildResult:
+    """
+    Build a new index version next to the active one and point the index
+    alias at it once it passes the recall check:
+
+    1. create `<endee_index_name>_v<n>` (or `name`) with `model_name` and
+       `precision`, by default the configured ones
+    2. backfill it with the streaming ingester and a manifest of its own,
+       from the active index's contents (`iter_index_items`), or from
+       `items` if given; with `checkpoint_path` an interrupted backfill
+       resumes where it stopped
+    3. measure recall@k on the evaluation queries for both versions
+    4. unless recall is below `rebuild_min_recall` or more than
+       `rebuild_max_recall_drop` under the active version's: replay the
+       writes and deletes the active index received meanwhile (`catch_up`)
+       until none are left, switch the alias, and once every process has
+       had `index_alias_refresh_seconds` to follow the switch, replay the
+       writes that still reached the old index
+
+    Searches and writes keep using the active version until the switch; the
+    replaced index is kept for rollback.
+    """
+
+    settings = get_settings()
+    alias = get_index_alias()
+    active = alias.refresh()
+    defaults = default_index_version()
+    if name is None:
+        existing = get_endee_client(active).list_index_names()
+        name = next_version_name(settings.endee_index_name, existing)
+    if name == active.name:
+        raise ValueError(f"'{name}' is the active index; rebuild into a new index.")
+    target = IndexVersion(
+        name, model_name or defaults.model_name, precision or defaults.precision
+    )
+
+    logger.info(
+        f"Rebuilding into '{target.name}' (model {target.model_name}, precision "
+        f"{target.precision}); '{active.name}' keeps serving until the switch."
+    )
+    if items is None:
+        source = get_ingest_manifest(active)
+        if source is None:
+            raise ValueError(
+                "Rebuilding from the active index needs the ingest manifest "
+                "(INGEST_MANIFEST_PATH); pass the items to backfill instead."
+            )
+        items = iter_index_items(active, source)
+    stats = ingest_stream(
+        items,
+        batch_size=batch_size,
+        checkpoint_path=checkpoint_path,
+        manifest=get_ingest_manifest(target),
+        version=target,
+    )
+
+    queries = load_evaluation_queries(queries_path)
+    k = settings.rebuild_recall_k
+    result = RebuildResult(target, stats, evaluate_recall(target, queries, k))
+    try:
+        result.baseline = evaluate_recall(active, queries, k)
+    except Exception as exc:
+        logger.warning(f"Could not evaluate the active index '{active.name}': {exc}")
+
+    rejection = _rejection(result.recall, result.baseline)
+    if rejection is not None:
+        result.reason = rejection
+        logger.warning(f"Not switching to '{target.name}': {rejection}.")
+    elif not switch:
+        result.reason = "switch not requested"
+        logger.info(f"'{target.name}' passed the recall check; the alias was left unchanged.")
+    else:
+        if get_ingest_manifest(active) is not None:
+            for _ in range(MAX_CATCH_UP_PASSES):
+                if not catch_up(active, target):
+                    break
+        alias.switch(target)
+        result.switched = True
+        if get_ingest_manifest(active) is not None:
+            # Processes still writing to the old index until they see the
+            # switch; nothing is deleted, the new index is live now.
+            time.sleep(settings.index_alias_refresh_seconds)
+            catch_up(active, target, delete_missing=False)
+    return result
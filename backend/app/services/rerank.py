@@ -0,0 +1,146 @@
+import asyncio
+import hashlib
+import math
+import time
+from dataclasses import replace
+from functools import lru_cache
+from typing import List, Optional
+
+from loguru import logger
+
+from backend.app.config import get_settings
+from backend.app.models.domain import SearchResultItem
+from backend.app.services.cache import get_rerank_cache, normalize_query
+from backend.app.services.executors import ExecutorSaturatedError, run_cpu
+from backend.app.services.metrics import get_metrics
+
+
+@lru_cache()
+def get_cross_encoder():
+    """
+    Load and cache the re-ranking cross-encoder.
+    """
+
+    from sentence_transformers import CrossEncoder
+
+    model_name = get_settings().rerank_model_name
+    logger.info(f"Loading cross-encoder: {model_name}")
+    return CrossEncoder(model_name)
+
+
+def warm_cross_encoder() -> None:
+    """
+    Load the cross-encoder and score one pair, so the first re-ranked request
+    does not spend its budget on loading the model.
+    """
+
+    get_cross_encoder().predict([("warm up", "warm up the re-ranking model")])
+
+
+def rerank_enabled(override: Optional[bool] = None) -> bool:
+    return get_settings().rerank_enabled if override is None else override
+
+
+def _document_text(item: SearchResultItem) -> str:
+    return f"{item.title}. {item.snippet}" if item.snippet else item.title
+
+
+def _score_key(query: str, item: SearchResultItem) -> tuple:
+    digest = hashlib.blake2b(_document_text(item).encode("utf-8"), digest_size=8).hexdigest()
+    return (normalize_query(query), item.id, digest)
+
+
+def rerank(query: str, results: List[SearchResultItem]) -> List[SearchResultItem]:
+    """
+    Re-order the first `rerank_candidates` results by cross-encoder score.
+
+    Cached (query, document) scores are reused; the rest are scored in
+    batches of `rerank_batch_size`. If `rerank_budget_ms` runs out before
+    every candidate has a score, the input order is returned unchanged.
+    Scores computed so far are cached either way, so a repeated query gets
+    cheaper.
+    """
+
+    deadline = time.monotonic() + get_settings().rerank_budget_ms / 1000
+    reranked = _rerank(query, results, deadline)
+    if reranked is None:
+        _record_budget_exceeded()
+        return results
+    return reranked
+
+
+async def arerank(query: str, results: List[SearchResultItem]) -> List[SearchResultItem]:
+    """
+    Async variant of rerank: scoring runs on the CPU executor, and the caller
+    stops waiting once the budget has passed. The worker then stops at its
+    next batch boundary.
+    """
+
+    budget = get_settings().rerank_budget_ms / 1000
+    deadline = time.monotonic() + budget
+    try:
+        reranked = await asyncio.wait_for(
+            run_cpu("rerank", _rerank, query, results, deadline), timeout=budget
+        )
+    except asyncio.TimeoutError:
+        reranked = None
+    except ExecutorSaturatedError:
+        get_metrics().increment("rerank.skipped")
+        return results
+    if reranked is None:
+        _record_budget_exceeded()
+        return results
+    return reranked
+
+
+def _record_budget_exceeded() -> None:
+    get_metrics().increment("rerank.budget_exceeded")
+    logger.warning("Re-ranking exceeded its time budget; keeping retrieval order.")
+
+
+def _rerank(
+    query: str, results: List[SearchResultItem], deadline: float
+) -> Optional[List[SearchResultItem]]:
+    """
+    Score and re-order candidates; None if `deadline` (time.monotonic())
+    passes between batches.
+    """
+
+    settings = get_settings()
+    metrics = get_metrics()
+    candidates = results[: settings.rerank_candidates]
+    if len(candidates) < 2:
+        return results
+
+    cache = get_rerank_cache()
+    keys = [_score_key(query, item) for item in candidates]
+    scores = [cache.get(key) for key in keys]
+    missing = [i for i, score in enumerate(scores) if score is None]
+    metrics.increment("rerank.pairs_cached", len(candidates) - len(missing))
+
+    start = time.perf_counter()
+    batch_size = max(1, settings.rerank_batch_size)
+    for offset in range(0, len(missing), batch_size):
+        if time.monotonic() > deadline:
+            return None
+        batch = missing[offset : offset + batch_size]
+        pairs = [(query, _document_text(candidates[i])) for i in batch]
+        for i, score in zip(batch, get_cross_encoder().predict(pairs, batch_size=batch_size)):
+            scores[i] = float(score)
+            cache.put(keys[i], scores[i])
+        metrics.increment("rerank.pairs_scored", len(batch))
+    if missing:
+        metrics.observe("stage.rerank_model", (time.perf_counter() - start) * 1000)
+
+    # Cross-encoder logits are mapped to (0, 1) so scores stay comparable
+    # to cosine similarities in the response.
+    reranked = sorted(
+        (
+            replace(item, score=round(1.0 / (1.0 + math.exp(-score)), 6))
+            for item, score in zip(candidates, scores)
+        ),
+        key=lambda item: item.score,
+        reverse=True,
+    )
+    return reranked + results[len(candidates) :]
+
@@ -1,57 +1,434 @@
-from typing import List, Dict, Any
+import asyncio
+import time
+from dataclasses import replace
+from typing import List, Dict, Any, Optional, Tuple, Union
 
+from loguru import logger
+
+from backend.app.config import get_settings
 from backend.app.models.domain import (
     SearchResultItem,
     SupportItemType,
 )
-from backend.app.models.schemas import SearchRequest
-from backend.app.services.embeddings import embed_text
-from backend.app.services.endee_client import get_endee_client
+from backend.app.models.schemas import SearchFilters, SearchRequest
+from backend.app.services.cache import (
+    filters_key,
+    get_fallback_cache,
+    get_result_cache,
+    vector_key,
+)
+from backend.app.services.embeddings import aembed_queries, aembed_text, embed_text
+from backend.app.services.endee_client import get_async_endee_client, get_endee_client
+from backend.app.services.executors import ExecutorSaturatedError, run_cpu, run_io
+from backend.app.services.index_alias import IndexVersion, get_active_index
+from backend.app.services.lexical import fuse_results, get_lexical_index
+from backend.app.services.metrics import get_metrics
+from backend.app.services.planner import (
+    MAX_FETCH_K,
+    QueryPlan,
+    chunk_fetch_factor,
+    plan_query,
+)
+from backend.app.services.rerank import arerank, rerank, rerank_enabled
 
 
-def _build_filter_clauses(request: SearchRequest) -> List[Dict[str, Any]]:
+def build_filter_clauses(
+    filters: Optional[SearchFilters], support_type: Optional[SupportItemType] = None
+) -> List[Dict[str, Any]]:
     """
     Translate high-level SearchFilters into Endee filter clauses.
+
+    When `support_type` is given the type clause is pinned to that single
+    type, which is how per-type fan-out queries are built.
     """
 
-    if not request.filters:
-        return []
+    clauses: List[Dict[str, Any]] = []
+    if support_type is not None:
+        clauses.append({"type": {"$eq": support_type.value}})
+
+    if not filters:
+        return clauses
 
-    filters: List[Dict[str, Any]] = []
-    f = request.filters
+    f = filters
 
     if f.product:
-        filters.append({"product": {"$eq": f.product}})
+        clauses.append({"product": {"$eq": f.product}})
     if f.severity:
-        filters.append({"severity": {"$eq": f.severity}})
-    if f.types:
-        filters.append({"type": {"$in": f.types}})
+        clauses.append({"severity": {"$eq": f.severity}})
+    if f.types and support_type is None:
+        clauses.append({"type": {"$in": f.types}})
     if getattr(f, "priority_min", None) is not None and getattr(f, "priority_max", None) is not None:
         lo, hi = f.priority_min, f.priority_max
         if 0 <= lo <= 999 and 0 <= hi <= 999 and lo <= hi:
-            filters.append({"priority": {"$range": [lo, hi]}})
+            clauses.append({"priority": {"$range": [lo, hi]}})
 
-    return filters
+    return clauses
+
+
+def _build_filter_clauses(
+    request: SearchRequest, support_type: Optional[SupportItemType] = None
+) -> List[Dict[str, Any]]:
+    return build_filter_clauses(request.filters, support_type)
 
 
 def search_support_knowledge(request: SearchRequest) -> List[SearchResultItem]:
     """
     Execute a semantic search over support knowledge stored in Endee.
+
+    The index version is resolved once, so the query is embedded with the
+    model of the index it is sent to even if the alias switches meanwhile.
+    """
+
+    version = get_active_index()
+    query_vector = embed_text(request.query, version.model_name)
+    if get_settings().retrieval_mode == "per_type":
+        results: List[SearchResultItem] = []
+        for support_type in _fanout_types(request):
+            filters = _build_filter_clauses(request, support_type)
+            plan = _plan(request, filters, fanout=True)
+            results.extend(_cached_query(version, query_vector, filters, plan.fetch_k, plan.ef))
+        results = _merge_by_score(results)
+    else:
+        results = query_support_knowledge(request, query_vector, version)
+    results = _fuse_lexical(results, _lexical_hits(request))
+    if rerank_enabled(request.rerank):
+        results = rerank(request.query, results)
+    return results
+
+
+async def asearch_support_knowledge(
+    request: SearchRequest,
+    query_vector: Optional[List[float]] = None,
+    version: Optional[IndexVersion] = None,
+) -> List[SearchResultItem]:
+    """
+    Async variant of search_support_knowledge: the query is embedded on the CPU
+    executor (unless `query_vector` is given, embedded for `version`) and
+    Endee queries run on the I/O executor, so neither blocks the event loop.
+    """
+
+    version = version or get_active_index()
+    # BM25 runs on the CPU executor while the query is embedded and sent to Endee.
+    lexical = None
+    if get_lexical_index() is not None:
+        lexical = asyncio.ensure_future(run_cpu("lexical_search", _lexical_hits, request))
+    try:
+        if query_vector is None:
+            query_vector = await aembed_text(request.query, version.model_name)
+        if get_settings().retrieval_mode == "per_type":
+            results = await afanout_support_knowledge(request, query_vector, version)
+        else:
+            filters = _build_filter_clauses(request)
+            plan = _plan(request, filters)
+            results = await _aquery(
+                version, query_vector, filters, plan.fetch_k, "endee_query", plan.ef
+            )
+    except BaseException:
+        if lexical is not None:
+            lexical.cancel()
+        raise
+    results = _fuse_lexical(results, await lexical if lexical is not None else [])
+    if rerank_enabled(request.rerank):
+        results = await arerank(request.query, results)
+    return results
+
+
+async def asearch_batch(
+    requests: List[SearchRequest],
+) -> List[Union[List[SearchResultItem], Exception]]:
+    """
+    Run many searches at once: all queries are embedded in one model call,
+    then searched concurrently (at most `search_batch_concurrency` at a
+    time). Returns, in request order, each request's results or the
+    exception it failed with.
+    """
+
+    version = get_active_index()
+    vectors = await aembed_queries([request.query for request in requests], version.model_name)
+    limit = asyncio.Semaphore(max(1, get_settings().search_batch_concurrency))
+
+    async def _one(request: SearchRequest, vector: List[float]) -> List[SearchResultItem]:
+        async with limit:
+            return await asearch_support_knowledge(request, vector, version)
+
+    return await asyncio.gather(
+        *(_one(request, vector) for request, vector in zip(requests, vectors)),
+        return_exceptions=True,
+    )
+
+
+def query_support_knowledge(
+    request: SearchRequest, query_vector: List[float], version: Optional[IndexVersion] = None
+) -> List[SearchResultItem]:
+    """
+    Query Endee (the index of `version`, by default the active one) with an
+    already-computed query vector and normalise the hits.
+
+    Results are cached per (vector, filters, top_k, ef); the cache is
+    invalidated whenever items are upserted, so cached results never outlive
+    an ingest.
     """
 
-    query_vector = embed_text(request.query)
     filters = _build_filter_clauses(request)
+    plan = _plan(request, filters)
+    version = version or get_active_index()
+    return _cached_query(version, query_vector, filters, plan.fetch_k, plan.ef)
+
+
+async def afanout_support_knowledge(
+    request: SearchRequest, query_vector: List[float], version: Optional[IndexVersion] = None
+) -> List[SearchResultItem]:
+    """
+    Issue one filtered Endee query per support type in parallel, each asking
+    for the full top_k, and merge the hits by score.
+
+    All per-type queries share one latency budget; types that have not
+    answered when it expires are dropped from the response rather than
+    delaying it. Per-type latency is recorded as `stage.endee_query.<type>`.
+    """
+
+    settings = get_settings()
+    metrics = get_metrics()
+    version = version or get_active_index()
+    tasks = {}
+    for support_type in _fanout_types(request):
+        filters = _build_filter_clauses(request, support_type)
+        plan = _plan(request, filters, fanout=True)
+        tasks[support_type] = asyncio.ensure_future(
+            _aquery(
+                version,
+                query_vector,
+                filters,
+                plan.fetch_k,
+                f"endee_query.{support_type.value}",
+                plan.ef,
+            )
+        )
+    _, pending = await asyncio.wait(
+        tasks.values(), timeout=settings.fanout_latency_budget_ms / 1000
+    )
+    for task in pending:
+        task.cancel()
+
+    results: List[SearchResultItem] = []
+    errors: List[BaseException] = []
+    for support_type, task in tasks.items():
+        if task in pending:
+            metrics.increment(f"search.fanout_timeout.{support_type.value}")
+            logger.warning(
+                f"Per-type query for '{support_type.value}' exceeded the "
+                f"{settings.fanout_latency_budget_ms}ms budget; omitting it."
+            )
+            continue
+        exc = task.exception()
+        if exc is not None:
+            errors.append(exc)
+            logger.warning(f"Per-type query for '{support_type.value}' failed: {exc}")
+            continue
+        results.extend(task.result())
+
+    if errors and len(errors) == len(tasks):
+        raise errors[0]
+    return _merge_by_score(results)
 
-    top_k = min(request.top_k + 5, 50)
 
-    client = get_endee_client()
+def _lexical_hits(request: SearchRequest) -> List[Tuple[str, float]]:
+    index = get_lexical_index()
+    if index is None or not len(index):
+        return []
+    depth = request.top_k + 5
+    if rerank_enabled(request.rerank):
+        depth = max(depth, get_settings().rerank_candidates)
+    # Chunks are indexed separately and collapsed onto their item in fusion.
+    factor = chunk_fetch_factor()
+    return index.search(
+        request.query, min(depth * factor, MAX_FETCH_K * factor), _build_filter_clauses(request)
+    )
+
+
+def _fuse_lexical(
+    results: List[SearchResultItem], lexical_hits: List[Tuple[str, float]]
+) -> List[SearchResultItem]:
+    index = get_lexical_index()
+    if index is None or not lexical_hits:
+        return results
+    get_metrics().increment("search.hybrid")
+    return fuse_results(results, lexical_hits, index)
+
+
+def _plan(
+    request: SearchRequest, filters: List[Dict[str, Any]], fanout: bool = False
+) -> QueryPlan:
+    """
+    Plan ef and candidate count for one Endee query of this request, applying
+    the request's `search_params` overrides. Per-type fan-out queries fetch
+    top_k items each (times `chunk_fetch_factor()` hits).
+    """
+
+    params = request.search_params
+    factor = chunk_fetch_factor()
+    plan = plan_query(
+        request.top_k,
+        filters,
+        target=params.target if params else None,
+        ef=params.ef if params else None,
+        fetch_k=request.top_k * factor if fanout else (params.fetch_k if params else None),
+    )
+    if rerank_enabled(request.rerank) and not fanout:
+        # Give the cross-encoder its full candidate pool.
+        candidates = get_settings().rerank_candidates * factor
+        plan.fetch_k = min(max(plan.fetch_k, candidates), MAX_FETCH_K * factor)
+    return plan
+
+
+def _fanout_types(request: SearchRequest) -> List[SupportItemType]:
+    if request.filters and request.filters.types:
+        return [SupportItemType(t) for t in request.filters.types]
+    return list(SupportItemType)
+
+
+def _merge_by_score(results: List[SearchResultItem]) -> List[SearchResultItem]:
+    return sorted(results, key=lambda r: r.score, reverse=True)
+
+
+def _cache_key(
+    version: IndexVersion,
+    query_vector: List[float],
+    filters: List[Dict[str, Any]],
+    top_k: int,
+    ef: int,
+) -> tuple:
+    return (version.name, vector_key(query_vector), filters_key(filters), top_k, ef)
+
+
+def _cached_query(
+    version: IndexVersion,
+    query_vector: List[float],
+    filters: List[Dict[str, Any]],
+    top_k: int,
+    ef: int = 128,
+) -> List[SearchResultItem]:
+    cache = get_result_cache()
+    key = _cache_key(version, query_vector, filters, top_k, ef)
+    cached = cache.get(key)
+    if cached is not None:
+        return list(cached)
+    try:
+        return _query_endee(version, query_vector, filters, top_k, cache.generation, ef)
+    except _NOT_DEGRADABLE:
+        raise
+    except Exception as exc:
+        return _last_known_results(key, exc)
+
+
+async def _aquery(
+    version: IndexVersion,
+    query_vector: List[float],
+    filters: List[Dict[str, Any]],
+    top_k: int,
+    stage: str,
+    ef: int = 128,
+) -> List[SearchResultItem]:
+    cache = get_result_cache()
+    key = _cache_key(version, query_vector, filters, top_k, ef)
+    cached = cache.get(key)
+    if cached is not None:
+        return list(cached)
+    generation = cache.generation
+    try:
+        settings = get_settings()
+        if settings.vector_backend == "local" or settings.endee_transport == "sdk":
+            return await run_io(
+                stage, _query_endee, version, query_vector, filters, top_k, generation, ef
+            )
+
+        start = time.perf_counter()
+        try:
+            raw_results = await get_async_endee_client().query(
+                vector=query_vector,
+                top_k=top_k,
+                filters=filters or None,
+                ef=ef,
+                index_name=version.name,
+            )
+        finally:
+            get_metrics().observe(f"stage.{stage}", (time.perf_counter() - start) * 1000)
+    except _NOT_DEGRADABLE:
+        raise
+    except Exception as exc:
+        return _last_known_results(key, exc)
+    results = _to_results(raw_results)
+    _store_results(key, results, generation)
+    return list(results)
+
+
+def _query_endee(
+    version: IndexVersion,
+    query_vector: List[float],
+    filters: List[Dict[str, Any]],
+    top_k: int,
+    generation: int,
+    ef: int = 128,
+) -> List[SearchResultItem]:
+    client = get_endee_client(version)
     raw_results = client.query(
         vector=query_vector,
         top_k=top_k,
         filters=filters if filters else None,
-        ef=128,
+        ef=ef,
     )
+    results = _to_results(raw_results)
+    _store_results(_cache_key(version, query_vector, filters, top_k, ef), results, generation)
+    return list(results)
+
+
+# Errors that are not about Endee being unavailable and must reach the caller.
+_NOT_DEGRADABLE = (ExecutorSaturatedError, ValueError)
+
+
+def _store_results(key: tuple, results: List[SearchResultItem], generation: int) -> None:
+    get_result_cache().put(key, results, generation=generation)
+    get_fallback_cache().put(key, results)
+
+
+def _last_known_results(key: tuple, exc: Exception) -> List[SearchResultItem]:
+    """
+    Degraded mode: when Endee fails (or its circuit is open), serve the last
+    results seen for the same query, marked stale. Re-raises if there are none.
+    """
 
+    last_known = get_fallback_cache().get(key)
+    if last_known is None:
+        raise exc
+    get_metrics().increment("search.degraded")
+    logger.warning(f"Endee unavailable ({exc}); serving last-known results.")
+    return [replace(result, stale=True) for result in last_known]
+
+
+def collapse_chunks(results: List[SearchResultItem]) -> List[SearchResultItem]:
+    """
+    Merge chunk hits of the same item into one result (results already carry
+    the parent id). The best chunk supplies the snippet; the score is the best
+    chunk's (`chunk_score_mode=max`) or the sum over its hits (`sum`).
+    """
+
+    best: Dict[str, SearchResultItem] = {}
+    totals: Dict[str, float] = {}
+    for result in results:
+        if result.id not in best:
+            best[result.id] = result
+            totals[result.id] = result.score
+        else:
+            totals[result.id] += result.score
+    if len(best) == len(results):
+        return results
+    if get_settings().chunk_score_mode != "sum":
+        return list(best.values())
+    merged = [replace(best[item_id], score=round(totals[item_id], 6)) for item_id in best]
+    return _merge_by_score(merged)
+
+
+def _to_results(raw_results: List[Dict[str, Any]]) -> List[SearchResultItem]:
     results: List[SearchResultItem] = []
     for item in raw_results:
         meta = item.get("meta", {}) or {}
@@ -61,7 +438,7 @@ def search_support_knowledge(request: SearchRequest) -> List[SearchResultItem]:
 
         results.append(
             SearchResultItem(
-                id=item["id"],
+                id=meta.get("parent_id") or item["id"],
                 type=support_type,
                 title=title,
                 snippet=snippet,
@@ -72,6 +449,4 @@ def search_support_knowledge(request: SearchRequest) -> List[SearchResultItem]:
                 resolved=meta.get("resolved"),
             )
         )
-
-    return results
-
+    return collapse_chunks(results)
@@ -0,0 +1,119 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from backend.app.config import get_settings
+from backend.app.services.embeddings import warm_embedding_model
+from backend.app.services.endee_client import get_endee_client
+from backend.app.services.rerank import warm_cross_encoder
+
+
+class StartupState:
+    """
+    Tracks the service's startup progress ("warming" until the Endee index
+    check and optional model warm-ups have finished, then "ready").
+    """
+
+    def __init__(self) -> None:
+        self.status = "warming"
+        self.started_at = time.time()
+        self.steps: Dict[str, float] = {}
+        self.last_error: Optional[str] = None
+        self.stop_requested = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def record_step(self, name: str, elapsed_ms: float) -> None:
+        with self._lock:
+            self.steps[name] = round(elapsed_ms, 2)
+
+    def record_error(self, error: str) -> None:
+        with self._lock:
+            self.last_error = error
+
+    def mark_ready(self) -> None:
+        with self._lock:
+            self.status = "ready"
+            self.last_error = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "status": self.status,
+                "uptime_seconds": round(time.time() - self.started_at, 2),
+                "steps_ms": dict(self.steps),
+                "last_error": self.last_error,
+            }
+
+
+_state = StartupState()
+
+
+def get_startup_state() -> StartupState:
+    return _state
+
+
+def stop_warm_up() -> None:
+    """
+    Abort a warm-up that is still retrying the Endee index check, so the
+    server can shut down while Endee is unreachable.
+    """
+
+    get_startup_state().stop_requested.set()
+
+
+def warm_up(initial_backoff_seconds: float = 0.5, max_backoff_seconds: float = 30.0) -> None:
+    """
+    Blocking startup work: connect to Endee and make sure the index exists
+    (retrying with backoff until it does or `stop_warm_up` is called), then
+    optionally load and exercise the embedding model, and the cross-encoder
+    when re-ranking is enabled. Marks the startup state ready once done.
+    """
+
+    settings = get_settings()
+    state = get_startup_state()
+
+    delay = initial_backoff_seconds
+    start = time.perf_counter()
+    while True:
+        try:
+            get_endee_client()
+            break
+        except Exception as exc:
+            state.record_error(f"endee: {exc}")
+            logger.warning(f"Endee index check failed ({exc}); retrying in {delay:.1f}s.")
+            if state.stop_requested.wait(delay):
+                logger.info("Startup warm-up aborted.")
+                return
+            delay = min(delay * 2, max_backoff_seconds)
+    state.record_step("endee_index", (time.perf_counter() - start) * 1000.0)
+
+    if settings.warm_model_on_startup:
+        start = time.perf_counter()
+        try:
+            warm_embedding_model()
+        except Exception as exc:
+            # Queries will load the model lazily; don't hold readiness hostage.
+            state.record_error(f"embedding_model: {exc}")
+            logger.exception(f"Embedding model warm-up failed: {exc}")
+        else:
+            state.record_step("embedding_model", (time.perf_counter() - start) * 1000.0)
+
+    if settings.rerank_enabled:
+        start = time.perf_counter()
+        try:
+            warm_cross_encoder()
+        except Exception as exc:
+            # Re-ranking falls back to the input order until the model loads.
+            state.record_error(f"rerank_model: {exc}")
+            logger.exception(f"Cross-encoder warm-up failed: {exc}")
+        else:
+            state.record_step("rerank_model", (time.perf_counter() - start) * 1000.0)
+
+    state.mark_ready()
+    logger.info(f"Startup complete: {state.snapshot()['steps_ms']}")
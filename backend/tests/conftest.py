@@ -1,8 +1,61 @@
 import sys
 from pathlib import Path
 
+import pytest
+
 
 ROOT = Path(__file__).resolve().parents[2]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
+
+@pytest.fixture(autouse=True)
+def _clear_caches(monkeypatch, tmp_path):
+    from backend.app.config import get_settings
+    from backend.app.services.cache import (
+        get_answer_cache,
+        get_embedding_cache,
+        get_fallback_cache,
+        get_rerank_cache,
+        get_result_cache,
+        get_shared_invalidations,
+    )
+    from backend.app.services.circuit_breaker import get_endee_breaker
+    from backend.app.services.embedding_store import _open_embedding_store
+    from backend.app.services.index_alias import get_index_alias
+    from backend.app.services.jobs import get_ingest_job_queue
+    from backend.app.services.lexical import get_lexical_index
+    from backend.app.services.planner import get_filter_statistics
+
+    # Each test starts with an empty BM25 index, filter statistics and index alias of its own,
+    # and never writes manifests or stored embeddings into the repository's .cache.
+    monkeypatch.setenv("LEXICAL_INDEX_PATH", str(tmp_path / "lexical_index.sqlite"))
+    monkeypatch.setenv("FILTER_STATS_PATH", str(tmp_path / "filter_stats.sqlite"))
+    monkeypatch.setenv("INGEST_JOBS_DIR", str(tmp_path / "ingest_jobs"))
+    monkeypatch.setenv("INDEX_ALIAS_PATH", str(tmp_path / "index_alias.json"))
+    monkeypatch.setenv("MODEL_MANIFEST_PATH", str(tmp_path / "model_manifest.json"))
+    monkeypatch.setenv("INGEST_MANIFEST_PATH", str(tmp_path / "ingest_manifest.sqlite"))
+    monkeypatch.setenv("EMBEDDING_STORE_DIR", str(tmp_path / "embedding_store"))
+    monkeypatch.setenv("CACHE_INVALIDATION_PATH", str(tmp_path / "cache_invalidation.sqlite"))
+    get_settings.cache_clear()
+    get_index_alias.cache_clear()
+    get_lexical_index.cache_clear()
+    get_filter_statistics.cache_clear()
+    get_ingest_job_queue.cache_clear()
+    _open_embedding_store.cache_clear()
+    get_shared_invalidations.cache_clear()
+
+    get_embedding_cache().invalidate()
+    get_result_cache().invalidate()
+    get_fallback_cache().invalidate()
+    get_rerank_cache().invalidate()
+    get_answer_cache().invalidate()
+    get_endee_breaker().reset()
+    yield
+    get_settings.cache_clear()
+    get_index_alias.cache_clear()
+    get_lexical_index.cache_clear()
+    get_filter_statistics.cache_clear()
+    get_ingest_job_queue.cache_clear()
+    _open_embedding_store.cache_clear()
+    get_shared_invalidations.cache_clear()
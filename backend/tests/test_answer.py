@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from backend.app.config import get_settings
+from backend.app.models.domain import SearchResultItem, SupportItemType
+from backend.app.services import answer
+from backend.app.services.cache import get_answer_cache, invalidate_items
+from backend.app.services.llm import FakeLLMProvider, LLMClient
+from backend.app.services.metrics import get_metrics
+
+
+@pytest.fixture
+def llm_settings(monkeypatch):
+    def configure(**env):
+        env = {"LLM_PROVIDER": "fake", "LLM_RETRY_BACKOFF_MS": "1", **env}
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        get_settings.cache_clear()
+
+    monkeypatch.setattr(answer, "aembed_text", fake_embed)
+    return configure
+
+
+async def fake_embed(text, model_name=None):
+    # "vpn down" and "VPN is down" land close together, "disk full" elsewhere.
+    words = text.lower().split()
+    return [float("vpn" in words), float("down" in words), float("disk" in words), 0.1]
+
+
+def _item(item_id):
+    return SearchResultItem(
+        id=item_id, type=SupportItemType.TICKET, title=item_id, snippet="",
+        product=None, severity=None, score=0.9,
+    )
+
+
+def test_stream_answer_retries_until_first_token(llm_settings, monkeypatch):
+    llm_settings()
+    provider = FakeLLMProvider(reply="Check the VPN.", fail_times=1)
+    monkeypatch.setattr(answer, "get_llm_client", lambda: LLMClient(provider))
+
+    async def collect():
+        return [token async for token in answer.astream_answer("vpn down", [])]
+
+    assert asyncio.run(collect()) == ["Check ", "the ", "VPN."]
+    assert provider.calls == 2
+
+
+def test_generate_answer_cancels_attempts_that_time_out(llm_settings, monkeypatch):
+    llm_settings(LLM_TIMEOUT_SECONDS="0.05", LLM_MAX_RETRIES="1")
+    provider = FakeLLMProvider(delay_seconds=5)
+    monkeypatch.setattr(answer, "get_llm_client", lambda: LLMClient(provider))
+
+    assert asyncio.run(answer.agenerate_answer("vpn down", [])) is None
+    assert provider.calls == 2
+    assert provider.cancelled == 2
+    counters = get_metrics().snapshot()["counters"]
+    assert counters["llm.timeout"] >= 1
+
+
+def test_llm_client_caps_concurrency_and_counts_tokens(llm_settings):
+    llm_settings(LLM_MAX_CONCURRENCY="2")
+    provider = FakeLLMProvider(reply="Restart the gateway.", delay_seconds=0.01)
+    before = get_metrics().snapshot()["counters"].get("llm.tokens.completion", 0)
+
+    async def run():
+        client = LLMClient(provider)
+        return await asyncio.gather(*(client.complete("system", "user") for _ in range(6)))
+
+    completions = asyncio.run(run())
+    assert [c.text for c in completions] == ["Restart the gateway."] * 6
+    assert provider.max_active == 2
+    after = get_metrics().snapshot()["counters"]["llm.tokens.completion"]
+    assert after - before == 6 * 3
+
+
+def test_answer_cache_reuses_similar_queries_over_the_same_context(llm_settings, monkeypatch):
+    llm_settings()
+    provider = FakeLLMProvider(reply="Restart the VPN gateway.")
+    monkeypatch.setattr(answer, "get_llm_client", lambda: LLMClient(provider))
+    context = [_item("T-1"), _item("RB-2")]
+
+    async def run(query, items):
+        return await answer.agenerate_answer(query, items)
+
+    assert asyncio.run(run("vpn down", context)) == "Restart the VPN gateway."
+    assert asyncio.run(run("VPN is down", list(reversed(context)))) == "Restart the VPN gateway."
+    assert provider.calls == 1
+
+    asyncio.run(run("disk full", context))
+    asyncio.run(run("vpn down", [_item("T-1")]))
+    assert provider.calls == 3
+
+    invalidate_items(["RB-2#1"])
+    asyncio.run(run("vpn down", context))
+    assert provider.calls == 4
+    stats = get_answer_cache().stats()
+    assert stats["hits"] == 1 and stats["invalidations"] >= 2
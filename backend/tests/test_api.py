@@ -1,11 +1,11 @@
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 from fastapi.testclient import TestClient
 
 from backend.app.main import app
 
 
-@patch("backend.app.api.routes_search.search_support_knowledge")
+@patch("backend.app.api.routes_search.asearch_support_knowledge", new_callable=AsyncMock)
 def test_search_success(mock_search):
     from backend.app.models.domain import SearchResultItem, SupportItemType
 
@@ -48,3 +48,160 @@ def test_health_when_endee_unavailable(mock_get_client):
     data = resp.json()
     assert data.get("endee_status") == "unavailable"
     assert data.get("endee_index_stats") == {}
+    assert data["worker"]["memory"]["rss_kb"] > 0
+
+
+@patch("backend.app.api.routes_search.asearch_support_knowledge", new_callable=AsyncMock)
+def test_search_returns_429_when_saturated(mock_search):
+    from backend.app.services.executors import ExecutorSaturatedError
+
+    mock_search.side_effect = ExecutorSaturatedError("cpu", 4)
+
+    client = TestClient(app)
+    resp = client.post("/search", json={"query": "504 errors", "generate_answer": False})
+    assert resp.status_code == 429
+    assert resp.headers.get("retry-after") == "1"
+
+
+@patch("backend.app.api.routes_search.asearch_support_knowledge", new_callable=AsyncMock)
+def test_search_returns_503_when_endee_circuit_open(mock_search):
+    from backend.app.services.circuit_breaker import CircuitOpenError
+
+    mock_search.side_effect = CircuitOpenError("endee", 4.2)
+
+    client = TestClient(app)
+    resp = client.post("/search", json={"query": "504 errors", "generate_answer": False})
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "5"
+
+
+@patch("backend.app.services.search.asearch_support_knowledge", new_callable=AsyncMock)
+@patch("backend.app.services.search.aembed_queries", new_callable=AsyncMock)
+def test_search_batch_returns_results_in_order_with_per_item_errors(mock_embed, mock_search):
+    from backend.app.models.domain import SearchResultItem, SupportItemType
+    from backend.app.services.circuit_breaker import CircuitOpenError
+    from backend.app.services.index_alias import get_active_index
+
+    mock_embed.return_value = [[0.1], [0.2], [0.3]]
+
+    async def fake_search(request, vector, version):
+        if request.query == "broken":
+            raise CircuitOpenError("endee", 2.0)
+        return [
+            SearchResultItem(
+                id=f"FAQ-{vector[0]}", type=SupportItemType.FAQ, title=request.query,
+                snippet="", product=None, severity=None, score=0.5,
+            )
+        ]
+
+    mock_search.side_effect = fake_search
+
+    client = TestClient(app)
+    resp = client.post(
+        "/search/batch",
+        json={"requests": [{"query": "vpn"}, {"query": "broken"}, {"query": "disk"}]},
+    )
+    assert resp.status_code == 200
+    results = resp.json()["results"]
+    mock_embed.assert_awaited_once_with(
+        ["vpn", "broken", "disk"], get_active_index().model_name
+    )
+    assert [r["status"] for r in results] == [200, 503, 200]
+    assert results[0]["response"]["faqs"][0]["id"] == "FAQ-0.1"
+    assert results[2]["response"]["faqs"][0]["title"] == "disk"
+    assert results[1]["response"] is None and "unavailable" in results[1]["error"]
+
+
+@patch("backend.app.api.routes_search.is_llm_enabled", return_value=True)
+@patch("backend.app.api.routes_search.asearch_support_knowledge", new_callable=AsyncMock)
+def test_search_stream_sends_results_before_answer_tokens(mock_search, _llm_enabled):
+    from backend.app.models.domain import SearchResultItem, SupportItemType
+
+    mock_search.return_value = [
+        SearchResultItem(
+            id="RB-1", type=SupportItemType.RUNBOOK, title="Restart gateway", snippet="",
+            product=None, severity=None, score=0.8,
+        )
+    ]
+
+    async def fake_stream(query, results):
+        for token in ["Restart ", "the gateway."]:
+            yield token
+
+    client = TestClient(app)
+    with patch("backend.app.api.routes_search.astream_answer", fake_stream):
+        resp = client.post("/search/stream", json={"query": "vpn down"})
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    frames = [f for f in resp.text.split("\n\n") if f]
+    events = [f.split("\n")[0].replace("event: ", "") for f in frames]
+    assert events == ["results", "token", "token", "answer", "done"]
+    assert '"RB-1"' in frames[0]
+    assert frames[3].endswith('{"llm_answer": "Restart the gateway."}')
+
+
+@patch("backend.app.api.routes_ingest.apply_plan")
+@patch("backend.app.api.routes_ingest.aembed_texts", new_callable=AsyncMock)
+def test_ingest_returns_503_when_endee_circuit_open(mock_embed, mock_apply):
+    import numpy as np
+
+    from backend.app.services.circuit_breaker import CircuitOpenError
+
+    mock_embed.return_value = np.zeros((1, 2), dtype=np.float32)
+    mock_apply.side_effect = CircuitOpenError("endee", 2.5)
+
+    client = TestClient(app)
+    resp = client.post("/ingest", json=[{"id": "T1", "type": "ticket", "title": "t", "body": "b"}])
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "3"
+
+
+def test_ingest_job_submit_upload_and_poll():
+    client = TestClient(app)
+    resp = client.post(
+        "/ingest/jobs",
+        json=[{"id": f"FAQ-{i}", "type": "faq", "title": "q", "body": "a"} for i in range(250)],
+    )
+    assert resp.status_code == 202
+    job = resp.json()
+    # The body is spooled unparsed, so the item count is known once the job has run.
+    assert (job["status"], job["source"], job["total"]) == ("queued", "items", None)
+    assert client.post("/ingest/jobs", content=b"").status_code == 400
+
+    resp = client.post(
+        "/ingest/jobs/upload?format=tickets",
+        content=b"id,title,description\nT1,VPN down,Tunnel drops\n",
+        headers={"Content-Type": "text/csv"},
+    )
+    assert resp.status_code == 202 and resp.json()["source"] == "tickets"
+
+    polled = client.get(f"/ingest/jobs/{job['job_id']}")
+    assert polled.status_code == 200 and polled.json()["status"] == "queued"
+    assert [j["source"] for j in client.get("/ingest/jobs").json()] == ["tickets", "items"]
+    assert client.get("/ingest/jobs/missing").status_code == 404
+
+
+def test_item_updates_and_deletes():
+    from backend.app.models.domain import SupportItem, SupportItemType
+
+    client = TestClient(app)
+    updated = [SupportItem(id="T1", type=SupportItemType.TICKET, title="t", body="b")]
+    with patch("backend.app.api.routes_items.update_items", return_value=updated) as update:
+        resp = client.patch("/items", json=[{"id": "T1", "resolved": True}, {"id": "T9"}])
+    assert resp.json() == {"updated": 1, "missing": ["T9"]}
+    assert update.call_args[0][0] == {"T1": {"resolved": True}, "T9": {}}
+
+    with patch("backend.app.api.routes_items.delete_items_by_filter", return_value=4) as delete:
+        resp = client.post("/items/delete", json={"filters": {"product": "auth"}})
+    assert resp.json() == {"deleted": 4}
+    assert delete.call_args[0][0] == [{"product": {"$eq": "auth"}}]
+
+    with patch("backend.app.api.routes_items.delete_items", return_value=0):
+        resp = client.delete("/items/T9")
+    assert resp.status_code == 404
+    with patch("backend.app.api.routes_items.delete_items", return_value=2):
+        assert client.delete("/items/RB_1").json() == {"deleted": 2}
+
+    assert client.post("/items/delete", json={}).status_code == 400
+    assert client.post("/items/delete", json={"filters": {}}).status_code == 400
@@ -0,0 +1,96 @@
+import multiprocessing
+import time
+
+from backend.app.services.cache import (
+    TTLCache,
+    get_answer_cache,
+    get_result_cache,
+    get_shared_invalidations,
+    invalidate_items,
+    normalize_query,
+    vector_key,
+)
+
+
+def test_lru_eviction_and_counters():
+    cache = TTLCache("t", max_size=2, ttl_seconds=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+    assert stats["evictions"] == 1
+
+
+def test_ttl_expiry():
+    cache = TTLCache("t", max_size=10, ttl_seconds=0.01)
+    cache.put("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+
+
+def test_put_after_invalidate_is_dropped():
+    cache = TTLCache("t", max_size=10, ttl_seconds=60)
+    generation = cache.generation
+    cache.invalidate()
+    cache.put("a", 1, generation=generation)
+    assert cache.get("a") is None
+
+
+def test_query_and_vector_keys():
+    assert normalize_query("  VPN   Disconnects\n") == "vpn disconnects"
+    assert vector_key([0.1, 0.2]) == vector_key([0.1, 0.2])
+    assert vector_key([0.1, 0.2]) != vector_key([0.2, 0.1])
+
+
+def _invalidate_in_another_process(item_ids):
+    from backend.app.services import cache
+
+    # A fresh connection, as a separately started worker would open.
+    cache.get_shared_invalidations.cache_clear()
+    cache.invalidate_items(item_ids)
+
+
+def _run_in_another_process(item_ids):
+    process = multiprocessing.get_context("fork").Process(
+        target=_invalidate_in_another_process, args=(item_ids,)
+    )
+    process.start()
+    process.join(30)
+    assert process.exitcode == 0
+
+
+def test_invalidation_in_another_process_reaches_this_ones_caches():
+    results = get_result_cache()
+    answers = get_answer_cache()
+    results.put("query", ["item-1"])
+    answers.put([1.0, 0.0], ["item-1"], "cached answer")
+    answers.put([1.0, 0.0], ["item-2"], "other answer")
+    get_shared_invalidations()
+    assert results.get("query") == ["item-1"]
+
+    _run_in_another_process(["item-1"])
+
+    generation = results.generation
+    assert results.get("query") is None
+    assert results.generation != generation
+    assert answers.get([1.0, 0.0], ["item-1"]) is None
+    assert answers.get([1.0, 0.0], ["item-2"]) == "other answer"
+
+    _run_in_another_process(None)
+
+    assert answers.get([1.0, 0.0], ["item-2"]) is None
+
+
+def test_own_invalidations_are_not_applied_twice():
+    results = get_result_cache()
+    invalidate_items(["item-1"])
+    results.put("query", ["item-2"])
+
+    assert results.get("query") == ["item-2"]
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from backend.app.services import circuit_breaker
+from backend.app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+def _fail():
+    raise ConnectionError("down")
+
+
+def test_opens_after_threshold_and_fails_fast():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout_seconds=30)
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            breaker.call(_fail)
+    assert breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError) as info:
+        breaker.call(lambda: "never called")
+    assert 0 < info.value.retry_after <= 30
+
+
+def test_half_open_probe_closes_or_reopens(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout_seconds=5)
+
+    with pytest.raises(ConnectionError):
+        breaker.call(_fail)
+    now[0] += 5
+    assert breaker.state == "half_open"
+
+    # A failed probe re-opens the circuit for another full timeout.
+    with pytest.raises(ConnectionError):
+        breaker.call(_fail)
+    assert breaker.state == "open"
+
+    now[0] += 5
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == "closed"
+
+
+def test_only_one_probe_at_a_time_and_bad_input_is_not_a_failure(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout_seconds=5)
+    with pytest.raises(ConnectionError):
+        breaker.call(_fail)
+    now[0] += 5
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def slow_probe():
+            await release.wait()
+            return "ok"
+
+        probe = asyncio.ensure_future(breaker.acall(slow_probe))
+        await asyncio.sleep(0)
+        with pytest.raises(CircuitOpenError):
+            await breaker.acall(slow_probe)
+        release.set()
+        return await probe
+
+    assert asyncio.run(scenario()) == "ok"
+
+    def bad_input():
+        raise ValueError("wrong dimension")
+
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            breaker.call(bad_input)
+    assert breaker.state == "closed"
@@ -0,0 +1,90 @@
+import multiprocessing
+
+import numpy as np
+
+from backend.app.services import embeddings
+from backend.app.services.embedding_store import EmbeddingStore, text_hash
+
+
+def test_store_roundtrip_growth_and_reopen(tmp_path):
+    store = EmbeddingStore(tmp_path, "org/model")
+    store.GROWTH_ROWS = 2
+    hashes = [text_hash(f"text {i}") for i in range(5)]
+    vectors = np.arange(15, dtype=np.float32).reshape(5, 3)
+
+    store.put_many(hashes[:2], vectors[:2])
+    store.put_many(hashes, vectors)
+    assert store.count == 5
+    store.close()
+
+    reopened = EmbeddingStore(tmp_path, "org/model")
+    found = reopened.get_many(hashes + ["missing"])
+    assert set(found) == set(hashes)
+    np.testing.assert_array_equal(found[hashes[4]], vectors[4])
+
+
+def _put_in_batches(directory, writer, barrier):
+    store = EmbeddingStore(directory, "model")
+    store.GROWTH_ROWS = 8
+    barrier.wait()
+    for start in range(0, 200, 10):
+        hashes = [text_hash(f"{writer} {i}") for i in range(start, start + 10)]
+        vectors = np.array([[writer, i] for i in range(start, start + 10)], dtype=np.float32)
+        store.put_many(hashes, vectors)
+
+
+def test_processes_sharing_a_store_never_share_rows(tmp_path):
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(2)
+    writers = [
+        context.Process(target=_put_in_batches, args=(tmp_path, writer, barrier))
+        for writer in (1, 2)
+    ]
+    reader = EmbeddingStore(tmp_path, "model")
+    for process in writers:
+        process.start()
+    for process in writers:
+        process.join(30)
+        assert process.exitcode == 0
+
+    assert reader.count == 0
+    hashes = [text_hash(f"{writer} {i}") for writer in (1, 2) for i in range(200)]
+    matrix, missing = reader.gather(hashes)
+    assert missing == [] and reader.count == 400
+    expected = [[writer, i] for writer in (1, 2) for i in range(200)]
+    np.testing.assert_array_equal(matrix, expected)
+
+
+def test_store_prune_compacts(tmp_path):
+    store = EmbeddingStore(tmp_path, "model", dtype="float16")
+    hashes = [text_hash(t) for t in ["a", "b", "c"]]
+    store.put_many(hashes, np.eye(3, dtype=np.float32))
+
+    other = EmbeddingStore(tmp_path, "model")
+    assert other.get_many(hashes[:1])
+
+    assert store.prune([hashes[2]]) == 2
+    assert store.count == 1
+    found = store.get_many(hashes)
+    assert list(found) == [hashes[2]]
+    np.testing.assert_array_equal(found[hashes[2]], [0.0, 0.0, 1.0])
+    # A process that mapped the store before the compaction remaps it.
+    found = other.get_many(hashes)
+    assert list(found) == [hashes[2]]
+    np.testing.assert_array_equal(found[hashes[2]], [0.0, 0.0, 1.0])
+
+
+def test_embed_texts_reads_store_before_encoding(monkeypatch, tmp_path):
+    store = EmbeddingStore(tmp_path, "model")
+    encoded = []
+
+    def fake_encode(texts, model_name=None):
+        encoded.extend(texts)
+        return np.array([[float(len(t)), 0.0] for t in texts], dtype=np.float32)
+
+    monkeypatch.setattr(embeddings, "get_embedding_store", lambda model_name=None: store)
+    monkeypatch.setattr(embeddings, "encode_texts_array", fake_encode)
+
+    assert embeddings.embed_texts(["aa", "b"]) == [[2.0, 0.0], [1.0, 0.0]]
+    assert embeddings.embed_texts(["b", "ccc"]) == [[1.0, 0.0], [3.0, 0.0]]
+    assert encoded == ["aa", "b", "ccc"]
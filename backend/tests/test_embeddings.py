@@ -1,5 +1,7 @@
 import numpy as np
+import pytest
 
+from backend.app.config import get_settings
 from backend.app.services import embeddings
 
 
@@ -8,9 +10,172 @@ def test_embed_text_uses_model(monkeypatch):
         def encode(self, text, convert_to_numpy=True):
             return np.array([0.1, 0.2, 0.3], dtype=np.float32)
 
-    monkeypatch.setattr(embeddings, "get_embedding_model", lambda: DummyModel())
+    monkeypatch.setattr(embeddings, "get_embedding_model", lambda model_name=None: DummyModel())
 
     vec = embeddings.embed_text("hello world")
     assert isinstance(vec, list)
     assert len(vec) == 3
 
+
+
+def test_batcher_coalesces_concurrent_embeds(monkeypatch):
+    import asyncio
+
+    calls = []
+
+    def fake_embed_texts(texts, model_name=None):
+        calls.append(list(texts))
+        return [[float(len(t))] for t in texts]
+
+    monkeypatch.setattr(embeddings, "encode_texts", fake_embed_texts)
+    batcher = embeddings.EmbeddingBatcher(window_ms=20, max_batch=32)
+
+    async def scenario():
+        return await asyncio.gather(
+            *(batcher.embed(t) for t in ["a", "bb", "ccc", "bb"])
+        )
+
+    vectors = asyncio.run(scenario())
+
+    assert calls == [["a", "bb", "ccc"]]
+    assert vectors == [[1.0], [2.0], [3.0], [2.0]]
+
+
+def test_batcher_flushes_full_batch_immediately(monkeypatch):
+    import asyncio
+
+    calls = []
+
+    def fake_embed_texts(texts, model_name=None):
+        calls.append(list(texts))
+        return [[0.0] for _ in texts]
+
+    monkeypatch.setattr(embeddings, "encode_texts", fake_embed_texts)
+    batcher = embeddings.EmbeddingBatcher(window_ms=10_000, max_batch=2)
+
+    async def scenario():
+        return await asyncio.wait_for(
+            asyncio.gather(batcher.embed("x"), batcher.embed("y")), timeout=5
+        )
+
+    asyncio.run(scenario())
+    assert calls == [["x", "y"]]
+
+
+def test_embed_queries_encodes_new_distinct_queries_once(monkeypatch):
+    calls = []
+
+    def fake_encode_texts(texts, model_name=None):
+        calls.append(list(texts))
+        return [[float(len(t))] for t in texts]
+
+    monkeypatch.setattr(embeddings, "encode_texts", fake_encode_texts)
+    embeddings.get_embedding_cache().put(("model-a", "cached"), [9.0])
+    # The same text embedded by another model is not a cache hit.
+    embeddings.get_embedding_cache().put(("model-b", "disk full"), [1.0])
+
+    vectors = embeddings.embed_queries(
+        ["VPN down", "cached", "vpn  down", "disk full"], "model-a"
+    )
+
+    assert calls == [["VPN down", "disk full"]]
+    assert vectors == [[8.0], [9.0], [8.0], [9.0]]
+
+
+def _tiny_sentence_transformer(path):
+    # A small random BERT with its own vocabulary, so the test runs offline.
+    import torch
+    from sentence_transformers import SentenceTransformer, models
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+
+    words = "vpn down disk full login after password reset rotate api key 504 on eu".split()
+    path.mkdir()
+    (path / "vocab.txt").write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]"] + words))
+    BertTokenizerFast(vocab_file=str(path / "vocab.txt")).save_pretrained(str(path))
+    torch.manual_seed(0)
+    config = BertConfig(
+        vocab_size=len(words) + 4, hidden_size=32, num_hidden_layers=2,
+        num_attention_heads=2, intermediate_size=64, max_position_embeddings=64,
+    )
+    BertModel(config).save_pretrained(str(path))
+    transformer = models.Transformer(str(path), max_seq_length=16)
+    model = SentenceTransformer(
+        modules=[transformer, models.Pooling(32, "mean"), models.Normalize()], device="cpu"
+    )
+    model.save(str(path / "st"))
+    return str(path / "st")
+
+
+@pytest.mark.parametrize("quantize", ["false", "true"])
+def test_onnx_backend_matches_pytorch_vectors(monkeypatch, tmp_path, quantize):
+    pytest.importorskip("onnxruntime")
+    from sentence_transformers import SentenceTransformer
+
+    model_name = _tiny_sentence_transformer(tmp_path / "model")
+    monkeypatch.setenv("EMBEDDING_BACKEND", "onnx")
+    monkeypatch.setenv("EMBEDDING_ONNX_DIR", str(tmp_path / "onnx"))
+    monkeypatch.setenv("EMBEDDING_ONNX_QUANTIZE", quantize)
+    get_settings.cache_clear()
+    texts = [
+        "VPN down", "disk full on eu", "login loop after password reset",
+        "rotate api key " * 6, "504", "",
+    ] * 8
+
+    reference = SentenceTransformer(model_name, device="cpu").encode(texts)
+    onnx_model = embeddings.get_embedding_model(model_name)
+    vectors = embeddings.encode_texts_array(texts, model_name)
+    embeddings._load_embedding_model.cache_clear()
+
+    assert type(onnx_model).__name__ == "OnnxEncoder"
+    assert vectors.shape == reference.shape and vectors.dtype == np.float32
+    cosine = np.sum(vectors * reference, axis=1)
+    assert cosine.min() >= 0.99
+    assert float(np.dot(onnx_model.encode("VPN down"), reference[0])) >= 0.99
+
+
+def test_onnx_export_is_renamed_into_place(monkeypatch, tmp_path):
+    pytest.importorskip("onnxruntime")
+    from backend.app.services import onnx_encoder
+
+    def fake_export(model_name, directory, quantize=False):
+        (directory / onnx_encoder.MODEL_FILE).write_text("graph")
+        if fail:
+            raise RuntimeError("export failed")
+        (directory / onnx_encoder.CONFIG_FILE).write_text("{}")
+
+    monkeypatch.setattr(onnx_encoder, "export_onnx", fake_export)
+    monkeypatch.setenv("EMBEDDING_ONNX_DIR", str(tmp_path / "onnx"))
+    get_settings.cache_clear()
+
+    fail = True
+    with pytest.raises(RuntimeError):
+        embeddings.ensure_onnx_export("org/model")
+    assert list((tmp_path / "onnx").iterdir()) == []
+
+    fail = False
+    directory = embeddings.ensure_onnx_export("org/model")
+    assert directory == tmp_path / "onnx" / "org__model"
+    assert onnx_encoder.is_exported(directory)
+    assert [path.name for path in (tmp_path / "onnx").iterdir()] == ["org__model"]
+
+
+def test_onnx_backend_falls_back_to_pytorch_without_onnx(monkeypatch, tmp_path):
+    pytest.importorskip("onnxruntime")
+    from sentence_transformers import SentenceTransformer
+
+    from backend.app.services import onnx_encoder
+
+    def missing_onnx(model_name, directory, quantize=False):
+        raise ImportError("No module named 'onnx'")
+
+    model_name = _tiny_sentence_transformer(tmp_path / "model")
+    monkeypatch.setattr(onnx_encoder, "export_onnx", missing_onnx)
+    monkeypatch.setenv("EMBEDDING_BACKEND", "onnx")
+    monkeypatch.setenv("EMBEDDING_ONNX_DIR", str(tmp_path / "onnx"))
+    get_settings.cache_clear()
+
+    model = embeddings.get_embedding_model(model_name)
+    embeddings._load_embedding_model.cache_clear()
+
+    assert isinstance(model, SentenceTransformer)
+    assert list((tmp_path / "onnx").iterdir()) == []
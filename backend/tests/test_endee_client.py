@@ -1,6 +1,10 @@
 from typing import List
 
+import pytest
+from endee.exceptions import NotFoundException
+
 from backend.app.models.domain import SupportItem, SupportItemType
+from backend.app.services.circuit_breaker import CircuitOpenError, get_endee_breaker
 from backend.app.services.endee_client import EndeeClientWrapper
 
 
@@ -55,3 +59,97 @@ def test_upsert_support_items(monkeypatch):
     assert len(index.upserted) == 1
     assert index.upserted[0]["id"] == "T1"
 
+
+
+def test_upsert_accepts_float32_matrix():
+    import numpy as np
+
+    wrapper = EndeeClientWrapper.__new__(EndeeClientWrapper)
+    wrapper.index_name = "support_knowledge"
+    wrapper._index = DummyIndex()
+
+    items = [
+        SupportItem(id=f"T{i}", type=SupportItemType.TICKET, title="t", body="b")
+        for i in range(2)
+    ]
+    vectors = np.array([[0.1, 0.2], [0.3, 0.4]], dtype=np.float32)
+
+    wrapper.upsert_support_items(items, vectors)
+
+    upserted = wrapper._index.upserted
+    assert [u["id"] for u in upserted] == ["T0", "T1"]
+    assert upserted[1]["vector"] == vectors[1].tolist()
+
+
+class StoredIndex(DummyIndex):
+    def __init__(self, stored):
+        super().__init__()
+        self.stored = stored
+        self.fetched = []
+
+    def get_vector(self, item_id):
+        self.fetched.append(item_id)
+        if item_id not in self.stored:
+            raise NotFoundException("missing")
+        return self.stored[item_id]
+
+    def delete_vector(self, item_id):
+        if item_id not in self.stored:
+            raise NotFoundException("missing")
+        del self.stored[item_id]
+        return "1 rows deleted"
+
+
+def _stored_wrapper(stored):
+    wrapper = EndeeClientWrapper.__new__(EndeeClientWrapper)
+    wrapper.index_name = "support_knowledge"
+    wrapper._index = StoredIndex(stored)
+    return wrapper
+
+
+def test_patch_fetches_stored_vectors_through_the_breaker():
+    stored = {
+        f"T{i}": {"vector": [float(i)], "meta": {"type": "ticket", "title": "t"}, "filter": "{}"}
+        for i in range(5)
+    }
+    wrapper = _stored_wrapper(stored)
+
+    updated = wrapper.patch_support_items({"T1": {"resolved": True}, "T3": {}, "T9": {}})
+
+    assert sorted(item.id for item in updated) == ["T1", "T3"]
+    assert sorted(wrapper._index.fetched) == ["T1", "T3", "T9"]
+    assert {u["id"]: u["vector"] for u in wrapper._index.upserted} == {"T1": [1.0], "T3": [3.0]}
+
+    breaker = get_endee_breaker()
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    wrapper._index.fetched.clear()
+    with pytest.raises(CircuitOpenError):
+        wrapper.patch_support_items({"T1": {"resolved": False}})
+    assert wrapper._index.fetched == []
+
+
+def test_metadata_update_refuses_items_missing_from_the_index():
+    wrapper = _stored_wrapper({"T1": {"vector": [1.0]}})
+    items = [
+        SupportItem(id=item_id, type=SupportItemType.TICKET, title="t", body="b")
+        for item_id in ("T1", "T2")
+    ]
+
+    with pytest.raises(ValueError, match="T2"):
+        wrapper.update_support_items_metadata(items)
+    assert wrapper._index.upserted == []
+
+
+def test_delete_counts_only_items_in_the_index_and_uses_the_breaker():
+    wrapper = _stored_wrapper({f"T{i}": {"vector": [1.0]} for i in range(4)})
+
+    assert wrapper.delete_support_items(["T0", "T2", "T9"]) == 2
+    assert sorted(wrapper._index.stored) == ["T1", "T3"]
+
+    breaker = get_endee_breaker()
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        wrapper.delete_support_items(["T1"])
+    assert sorted(wrapper._index.stored) == ["T1", "T3"]
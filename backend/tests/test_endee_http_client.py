@@ -0,0 +1,208 @@
+import asyncio
+import json
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import msgpack
+import numpy as np
+import orjson
+import pytest
+
+from backend.app.config import Settings
+from backend.app.services import endee_client
+from backend.app.services.endee_client import AsyncEndeeClient
+
+
+class StandInEndee(ThreadingHTTPServer):
+    """
+    Minimal local stand-in for the Endee /api/v1 endpoints the async client
+    uses. Stores vectors in memory and can fail or stall on demand.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.vectors = {}
+        self.fail_next = 0
+        self.delay_seconds = 0.0
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.connections = set()
+        self.token = None
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/api/v1"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body, content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        with server.lock:
+            server.requests += 1
+            server.connections.add(self.client_address)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            fail = server.fail_next > 0
+            server.fail_next -= 1 if fail else 0
+        try:
+            time.sleep(server.delay_seconds)
+            if fail:
+                return self._reply(503, b"unavailable")
+            if self.headers.get("Authorization") != server.token:
+                return self._reply(401, b"unauthorized")
+            path = self.path
+            if path.endswith("/info"):
+                info = {"dimension": 2, "space_type": "cosine"}
+                return self._reply(200, json.dumps(info).encode())
+            if path.endswith("/search"):
+                query = json.loads(body)
+                q = np.asarray(query["vector"], dtype=np.float32)
+                hits = []
+                for vid, meta, flt, norm, vec in server.vectors.values():
+                    hits.append([float(np.dot(q, vec)), vid, meta, flt, norm])
+                hits.sort(key=lambda h: h[0], reverse=True)
+                return self._reply(200, msgpack.packb(hits[: query["k"]]), "application/msgpack")
+            return self._reply(404, b"not found")
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    do_GET = _handle
+    do_POST = _handle
+
+
+@pytest.fixture
+def standin():
+    server = StandInEndee()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _client(monkeypatch, server, **overrides):
+    settings = Settings(endee_retry_backoff_ms=1, **overrides)
+    monkeypatch.setattr(endee_client, "get_settings", lambda: settings)
+    return AsyncEndeeClient(base_url=server.url)
+
+
+def _store(server, vid, meta, flt, vector):
+    # Rows as Endee stores them: [id, zlib-compressed JSON meta, filter JSON, norm, vector].
+    meta = zlib.compress(orjson.dumps(meta))
+    server.vectors[vid] = [vid, meta, orjson.dumps(flt).decode(), 1.0, vector]
+
+
+def test_query_round_trip(monkeypatch, standin):
+    _store(standin, "T1", {"type": "ticket", "title": "Timeout"}, {"type": "ticket"}, [1.0, 0.0])
+    _store(standin, "F1", {"type": "faq"}, {"type": "faq"}, [0.0, 1.0])
+    client = _client(monkeypatch, standin)
+
+    async def scenario():
+        hits = await client.query([1.0, 0.1], top_k=1, filters=[{"type": {"$eq": "ticket"}}])
+        await client.aclose()
+        return hits
+
+    hits = asyncio.run(scenario())
+
+    assert [h["id"] for h in hits] == ["T1"]
+    assert hits[0]["meta"] == {"type": "ticket", "title": "Timeout"}
+    assert hits[0]["filter"] == {"type": "ticket"}
+    assert hits[0]["similarity"] == pytest.approx(0.995, abs=1e-3)
+
+
+def test_auth_header_only_sent_with_a_token(monkeypatch, standin):
+    async def info(client):
+        try:
+            return await client.index_info()
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(info(_client(monkeypatch, standin)))["dimension"] == 2
+
+    standin.token = "secret"
+    assert asyncio.run(info(_client(monkeypatch, standin, endee_auth_token="secret")))
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(info(_client(monkeypatch, standin)))
+
+
+def test_transient_failures_are_retried(monkeypatch, standin):
+    _store(standin, "T1", {"type": "ticket"}, {}, [1.0, 0.0])
+    client = _client(monkeypatch, standin, endee_max_retries=2)
+    standin.fail_next = 2
+
+    async def scenario():
+        hits = await client.query([1.0, 0.0], top_k=1)
+        await client.aclose()
+        return hits
+
+    assert [h["id"] for h in asyncio.run(scenario())] == ["T1"]
+    assert standin.requests == 4  # info (failed twice, then ok) + search
+
+
+def test_gives_up_after_max_retries(monkeypatch, standin):
+    client = _client(monkeypatch, standin, endee_max_retries=1)
+    standin.fail_next = 5
+
+    async def scenario():
+        try:
+            await client.index_info()
+        finally:
+            await client.aclose()
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(scenario())
+    assert standin.requests == 2
+
+
+def test_in_flight_calls_are_bounded_and_connections_reused(monkeypatch, standin):
+    client = _client(monkeypatch, standin, endee_max_in_flight=2)
+    standin.delay_seconds = 0.05
+
+    async def scenario():
+        await client.index_info()
+        await asyncio.gather(*(client.query([1.0, 0.0], top_k=1) for _ in range(8)))
+        await client.aclose()
+
+    asyncio.run(scenario())
+
+    assert standin.max_in_flight <= 2
+    assert len(standin.connections) <= 2
+
+
+def test_query_timeout(monkeypatch, standin):
+    client = _client(
+        monkeypatch, standin, endee_query_timeout_seconds=0.05, endee_max_retries=0
+    )
+    standin.delay_seconds = 0.3
+
+    async def scenario():
+        try:
+            await client.index_info()
+        finally:
+            await client.aclose()
+
+    start = time.perf_counter()
+    with pytest.raises(httpx.TimeoutException):
+        asyncio.run(scenario())
+    assert time.perf_counter() - start < 0.3
@@ -0,0 +1,67 @@
+import asyncio
+import threading
+
+import pytest
+
+from backend.app.services.executors import BoundedExecutor, ExecutorSaturatedError
+from backend.app.services.metrics import get_metrics
+
+
+def test_bounded_executor_runs_and_records_latency():
+    executor = BoundedExecutor("test", max_workers=1, max_queue=0)
+    try:
+        result = asyncio.run(executor.run("unit", lambda x: x * 2, 21))
+    finally:
+        executor.shutdown()
+
+    assert result == 42
+    assert executor.pending == 0
+    assert get_metrics().snapshot()["latency"]["stage.unit"]["count"] >= 1
+
+
+def test_bounded_executor_rejects_when_full():
+    executor = BoundedExecutor("test-full", max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        first = asyncio.ensure_future(executor.run("block", release.wait))
+        second = asyncio.ensure_future(executor.run("block", release.wait))
+        await asyncio.sleep(0)
+        with pytest.raises(ExecutorSaturatedError):
+            await executor.run("block", release.wait)
+        release.set()
+        await asyncio.gather(first, second)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+
+    assert executor.pending == 0
+
+
+def test_blocking_call_waits_for_a_free_slot():
+    executor = BoundedExecutor("test-call", max_workers=1, max_queue=0)
+    release = threading.Event()
+    results = []
+
+    async def scenario():
+        blocker = asyncio.ensure_future(executor.run("block", release.wait))
+        await asyncio.sleep(0)
+        caller = threading.Thread(
+            target=lambda: results.append(executor.call("unit", lambda x: x + 1, 1))
+        )
+        caller.start()
+        await asyncio.sleep(0.05)
+        assert results == [] and executor.pending == 1
+        release.set()
+        await blocker
+        await asyncio.get_running_loop().run_in_executor(None, caller.join, 5)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+
+    assert results == [2]
+    assert executor.pending == 0
@@ -0,0 +1,225 @@
+import sqlite3
+from typing import List
+
+import numpy as np
+import pytest
+
+from backend.app.config import Settings
+from backend.app.models.domain import SupportItem, SupportItemType
+from backend.app.services import ingestion
+from backend.app.services.manifest import IngestManifest, item_hashes
+
+
+class RecordingClient:
+    def __init__(self, fail_on_batch=None):
+        self.batches: List[List[str]] = []
+        self.fail_on_batch = fail_on_batch
+
+    def upsert_support_items(self, items, vectors):
+        if self.fail_on_batch is not None and len(self.batches) == self.fail_on_batch:
+            raise RuntimeError("endee unavailable")
+        assert len(items) == len(vectors)
+        if items:
+            self.batches.append([item.id for item in items])
+
+    def update_support_items_metadata(self, items):
+        self.metadata_updates = getattr(self, "metadata_updates", []) + [i.id for i in items]
+
+    def update_support_item_filters(self, items):
+        self.filter_updates = getattr(self, "filter_updates", []) + [i.id for i in items]
+
+    def delete_support_items(self, ids):
+        self.deleted = list(ids)
+        return len(ids)
+
+
+def zero_vectors(texts, model_name=None):
+    return np.zeros((len(texts), 1))
+
+
+def _items(n: int) -> List[SupportItem]:
+    return [
+        SupportItem(id=f"T{i}", type=SupportItemType.TICKET, title=f"t{i}", body="b")
+        for i in range(n)
+    ]
+
+
+def test_ingest_stream_batches(monkeypatch):
+    client = RecordingClient()
+    monkeypatch.setattr(ingestion, "get_endee_client", lambda version=None: client)
+    monkeypatch.setattr(ingestion, "embed_texts_array", zero_vectors)
+
+    stats = ingestion.ingest_stream(iter(_items(5)), batch_size=2)
+
+    assert client.batches == [["T0", "T1"], ["T2", "T3"], ["T4"]]
+    assert stats.ingested == 5
+    assert stats.batches == 3
+
+
+def test_ingest_stream_resumes_from_checkpoint(monkeypatch, tmp_path):
+    checkpoint = tmp_path / "checkpoint.json"
+    monkeypatch.setattr(ingestion, "embed_texts_array", zero_vectors)
+
+    failing = RecordingClient(fail_on_batch=1)
+    monkeypatch.setattr(ingestion, "get_endee_client", lambda version=None: failing)
+    try:
+        ingestion.ingest_stream(iter(_items(5)), batch_size=2, checkpoint_path=checkpoint)
+    except RuntimeError:
+        pass
+    assert checkpoint.exists()
+
+    client = RecordingClient()
+    monkeypatch.setattr(ingestion, "get_endee_client", lambda version=None: client)
+    stats = ingestion.ingest_stream(iter(_items(5)), batch_size=2, checkpoint_path=checkpoint)
+
+    assert client.batches == [["T2", "T3"], ["T4"]]
+    assert stats.ingested == 3
+    assert stats.skipped == 2
+    assert not checkpoint.exists()
+
+
+def test_ingest_stream_rejects_checkpoint_from_another_source(monkeypatch, tmp_path):
+    checkpoint = tmp_path / "checkpoint.json"
+    checkpoint.write_text('{"last_id": "X9", "ingested": 4}')
+    client = RecordingClient()
+    monkeypatch.setattr(ingestion, "get_endee_client", lambda version=None: client)
+    monkeypatch.setattr(ingestion, "embed_texts_array", zero_vectors)
+
+    with pytest.raises(ValueError, match="X9"):
+        ingestion.ingest_stream(iter(_items(3)), batch_size=2, checkpoint_path=checkpoint)
+    assert client.batches == [] and checkpoint.exists()
+
+
+def test_sample_loaders_stream_all_files():
+    items = list(ingestion.iter_sample_items())
+    types = {item.type for item in items}
+    assert types == {SupportItemType.TICKET, SupportItemType.FAQ, SupportItemType.RUNBOOK}
+
+
+def test_incremental_ingest_skips_unchanged_and_prunes(monkeypatch, tmp_path):
+    encoded = []
+
+    def fake_embed_texts(texts, model_name=None):
+        encoded.extend(texts)
+        return np.zeros((len(texts), 1))
+
+    monkeypatch.setattr(ingestion, "embed_texts_array", fake_embed_texts)
+    manifest = IngestManifest(tmp_path / "manifest.sqlite", "support_knowledge", "model")
+
+    first = RecordingClient()
+    monkeypatch.setattr(ingestion, "get_endee_client", lambda version=None: first)
+    ingestion.ingest_stream(iter(_items(3)), batch_size=10, manifest=manifest, prune_missing=True)
+    assert len(encoded) == 3
+
+    changed = _items(2)
+    changed[0].body = "new body"
+    changed[1].tags = ["vpn"]
+    second = RecordingClient()
+    monkeypatch.setattr(ingestion, "get_endee_client", lambda version=None: second)
+    encoded.clear()
+    stats = ingestion.ingest_stream(
+        iter(changed), batch_size=10, manifest=manifest, prune_missing=True
+    )
+
+    assert encoded == [changed[0].to_text()]
+    assert second.batches == [["T0"]]
+    assert second.metadata_updates == ["T1"]
+    assert second.deleted == ["T2"]
+    assert (stats.embedded, stats.metadata_updated, stats.deleted) == (1, 1, 1)
+
+
+def test_long_bodies_are_chunked_and_old_chunks_superseded(monkeypatch, tmp_path):
+    monkeypatch.setattr(ingestion, "embed_texts_array", zero_vectors)
+    monkeypatch.setattr(
+        ingestion, "get_settings", lambda: Settings(chunk_size_tokens=4, chunk_overlap_tokens=1)
+    )
+    manifest = IngestManifest(tmp_path / "manifest.sqlite", "support_knowledge", "model")
+    runbook = SupportItem(
+        id="RB_1", type=SupportItemType.RUNBOOK, title="Restart", body="one two three four five six"
+    )
+
+    chunks = ingestion.chunk_items([runbook])
+    assert [c.id for c in chunks] == ["RB_1#0", "RB_1#1"]
+    assert [c.body for c in chunks] == ["one two three four", "four five six"]
+    assert chunks[1].meta()["parent_id"] == "RB_1" and chunks[1].filter() == runbook.filter()
+
+    client = RecordingClient()
+    monkeypatch.setattr(ingestion, "get_endee_client", lambda version=None: client)
+    ingestion.ingest_stream(iter([runbook]), manifest=manifest)
+    assert client.batches == [["RB_1#0", "RB_1#1"]]
+
+    runbook.body = "one two"
+    ingestion.ingest_stream(iter([runbook]), manifest=manifest)
+    assert client.batches[-1] == ["RB_1"]
+    assert sorted(client.deleted) == ["RB_1#0", "RB_1#1"]
+
+
+def test_partial_updates_and_deletes_skip_the_model(monkeypatch, tmp_path):
+    from backend.app.services.lexical import get_lexical_index
+    from backend.app.services.local_index import LocalVectorIndex
+    from backend.app.services.planner import get_filter_statistics
+
+    monkeypatch.setattr(
+        ingestion, "embed_texts_array", lambda texts, model_name=None: np.ones((len(texts), 2))
+    )
+    monkeypatch.setattr(
+        ingestion, "get_settings", lambda: Settings(chunk_size_tokens=4, chunk_overlap_tokens=1)
+    )
+    index = LocalVectorIndex(tmp_path / "index", "support_knowledge", "float32")
+    monkeypatch.setattr(ingestion, "get_endee_client", lambda version=None: index)
+    manifest = IngestManifest(tmp_path / "manifest.sqlite", "support_knowledge", "model")
+    runbook = SupportItem(
+        id="RB_1", type=SupportItemType.RUNBOOK, title="Restart", body="one two three four five six"
+    )
+    ticket = SupportItem(
+        id="T1", type=SupportItemType.TICKET, title="Login loop", body="SSO", product="auth",
+        resolved=False, priority=10,
+    )
+    ingestion.ingest_stream(iter([runbook, ticket]), manifest=manifest)
+
+    monkeypatch.setattr(ingestion, "embed_texts_array", None)
+    updated = ingestion.update_items(
+        {"RB_1": {"priority": 5}, "T1": {"resolved": True}, "nope": {"url": "x"}}, manifest
+    )
+    assert sorted(item.id for item in updated) == ["RB_1#0", "RB_1#1", "T1"]
+    hits = index.query([1.0, 1.0], top_k=5, filters=[{"priority": {"$range": [0, 5]}}])
+    assert sorted(hit["id"] for hit in hits) == ["RB_1#0", "RB_1#1"]
+    assert get_lexical_index().search("login", 1)[0][0] == "T1"
+    assert get_lexical_index().result_items(["T1"])["T1"].resolved is True
+    ticket.resolved = True
+    assert manifest.plan([ticket]).unchanged == [ticket]
+
+    # The ids to delete come from the manifest, not from the filter statistics.
+    get_filter_statistics().remove(["T1"])
+    assert manifest.matching_ids([{"priority": {"$range": [0, 5]}}]) == ["RB_1#0", "RB_1#1"]
+    assert ingestion.delete_items_by_filter([{"product": {"$eq": "auth"}}], manifest) == 1
+    assert ingestion.delete_items(["RB_1"], manifest) == 2
+    assert index.query([1.0, 1.0], top_k=5) == []
+    assert len(get_lexical_index()) == 0 and get_filter_statistics().total == 0
+    assert manifest.chunk_ids(["RB_1", "T1"]) == {"RB_1": [], "T1": []}
+
+
+def test_manifest_without_filter_and_body_columns_rewrites_items_on_next_ingest(tmp_path):
+    path = tmp_path / "manifest.sqlite"
+    ticket = SupportItem(id="T1", type=SupportItemType.TICKET, title="t", body="b", product="vpn")
+    hashes = item_hashes(ticket, "model")
+    conn = sqlite3.connect(str(path))
+    conn.execute(
+        "CREATE TABLE manifest (index_name TEXT NOT NULL, id TEXT NOT NULL, "
+        "text_hash TEXT NOT NULL, meta_hash TEXT NOT NULL, filter_hash TEXT NOT NULL, "
+        "last_run TEXT, updated_at REAL NOT NULL, PRIMARY KEY (index_name, id))"
+    )
+    conn.execute(
+        "INSERT INTO manifest VALUES ('idx', 'T1', ?, ?, ?, NULL, 0)",
+        (hashes.text, hashes.meta, hashes.filter),
+    )
+    conn.commit()
+    conn.close()
+
+    manifest = IngestManifest(path, "idx", "model")
+    assert manifest.matching_ids([{"product": {"$eq": "vpn"}}]) == []
+    # Meta is rewritten too, so the body gets recorded.
+    assert manifest.plan([ticket]).metadata == [ticket]
+    manifest.record([ticket])
+    assert manifest.matching_ids([{"product": {"$eq": "vpn"}}]) == ["T1"]
+    assert manifest.bodies(["T1"]) == {"T1": "b"}
@@ -0,0 +1,130 @@
+import json
+
+from backend.app.config import get_settings
+from backend.app.services import ingestion, jobs
+from backend.app.services.jobs import get_ingest_job_queue, run_job
+from backend.tests.test_ingestion import RecordingClient, zero_vectors
+
+
+def _fake_backend(monkeypatch):
+    client = RecordingClient()
+    monkeypatch.setattr(ingestion, "get_endee_client", lambda version=None: client)
+    monkeypatch.setattr(ingestion, "embed_texts_array", zero_vectors)
+    monkeypatch.setattr(jobs, "get_ingest_manifest", lambda: None)
+    return client
+
+
+def test_job_reports_progress_and_skips_bad_rows(monkeypatch):
+    monkeypatch.setenv("INGEST_BATCH_SIZE", "2")
+    get_settings.cache_clear()
+    client = _fake_backend(monkeypatch)
+    queue = get_ingest_job_queue()
+    job_id = queue.new_job_id()
+    path = queue.spool_path(job_id, "tickets")
+    path.write_text(
+        "id,title,description,product,severity\n"
+        "T1,VPN down,Tunnel drops,vpn,P1\n"
+        "T2,,,vpn,P2\n"
+        "T3,Disk full,Volume at 100%,storage,P2\n"
+        "T4,Login loop,Redirect loop,auth,P3\n",
+        encoding="utf-8",
+    )
+    queue.submit(job_id, "tickets")
+
+    progress = []
+    monkeypatch.setattr(queue, "update", _recording(queue.update, progress))
+    run_job(queue, queue.claim())
+
+    job = queue.get(job_id)
+    assert job.status == "succeeded"
+    assert client.batches == [["T1", "T3"], ["T4"]]
+    assert (job.total, job.processed, job.failed_items) == (4, 3, 1)
+    assert job.errors[0].startswith("row 3:")
+    assert [p["processed"] for p in progress if "status" not in p] == [2, 3]
+    assert not path.exists()
+
+
+def test_item_jobs_stream_arrays_and_lines_and_validate_rows(monkeypatch):
+    client = _fake_backend(monkeypatch)
+    queue = get_ingest_job_queue()
+    entries = [
+        {"id": "F1", "type": "faq", "title": "q", "body": "a" * 5000},
+        {"id": "F2", "type": "note", "title": "q", "body": "a"},
+        {"id": "F3", "type": "faq", "title": "q", "body": "a", "priority": 5},
+        {"id": "F4", "type": "faq", "title": "q"},
+    ]
+    array_job = queue.new_job_id()
+    queue.spool_path(array_job, "items").write_text(
+        " [\n" + ",\n".join(json.dumps(e) for e in entries) + "\n]\n", encoding="utf-8"
+    )
+    queue.submit(array_job, "items")
+    # Small chunks, so elements straddle reads.
+    monkeypatch.setattr(jobs, "_iter_json_array", _chunked(jobs._iter_json_array, 64))
+    run_job(queue, queue.claim())
+
+    job = queue.get(array_job)
+    assert job.status == "succeeded"
+    assert [i for batch in client.batches for i in batch] == ["F1", "F3"]
+    assert (job.total, job.failed_items) == (4, 2)
+    assert [e.split(":")[0] for e in job.errors] == ["item 2", "item 4"]
+
+    lines_job = queue.new_job_id()
+    queue.spool_path(lines_job, "items").write_text(
+        json.dumps(entries[2]) + "\n{not json\n\n" + json.dumps(entries[1]) + "\n",
+        encoding="utf-8",
+    )
+    queue.submit(lines_job, "items")
+    run_job(queue, queue.claim())
+
+    job = queue.get(lines_job)
+    assert (job.status, job.total, job.processed, job.failed_items) == ("succeeded", 3, 1, 2)
+    assert [e.split(":")[0] for e in job.errors] == ["line 2", "line 3"]
+
+
+def test_malformed_item_array_fails_the_job(monkeypatch):
+    _fake_backend(monkeypatch)
+    queue = get_ingest_job_queue()
+    job_id = queue.new_job_id()
+    queue.spool_path(job_id, "items").write_text(
+        '[{"id": "F1", "type": "faq", "title": "q", "body": "a"} {"id": "F2"}]', encoding="utf-8"
+    )
+    queue.submit(job_id, "items")
+
+    run_job(queue, queue.claim())
+
+    job = queue.get(job_id)
+    assert job.status == "failed" and "Expected ','" in job.error
+
+
+def test_failed_job_keeps_payload_and_error(monkeypatch):
+    client = _fake_backend(monkeypatch)
+    client.fail_on_batch = 0
+    queue = get_ingest_job_queue()
+    job_id = queue.new_job_id()
+    queue.spool_path(job_id, "items").write_text(
+        '{"id": "F1", "type": "faq", "title": "q", "body": "a"}\n', encoding="utf-8"
+    )
+    queue.submit(job_id, "items", total=1)
+
+    run_job(queue, queue.claim())
+
+    job = queue.get(job_id)
+    assert job.status == "failed"
+    assert "endee unavailable" in job.error
+    assert queue.spool_path(job_id, "items").exists()
+    assert queue.claim() is None
+
+
+def _recording(update, calls):
+    def wrapper(job_id, **values):
+        calls.append(dict(values))
+        update(job_id, **values)
+
+    return wrapper
+
+
+def _chunked(iter_json_array, chunk_size):
+    def wrapper(f):
+        return iter_json_array(f, chunk_size=chunk_size)
+
+    return wrapper
@@ -0,0 +1,118 @@
+import sqlite3
+
+from backend.app.models.domain import SearchResultItem, SupportItem, SupportItemType
+from backend.app.models.schemas import SearchRequest
+from backend.app.services import search as search_service
+from backend.app.services.lexical import BM25Index, fuse_results, get_lexical_index, tokenize
+
+
+def _items():
+    return [
+        SupportItem(
+            id="T1", type=SupportItemType.TICKET, title="VPN drops with ERR_CONN_RESET",
+            body="Clients on vpn-gw-3 see ERR_CONN_RESET after 30 minutes.", product="vpn",
+        ),
+        SupportItem(
+            id="T2", type=SupportItemType.TICKET, title="Slow VPN login",
+            body="Login through the VPN portal takes a minute.", product="vpn",
+        ),
+        SupportItem(
+            id="F1", type=SupportItemType.FAQ, title="Reset your password",
+            body="Use the self-service portal to reset a password.", product="auth",
+        ),
+    ]
+
+
+def _result(item_id: str, score: float) -> SearchResultItem:
+    return SearchResultItem(
+        id=item_id, type=SupportItemType.TICKET, title=item_id, snippet="", product=None,
+        severity=None, score=score,
+    )
+
+
+def test_tokenize_keeps_identifiers_whole_and_split():
+    tokens = tokenize("ERR_CONN_RESET on vpn-gw-3")
+    assert "err_conn_reset" in tokens and "conn" in tokens
+    assert "vpn-gw-3" in tokens and "gw" in tokens
+    assert "on" not in tokens
+
+
+def test_bm25_ranks_updates_and_shares_writes(tmp_path):
+    index = BM25Index(tmp_path / "lexical.sqlite")
+    other = BM25Index(tmp_path / "lexical.sqlite")
+    index.upsert(_items())
+
+    hits = index.search("ERR_CONN_RESET vpn-gw-3", top_k=5)
+    assert hits[0][0] == "T1"
+    assert [item_id for item_id, _ in index.search("vpn", 5, [{"product": {"$eq": "auth"}}])] == []
+    assert [item_id for item_id, _ in index.search("vpn", 5, [{"product": {"$eq": "vpn"}}])] == [
+        "T2", "T1"
+    ]
+
+    # Writes from another process (here: connection) add to the same index.
+    other.remove(["T1"])
+    other.upsert(
+        [SupportItem(id="F1", type=SupportItemType.FAQ, title="ERR_CONN_RESET", body="b")]
+    )
+    assert len(index) == 2 and "T1" not in index
+    assert [item_id for item_id, _ in index.search("err_conn_reset", 5)] == ["F1"]
+    assert index.result_items(["F1"])["F1"].title == "ERR_CONN_RESET"
+
+
+def test_search_scores_the_highest_impact_postings_of_each_term(tmp_path):
+    index = BM25Index(tmp_path / "lexical.sqlite", postings_per_term=1)
+    full = BM25Index(tmp_path / "lexical.sqlite", postings_per_term=0)
+    index.upsert(_items())
+
+    # "vpn" has two postings; only the one with the higher impact is scored, with the
+    # document frequency of both.
+    assert index.search("vpn", 5) == full.search("vpn", 5)[:1]
+    assert [item_id for item_id, _ in full.search("vpn", 5)] == ["T2", "T1"]
+
+    index.remove(["T2"])
+    assert [item_id for item_id, _ in index.search("vpn", 5)] == ["T1"]
+    assert index.search("vpn", 5) == full.search("vpn", 5)
+
+
+def test_index_written_before_impacts_is_migrated(tmp_path):
+    path = tmp_path / "lexical.sqlite"
+    BM25Index(path).upsert(_items())
+    expected = BM25Index(path).search("vpn portal", 5)
+    with sqlite3.connect(str(path)) as conn:
+        for name in ("lexical_postings_added", "lexical_postings_removed"):
+            conn.execute(f"DROP TRIGGER {name}")
+        conn.execute("DROP TABLE lexical_terms")
+        conn.execute("DROP INDEX lexical_postings_impact")
+        conn.execute("ALTER TABLE lexical_postings DROP COLUMN impact")
+
+    assert BM25Index(path).search("vpn portal", 5) == expected
+
+
+def test_rrf_fusion_brings_in_lexical_only_hits(tmp_path):
+    index = BM25Index(tmp_path / "lexical.sqlite")
+    index.upsert(_items())
+    vector_results = [_result("T2", 0.82), _result("F1", 0.80)]
+
+    fused = fuse_results(vector_results, index.search("ERR_CONN_RESET", 5), index)
+
+    assert {r.id for r in fused} == {"T1", "T2", "F1"}
+    t1 = next(r for r in fused if r.id == "T1")
+    assert t1.title == "VPN drops with ERR_CONN_RESET"
+    assert all(0.0 < r.score <= 1.0 for r in fused)
+
+
+def test_search_fuses_vector_and_bm25_results(monkeypatch):
+    get_lexical_index().upsert(_items())
+
+    class VectorOnlyClient:
+        def query(self, vector, top_k, filters=None, ef=128):
+            return [{"id": "T2", "similarity": 0.9, "meta": {"type": "ticket", "title": "Slow"}}]
+
+    monkeypatch.setattr(search_service, "embed_text", lambda text, model_name=None: [0.5, 0.5])
+    monkeypatch.setattr(search_service, "get_endee_client", lambda version=None: VectorOnlyClient())
+
+    request = SearchRequest(query="vpn ERR_CONN_RESET")
+    results = search_service.search_support_knowledge(request)
+
+    # T2 is ranked by both retrievers; T1 is only found by BM25.
+    assert [r.id for r in results][:2] == ["T2", "T1"]
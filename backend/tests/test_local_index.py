@@ -0,0 +1,108 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from backend.app.models.domain import SupportItem, SupportItemType
+from backend.app.services.local_index import LocalVectorIndex, matches_filters
+
+
+def _items():
+    return [
+        SupportItem(
+            id="T1", type=SupportItemType.TICKET, title="504s", body="b", product="billing-api",
+            severity="P1", priority=10,
+        ),
+        SupportItem(
+            id="T2", type=SupportItemType.TICKET, title="Login", body="b", product="auth",
+            severity="P2", priority=500,
+        ),
+        SupportItem(id="F1", type=SupportItemType.FAQ, title="Reset", body="b", product="auth"),
+    ]
+
+
+VECTORS = np.array([[1.0, 0.0, 0.0], [0.7, 0.7, 0.0], [0.0, 0.0, 1.0]], dtype=np.float32)
+
+
+def test_filter_grammar():
+    values = {"type": "ticket", "product": "auth", "priority": 42}
+    assert matches_filters(values, [{"type": {"$eq": "ticket"}}, {"priority": {"$range": [0, 42]}}])
+    assert matches_filters(values, [{"type": {"$in": ["faq", "ticket"]}}])
+    assert not matches_filters(values, [{"product": {"$eq": "billing-api"}}])
+    assert not matches_filters({"type": "faq"}, [{"priority": {"$range": [0, 999]}}])
+    with pytest.raises(ValueError):
+        matches_filters(values, [{"priority": {"$gt": 1}}])
+
+
+@pytest.mark.parametrize("precision", ["int8", "float32"])
+def test_query_ranks_by_cosine_and_applies_filters(tmp_path, precision):
+    index = LocalVectorIndex(tmp_path, "support_knowledge", precision)
+    index.upsert_support_items(_items(), VECTORS)
+
+    hits = index.query([1.0, 0.1, 0.0], top_k=3)
+    assert [h["id"] for h in hits] == ["T1", "T2", "F1"]
+    assert hits[0]["similarity"] == pytest.approx(0.995, abs=0.01)
+    assert hits[0]["meta"]["title"] == "504s"
+
+    filters = [{"type": {"$in": ["ticket"]}}, {"priority": {"$range": [100, 999]}}]
+    hits = index.query([1.0, 0.1, 0.0], top_k=3, filters=filters)
+    assert [h["id"] for h in hits] == ["T2"]
+
+
+def test_persists_and_handles_updates_and_deletes(tmp_path):
+    index = LocalVectorIndex(tmp_path, "support_knowledge")
+    index.upsert_support_items(_items(), VECTORS)
+
+    moved = SupportItem(id="F1", type=SupportItemType.FAQ, title="Reset", body="b", product="auth")
+    index.upsert_support_items([moved], np.array([[1.0, 0.0, 0.0]], dtype=np.float32))
+    renamed = SupportItem(id="T2", type=SupportItemType.TICKET, title="Login v2", body="b")
+    index.update_support_items_metadata([renamed])
+    assert index.delete_support_items(["T1", "missing"]) == 1
+    index.close()
+
+    reopened = LocalVectorIndex(tmp_path, "support_knowledge")
+    assert reopened.describe_index()["count"] == 2
+    hits = reopened.query([1.0, 0.0, 0.0], top_k=5)
+    assert [h["id"] for h in hits] == ["F1", "T2"]
+    assert hits[1]["meta"]["title"] == "Login v2"
+
+
+def _upsert_in_batches(directory, writer, barrier):
+    index = LocalVectorIndex(directory, "support_knowledge", "float32")
+    index.GROWTH_ROWS = 8
+    barrier.wait()
+    for start in range(0, 100, 10):
+        items = [
+            SupportItem(id=f"{writer}-{i}", type=SupportItemType.TICKET, title=str(i), body="b")
+            for i in range(start, start + 10)
+        ]
+        # One-hot rows: a row holding another item's vector is found by the wrong id.
+        vectors = np.eye(200)[(writer - 1) * 100 + start : (writer - 1) * 100 + start + 10]
+        index.upsert_support_items(items, vectors)
+    index.delete_support_items([f"{writer}-0"])
+
+
+def test_processes_sharing_an_index_see_each_others_rows(tmp_path):
+    reader = LocalVectorIndex(tmp_path, "support_knowledge", "float32")
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(2)
+    writers = [
+        context.Process(target=_upsert_in_batches, args=(tmp_path, writer, barrier))
+        for writer in (1, 2)
+    ]
+    for process in writers:
+        process.start()
+    for process in writers:
+        process.join(30)
+        assert process.exitcode == 0
+
+    assert reader.describe_index()["count"] == 198
+    ids = [f"{writer}-{i}" for writer in (1, 2) for i in range(100)]
+    stored = {item.id: item for item in reader.get_support_items(ids)}
+    assert set(stored) == set(ids) - {"1-0", "2-0"}
+    assert stored["2-57"].title == "57"
+    # Every row holds the vector written with its own id.
+    for writer in (1, 2):
+        for i in range(1, 100):
+            hit = reader.query(np.eye(200)[(writer - 1) * 100 + i], top_k=1)[0]
+            assert hit["id"] == f"{writer}-{i}" and hit["similarity"] == pytest.approx(1.0)
@@ -0,0 +1,100 @@
+import pytest
+
+from backend.app.config import get_settings
+from backend.app.models.domain import SupportItem, SupportItemType
+from backend.app.models.schemas import SearchParams, SearchRequest
+from backend.app.services import planner
+from backend.app.services import search as search_service
+from backend.app.services.metrics import get_metrics
+from backend.app.services.planner import FilterStatistics, plan_query
+
+
+def _items():
+    items = []
+    for i in range(100):
+        items.append(
+            SupportItem(
+                id=f"T{i}", type=SupportItemType.TICKET, title="t", body="b",
+                product="billing-api" if i < 2 else "auth", severity="P0" if i % 2 else "P2",
+                priority=i,
+            )
+        )
+    return items
+
+
+@pytest.fixture(autouse=True)
+def _no_chunking(monkeypatch):
+    monkeypatch.setenv("CHUNK_SIZE_TOKENS", "0")
+    get_settings.cache_clear()
+
+
+@pytest.fixture
+def stats(monkeypatch, tmp_path):
+    stats = FilterStatistics(tmp_path / "filter_stats.sqlite")
+    stats.update(_items())
+    monkeypatch.setattr(planner, "get_filter_statistics", lambda: stats)
+    return stats
+
+
+def test_selectivity_tracks_updates_and_shares_writes(stats, tmp_path):
+    assert stats.selectivity(None) == 1.0
+    assert stats.selectivity([{"product": {"$eq": "billing-api"}}]) == pytest.approx(0.02)
+    assert stats.selectivity([{"priority": {"$range": [0, 24]}}]) == pytest.approx(0.25)
+    both = [{"product": {"$in": ["auth"]}}, {"severity": {"$eq": "P0"}}]
+    assert stats.selectivity(both) == pytest.approx(0.98 * 0.5)
+
+    # A second process sharing the database sees writes without reloading.
+    other = FilterStatistics(tmp_path / "filter_stats.sqlite")
+    other.remove(["T0"])
+    other.update([SupportItem(id="T1", type=SupportItemType.FAQ, title="t", body="b")])
+    assert stats.total == 99
+    assert stats.selectivity([{"product": {"$eq": "billing-api"}}]) == 0.0
+    assert stats.selectivity([{"severity": {"$eq": "P0"}}]) == pytest.approx(49 / 99)
+    assert sorted(stats.matching_ids([{"type": {"$eq": "faq"}}])) == ["T1"]
+    other.close()
+
+
+def test_plan_widens_ef_for_selective_filters(stats):
+    broad = plan_query(10, None)
+    assert (broad.ef, broad.fetch_k) == (64, 15)
+
+    selective = plan_query(10, [{"product": {"$eq": "billing-api"}}, {"severity": {"$eq": "P0"}}])
+    assert selective.ef == 512
+    assert plan_query(10, [{"priority": {"$range": [0, 49]}}]).ef == 64
+    assert plan_query(10, [{"priority": {"$range": [0, 24]}}], target="recall").ef == 240
+    assert plan_query(10, None, ef=300, fetch_k=12).ef == 300
+
+
+def test_plan_over_fetches_when_items_are_chunked(stats, monkeypatch):
+    monkeypatch.setenv("CHUNK_SIZE_TOKENS", "200")
+    get_settings.cache_clear()
+
+    plan = plan_query(10, None)
+    assert (plan.ef, plan.fetch_k) == (90, 45)
+    assert plan_query(40, None).fetch_k == 150
+    assert plan_query(10, None, fetch_k=12).fetch_k == 12
+
+
+def test_plan_scales_ef_down_when_over_latency_target(stats):
+    for _ in range(20):
+        get_metrics().observe("stage.endee_query", 300.0)
+    plan = plan_query(10, [{"priority": {"$range": [0, 24]}}])
+    assert plan.ef == 64
+    get_metrics().reset()
+
+
+def test_fixed_plan_without_statistics_and_request_override(monkeypatch):
+    assert (plan_query(10, None).ef, plan_query(10, None).fetch_k) == (128, 15)
+
+    seen = {}
+
+    class RecordingClient:
+        def query(self, vector, top_k=10, filters=None, ef=128):
+            seen.update(top_k=top_k, ef=ef)
+            return []
+
+    monkeypatch.setattr(search_service, "embed_text", lambda text, model_name=None: [0.5, 0.5])
+    monkeypatch.setattr(search_service, "get_endee_client", lambda version=None: RecordingClient())
+    request = SearchRequest(query="q", top_k=5, search_params=SearchParams(ef=256, fetch_k=7))
+    search_service.search_support_knowledge(request)
+    assert seen == {"top_k": 7, "ef": 256}
@@ -0,0 +1,106 @@
+import json
+import zlib
+
+import numpy as np
+
+from backend.app.config import get_settings
+from backend.app.models.domain import SupportItem, SupportItemType
+from backend.app.services import embeddings, endee_client, ingestion, reindex
+from backend.app.services.index_alias import IndexAlias, IndexVersion, get_index_alias
+from backend.app.services.manifest import get_ingest_manifest
+
+
+def fake_encode(texts, model_name=None):
+    # Bags of words: queries find the items sharing their words.
+    vectors = np.zeros((len(texts), 32), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in text.lower().split():
+            vectors[row, zlib.crc32(word.encode()) % 32] += 1.0
+    return vectors
+
+
+def test_alias_prepares_new_version_before_switching(tmp_path):
+    path = tmp_path / "alias.json"
+    v1 = IndexVersion("support_knowledge", "model-a", "int8")
+    v2 = IndexVersion("support_knowledge_v2", "model-b", "int8")
+    events = []
+    reader = IndexAlias(
+        path,
+        v1,
+        refresh_seconds=0,
+        prepare=lambda version: events.append(("prepare", version.name, reader.active.name)),
+        on_switch=lambda old, new: events.append(("switch", old.name, new.name)),
+    )
+    writer = IndexAlias(path, v1)
+
+    writer.switch(v2)
+    assert reader.refresh() == v2
+    assert events == [
+        ("prepare", "support_knowledge_v2", "support_knowledge"),
+        ("switch", "support_knowledge", "support_knowledge_v2"),
+    ]
+
+    assert writer.rollback() == v1
+    assert reader.refresh() == v1 and writer.previous() == v2
+    assert json.loads(path.read_text())["active"]["name"] == "support_knowledge"
+
+
+def test_rebuild_backfills_validates_and_switches(monkeypatch, tmp_path):
+    monkeypatch.setenv("VECTOR_BACKEND", "local")
+    monkeypatch.setenv("LOCAL_INDEX_DIR", str(tmp_path / "indexes"))
+    monkeypatch.setenv("INGEST_MANIFEST_PATH", str(tmp_path / "manifest.sqlite"))
+    monkeypatch.setenv("EMBEDDING_STORE_DIR", "")
+    monkeypatch.setenv("EMBEDDING_MODEL_NAME", "bow")
+    monkeypatch.setenv("INDEX_ALIAS_REFRESH_SECONDS", "0")
+    get_settings.cache_clear()
+    get_index_alias.cache_clear()
+    monkeypatch.setattr(endee_client, "_endee_wrappers", {})
+    monkeypatch.setattr(ingestion, "embed_texts_array", fake_encode)
+    monkeypatch.setattr(reindex, "encode_texts_array", fake_encode)
+    monkeypatch.setattr(embeddings, "get_embedding_model", lambda model_name=None: None)
+
+    items = [
+        SupportItem(id="T1", type=SupportItemType.TICKET, title="VPN drops", body="tunnel resets"),
+        SupportItem(id="T2", type=SupportItemType.TICKET, title="Disk full", body="volume at 100%"),
+        SupportItem(id="F1", type=SupportItemType.FAQ, title="Rotate API key", body="settings"),
+    ]
+    queries = tmp_path / "queries.json"
+    queries.write_text(json.dumps([
+        {"query": "vpn drops", "expected_ids": {"tickets": ["T1"], "faqs": [], "runbooks": []}},
+        {"query": "rotate api key", "expected_ids": {"faqs": ["F1"]}},
+    ]))
+
+    ingestion.ingest_stream(items, manifest=get_ingest_manifest())
+
+    # Writes reaching the active index while the new one is being validated.
+    evaluate_recall = reindex.evaluate_recall
+
+    def evaluate_while_writing(version, queries, k):
+        if version.name == "support_knowledge_v2":
+            source = get_ingest_manifest()
+            ingestion.update_items({"T2": {"severity": "high"}}, manifest=source)
+            ingestion.delete_items(["F1"], manifest=source)
+        return evaluate_recall(version, queries, k)
+
+    monkeypatch.setattr(reindex, "evaluate_recall", evaluate_while_writing)
+    result = reindex.rebuild_index(queries_path=queries)
+    assert result.switched and result.version.name == "support_knowledge_v2"
+    assert result.stats.embedded == 3
+    assert reindex.mean_recall(result.recall) == 1.0
+    active = get_index_alias().active
+    assert active == IndexVersion("support_knowledge_v2", "bow", "int8")
+    client = endee_client.get_endee_client()
+    assert client.describe_index()["name"] == "support_knowledge_v2"
+    stored = {item.id: item for item in client.get_support_items(["T1", "T2", "F1"])}
+    assert set(stored) == {"T1", "T2"} and stored["T2"].severity == "high"
+    assert get_ingest_manifest().bodies(["T1", "T2"]) == {
+        "T1": "tunnel resets",
+        "T2": "volume at 100%",
+    }
+    monkeypatch.setattr(reindex, "evaluate_recall", evaluate_recall)
+
+    # A rebuild that lost the data is built but never served.
+    rejected = reindex.rebuild_index(model_name="other", items=[], queries_path=queries)
+    assert not rejected.switched and "recall" in rejected.reason
+    assert rejected.version.name == "support_knowledge_v3"
+    assert get_index_alias().active == active
@@ -0,0 +1,57 @@
+import asyncio
+import time
+
+from backend.app.config import Settings
+from backend.app.models.domain import SearchResultItem, SupportItemType
+from backend.app.services import rerank as rerank_service
+from backend.app.services.metrics import get_metrics
+
+
+def _results():
+    return [
+        SearchResultItem(
+            id=f"T{i}", type=SupportItemType.TICKET, title=title, snippet="", product=None,
+            severity=None, score=0.9 - i / 10,
+        )
+        for i, title in enumerate(["printer jam", "vpn drops", "vpn reset after 30 min"])
+    ]
+
+
+class KeywordCrossEncoder:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.pairs = []
+
+    def predict(self, pairs, batch_size=32):
+        time.sleep(self.delay)
+        self.pairs.extend(pairs)
+        return [float(sum(word in doc for word in query.split())) for query, doc in pairs]
+
+
+def _use(monkeypatch, encoder, **overrides):
+    settings = Settings(rerank_batch_size=2, **overrides)
+    monkeypatch.setattr(rerank_service, "get_settings", lambda: settings)
+    monkeypatch.setattr(rerank_service, "get_cross_encoder", lambda: encoder)
+
+
+def test_rerank_orders_by_cross_encoder_and_caches_pair_scores(monkeypatch):
+    encoder = KeywordCrossEncoder()
+    _use(monkeypatch, encoder)
+
+    reranked = rerank_service.rerank("vpn reset", _results())
+    assert [r.id for r in reranked] == ["T2", "T1", "T0"]
+    assert 0.0 < reranked[-1].score < reranked[0].score < 1.0
+    assert len(encoder.pairs) == 3
+
+    assert [r.id for r in rerank_service.rerank("VPN  reset", _results())] == ["T2", "T1", "T0"]
+    assert len(encoder.pairs) == 3
+
+
+def test_rerank_keeps_retrieval_order_when_over_budget(monkeypatch):
+    _use(monkeypatch, KeywordCrossEncoder(delay=0.05), rerank_budget_ms=20)
+    before = get_metrics().snapshot()["counters"].get("rerank.budget_exceeded", 0)
+
+    assert [r.id for r in rerank_service.rerank("vpn reset", _results())] == ["T0", "T1", "T2"]
+    reranked = asyncio.run(rerank_service.arerank("vpn drops", _results()))
+    assert [r.id for r in reranked] == ["T0", "T1", "T2"]
+    assert get_metrics().snapshot()["counters"]["rerank.budget_exceeded"] == before + 2
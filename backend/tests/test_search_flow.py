@@ -1,5 +1,7 @@
 from typing import List
 
+import pytest
+
 from backend.app.models.domain import SearchResultItem, SupportItemType
 from backend.app.models.schemas import SearchRequest
 from backend.app.services import search as search_service
@@ -15,7 +17,7 @@ class DummyClient:
 
 def test_search_support_knowledge_basic(monkeypatch):
     monkeypatch.setattr(
-        search_service, "embed_text", lambda text: [0.1, 0.2, 0.3]
+        search_service, "embed_text", lambda text, model_name=None: [0.1, 0.2, 0.3]
     )
 
     dummy_results = [
@@ -33,7 +35,7 @@ def test_search_support_knowledge_basic(monkeypatch):
     ]
 
     monkeypatch.setattr(
-        search_service, "get_endee_client", lambda: DummyClient(dummy_results)
+        search_service, "get_endee_client", lambda version=None: DummyClient(dummy_results)
     )
 
     request = SearchRequest(query="504 errors on payments", top_k=5, filters=None)
@@ -46,3 +48,174 @@ def test_search_support_knowledge_basic(monkeypatch):
     assert item.product == "billing-api"
     assert item.severity == "P1"
 
+
+
+def test_query_is_embedded_for_the_index_it_is_sent_to(monkeypatch):
+    from backend.app.services.index_alias import IndexVersion
+
+    # The alias switches between the two reads a request used to make.
+    versions = iter(
+        [
+            IndexVersion("support_knowledge", "model-a", "int8"),
+            IndexVersion("support_knowledge_v2", "model-b", "int8"),
+        ]
+    )
+    monkeypatch.setattr(search_service, "get_active_index", lambda: next(versions))
+    used = []
+    monkeypatch.setattr(
+        search_service,
+        "embed_text",
+        lambda text, model_name=None: used.append(model_name) or [0.5, 0.5],
+    )
+    monkeypatch.setattr(
+        search_service,
+        "get_endee_client",
+        lambda version=None: used.append(version.name) or DummyClient([]),
+    )
+
+    search_service.search_support_knowledge(SearchRequest(query="vpn", top_k=3))
+
+    assert used == ["model-a", "support_knowledge"]
+
+
+def test_search_results_cached_until_upsert(monkeypatch):
+    from backend.app.models.domain import SupportItem
+    from backend.app.services.endee_client import EndeeClientWrapper
+
+    calls = []
+
+    class CountingClient(DummyClient):
+        def query(self, vector, top_k=10, filters=None, ef=128):
+            calls.append(top_k)
+            return super().query(vector, top_k, filters, ef)
+
+    monkeypatch.setattr(search_service, "embed_text", lambda text, model_name=None: [0.5, 0.5])
+    monkeypatch.setattr(
+        search_service,
+        "get_endee_client",
+        lambda version=None: CountingClient([{"id": "FAQ-1", "similarity": 0.8, "meta": {"type": "faq"}}]),
+    )
+
+    request = SearchRequest(query="password reset", top_k=3)
+    first = search_service.search_support_knowledge(request)
+    second = search_service.search_support_knowledge(request)
+    assert [r.id for r in first] == [r.id for r in second] == ["FAQ-1"]
+    assert len(calls) == 1
+
+    class NullIndex:
+        def upsert(self, items):
+            pass
+
+    wrapper = EndeeClientWrapper.__new__(EndeeClientWrapper)
+    wrapper.index_name = "support_knowledge"
+    wrapper._index = NullIndex()
+    wrapper.upsert_support_items(
+        [SupportItem(id="FAQ-2", type=SupportItemType.FAQ, title="t", body="b")], [[0.1, 0.2]]
+    )
+
+    search_service.search_support_knowledge(request)
+    assert len(calls) == 2
+
+
+def test_per_type_fanout_queries_each_type(monkeypatch):
+    import asyncio
+
+    from backend.app.config import Settings
+
+    seen = []
+
+    class TypedClient:
+        def query(self, vector, top_k=10, filters=None, ef=128):
+            support_type = filters[0]["type"]["$eq"]
+            seen.append((support_type, top_k))
+            return [
+                {
+                    "id": f"{support_type}-1",
+                    "similarity": {"ticket": 0.9, "faq": 0.7, "runbook": 0.8}[support_type],
+                    "meta": {"type": support_type},
+                }
+            ]
+
+    async def fake_aembed_text(text, model_name=None):
+        return [0.3, 0.4]
+
+    monkeypatch.setattr(
+        search_service, "get_settings", lambda: Settings(retrieval_mode="per_type", endee_transport="sdk")
+    )
+    monkeypatch.setattr(search_service, "aembed_text", fake_aembed_text)
+    monkeypatch.setattr(search_service, "get_endee_client", lambda version=None: TypedClient())
+
+    request = SearchRequest(query="vpn disconnects", top_k=4)
+    results = asyncio.run(search_service.asearch_support_knowledge(request))
+
+    # Chunking is on by default, so each type fetches 4 items' worth of chunk hits.
+    assert sorted(seen) == [("faq", 12), ("runbook", 12), ("ticket", 12)]
+    assert [r.id for r in results] == ["ticket-1", "runbook-1", "faq-1"]
+
+
+def test_endee_outage_serves_last_known_results_then_fails_fast(monkeypatch):
+    from backend.app.services.cache import get_result_cache
+    from backend.app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+    from backend.app.services.endee_client import EndeeClientWrapper
+
+    breaker = CircuitBreaker("endee", failure_threshold=2, reset_timeout_seconds=60)
+    monkeypatch.setattr(
+        "backend.app.services.endee_client.get_endee_breaker", lambda: breaker
+    )
+
+    class FlakyIndex:
+        down = False
+        calls = 0
+
+        def query(self, **kwargs):
+            FlakyIndex.calls += 1
+            if FlakyIndex.down:
+                raise ConnectionError("connection refused")
+            return [{"id": "TCK-1", "similarity": 0.9, "meta": {"type": "ticket"}}]
+
+    wrapper = EndeeClientWrapper.__new__(EndeeClientWrapper)
+    wrapper.index_name = "support_knowledge"
+    wrapper._index = FlakyIndex()
+    monkeypatch.setattr(search_service, "embed_text", lambda text, model_name=None: [0.5, 0.5])
+    monkeypatch.setattr(search_service, "get_endee_client", lambda version=None: wrapper)
+
+    seen = SearchRequest(query="504 errors", top_k=3)
+    assert not search_service.search_support_knowledge(seen)[0].stale
+
+    FlakyIndex.down = True
+    get_result_cache().invalidate()
+    degraded = search_service.search_support_knowledge(seen)
+    assert [r.id for r in degraded] == ["TCK-1"] and degraded[0].stale
+
+    # A query never seen before has nothing to fall back to; this failure opens the breaker.
+    unseen = SearchRequest(query="vpn drops", top_k=3)
+    monkeypatch.setattr(search_service, "embed_text", lambda text, model_name=None: [0.1, 0.9])
+    with pytest.raises(ConnectionError):
+        search_service.search_support_knowledge(unseen)
+    assert breaker.state == "open"
+
+    calls_before = FlakyIndex.calls
+    with pytest.raises(CircuitOpenError):
+        search_service.search_support_knowledge(unseen)
+    assert FlakyIndex.calls == calls_before
+
+
+@pytest.mark.parametrize("mode, expected_score", [("max", 0.9), ("sum", 1.6)])
+def test_chunk_hits_collapse_into_parent(monkeypatch, mode, expected_score):
+    from backend.app.config import Settings
+
+    chunk_meta = {"type": "runbook", "title": "VPN runbook", "parent_id": "RB-1"}
+    raw = [
+        {"id": "RB-1#2", "similarity": 0.9, "meta": {**chunk_meta, "snippet": "Restart gw-3"}},
+        {"id": "FAQ-1", "similarity": 0.8, "meta": {"type": "faq", "title": "VPN FAQ"}},
+        {"id": "RB-1#0", "similarity": 0.7, "meta": {**chunk_meta, "snippet": "Overview"}},
+    ]
+    monkeypatch.setattr(search_service, "get_settings", lambda: Settings(chunk_score_mode=mode))
+    monkeypatch.setattr(search_service, "embed_text", lambda text, model_name=None: [0.3, 0.7])
+    monkeypatch.setattr(search_service, "get_endee_client", lambda version=None: DummyClient(raw))
+
+    results = search_service.search_support_knowledge(SearchRequest(query="vpn gw-3"))
+
+    assert [r.id for r in results] == ["RB-1", "FAQ-1"]
+    assert results[0].snippet == "Restart gw-3"
+    assert results[0].score == pytest.approx(expected_score)
@@ -0,0 +1,74 @@
+import json
+from unittest.mock import MagicMock
+
+from fastapi.testclient import TestClient
+
+from backend.app.config import Settings
+from backend.app.main import app
+from backend.app.services import embeddings, startup
+
+
+def test_embedding_dimension_from_settings_and_manifest(monkeypatch, tmp_path):
+    def fail_load(model_name=None):
+        raise AssertionError("model should not be loaded")
+
+    monkeypatch.setattr(embeddings, "get_embedding_model", fail_load)
+
+    monkeypatch.setattr(embeddings, "get_settings", lambda: Settings(embedding_dimension=384))
+    assert embeddings.get_embedding_dimension() == 384
+
+    manifest = tmp_path / "model_manifest.json"
+    manifest.write_text(json.dumps({"my-model": {"dimension": 128}}))
+    settings = Settings(embedding_model_name="my-model", model_manifest_path=str(manifest))
+    monkeypatch.setattr(embeddings, "get_settings", lambda: settings)
+    assert embeddings.get_embedding_dimension("my-model") == 128
+
+
+def test_warm_up_retries_endee_then_marks_ready(monkeypatch):
+    state = startup.StartupState()
+    monkeypatch.setattr(startup, "_state", state)
+    monkeypatch.setattr(
+        startup, "get_settings", lambda: Settings(warm_model_on_startup=True, rerank_enabled=True)
+    )
+    warmed = MagicMock()
+    monkeypatch.setattr(startup, "warm_embedding_model", warmed)
+    warmed_reranker = MagicMock()
+    monkeypatch.setattr(startup, "warm_cross_encoder", warmed_reranker)
+
+    attempts = {"n": 0}
+
+    def flaky_client():
+        attempts["n"] += 1
+        if attempts["n"] < 3:
+            raise ConnectionError("connection refused")
+        return MagicMock()
+
+    monkeypatch.setattr(startup, "get_endee_client", flaky_client)
+
+    client = TestClient(app)
+    assert client.get("/health/ready").status_code == 503
+
+    startup.warm_up(initial_backoff_seconds=0)
+
+    assert attempts["n"] == 3
+    warmed.assert_called_once()
+    warmed_reranker.assert_called_once()
+    assert state.ready
+    assert set(state.snapshot()["steps_ms"]) == {"endee_index", "embedding_model", "rerank_model"}
+    assert client.get("/health/ready").status_code == 200
+
+
+def test_warm_up_can_be_stopped_while_endee_is_down(monkeypatch):
+    state = startup.StartupState()
+    monkeypatch.setattr(startup, "_state", state)
+
+    def down():
+        raise ConnectionError("connection refused")
+
+    monkeypatch.setattr(startup, "get_endee_client", down)
+    startup.stop_warm_up()
+
+    startup.warm_up(initial_backoff_seconds=60)
+
+    assert not state.ready
+    assert "connection refused" in state.snapshot()["last_error"]
@@ -0,0 +1,132 @@
+"""
+Compare latency and recall of vector backends on a synthetic corpus.
+An exact float32 LocalVectorIndex is the ground truth; the int8 local index and,
+with --endee, a scratch index on the Endee server are measured against it.
+Usage: python -m scripts.benchmark_backends [--items 20000] [--dim 384] [--queries 200] [--k 10] [--endee]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from backend.app.models.domain import SupportItem, SupportItemType
+from backend.app.services.local_index import LocalVectorIndex
+
+TYPES = list(SupportItemType)
+
+
+def make_corpus(n: int, dim: int, seed: int = 0) -> tuple:
+    rng = np.random.default_rng(seed)
+    # Clustered vectors resemble embeddings better than isotropic noise.
+    centers = rng.standard_normal((max(1, n // 50), dim), dtype=np.float32)
+    vectors = centers[rng.integers(0, len(centers), n)] + 0.3 * rng.standard_normal(
+        (n, dim), dtype=np.float32
+    )
+    items = [
+        SupportItem(
+            id=f"BENCH-{i}",
+            type=TYPES[i % len(TYPES)],
+            title=f"item {i}",
+            body="",
+            product=f"product-{i % 7}",
+            priority=i % 1000,
+        )
+        for i in range(n)
+    ]
+    return items, vectors.astype(np.float32)
+
+
+def percentile(values: list, p: float) -> float:
+    return float(np.percentile(values, p)) if values else 0.0
+
+
+def measure(search, queries: np.ndarray, filters, k: int) -> tuple:
+    results, latencies = [], []
+    for q in queries:
+        start = time.perf_counter()
+        hits = search(q, k, filters)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([h["id"] for h in hits])
+    return results, latencies
+
+
+def recall(results: list, truth: list, k: int) -> float:
+    scores = [len(set(r[:k]) & set(t[:k])) / max(1, len(t[:k])) for r, t in zip(results, truth)]
+    return float(np.mean(scores))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--endee", action="store_true", help="Also benchmark the Endee server.")
+    args = parser.parse_args()
+
+    items, vectors = make_corpus(args.items, args.dim)
+    queries = make_corpus(args.queries, args.dim, seed=1)[1]
+    filter_sets = {
+        "unfiltered": None,
+        "type=ticket": [{"type": {"$eq": "ticket"}}],
+        "product+range": [{"product": {"$eq": "product-3"}}, {"priority": {"$range": [0, 499]}}],
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = {}
+        for precision in ("float32", "int8"):
+            index = LocalVectorIndex(Path(tmp), f"bench_{precision}", precision)
+            for start in range(0, len(items), 1000):
+                batch = slice(start, start + 1000)
+                index.upsert_support_items(items[batch], vectors[batch])
+            backends[f"local-{precision}"] = (
+                lambda q, k, f, index=index: index.query(q, top_k=k, filters=f)
+            )
+
+        if args.endee:
+            from endee import Endee, Precision
+
+            client = Endee()
+            scratch = f"benchmark_{args.dim}"
+            if scratch in [idx["name"] for idx in client.list_indexes()]:
+                client.delete_index(scratch)
+            client.create_index(
+                name=scratch, dimension=args.dim, space_type="cosine", precision=Precision.INT8D
+            )
+            endee_index = client.get_index(scratch)
+            for start in range(0, len(items), 1000):
+                batch = slice(start, start + 1000)
+                endee_index.upsert(
+                    [
+                        {
+                            "id": item.id,
+                            "vector": vec.tolist(),
+                            "meta": item.meta(),
+                            "filter": item.filter(),
+                        }
+                        for item, vec in zip(items[batch], vectors[batch])
+                    ]
+                )
+            backends["endee"] = lambda q, k, f: endee_index.query(
+                vector=q.tolist(), top_k=k, filter=f, ef=128
+            )
+
+        for label, filters in filter_sets.items():
+            truth, _ = measure(backends["local-float32"], queries, filters, args.k)
+            print(f"[{label}] recall@{args.k} against exact float32 search")
+            for backend, search in backends.items():
+                results, latencies = measure(search, queries, filters, args.k)
+                print(
+                    f"  {backend:14s} recall={recall(results, truth, args.k):.3f} "
+                    f"p50={percentile(latencies, 50):.2f}ms p95={percentile(latencies, 95):.2f}ms"
+                )
+
+        if args.endee:
+            client.delete_index(scratch)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Compare embedding throughput of the PyTorch and ONNX Runtime (float32 and int8)
+backends on the sample data, and the cosine similarity of ONNX vectors to the
+PyTorch ones. ONNX exports are written to EMBEDDING_ONNX_DIR on first use.
+Usage: python -m scripts.benchmark_encoders [--model NAME] [--threads 4] [--repeat 10]
+       [--batch-size 256] [--backends torch,onnx,onnx-int8]
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+from sentence_transformers import SentenceTransformer
+
+from backend.app.config import get_settings
+from backend.app.services.ingestion import iter_sample_items
+
+
+def load_backend(label: str, model_name: str, threads: int, onnx_dir: Path):
+    if label == "torch":
+        return SentenceTransformer(model_name, device="cpu")
+    from backend.app.services.onnx_encoder import OnnxEncoder, export_onnx, is_exported
+
+    quantized = label == "onnx-int8"
+    directory = onnx_dir / model_name.replace("/", "__")
+    if not is_exported(directory, quantized):
+        export_onnx(model_name, directory, quantize=quantized)
+    return OnnxEncoder(directory, quantized=quantized, threads=threads)
+
+
+def measure(model, texts: list, batch_size: int) -> tuple:
+    # An untimed batch first, so session and thread pool start-up are not counted.
+    model.encode(texts[:batch_size])
+    start = time.perf_counter()
+    vectors = np.concatenate(
+        [model.encode(texts[i : i + batch_size]) for i in range(0, len(texts), batch_size)]
+    )
+    return vectors, time.perf_counter() - start
+
+
+def main() -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default=settings.embedding_model_name)
+    parser.add_argument(
+        "--threads", type=int, default=settings.embedding_threads or torch.get_num_threads()
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=10, help="Encode the sample data this many times."
+    )
+    parser.add_argument("--batch-size", type=int, default=settings.ingest_batch_size)
+    parser.add_argument("--backends", default="torch,onnx,onnx-int8")
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    texts = [item.to_text() for item in iter_sample_items()] * args.repeat
+    print(f"{len(texts)} texts, model {args.model}, {args.threads} intra-op threads")
+
+    reference = None
+    for label in args.backends.split(","):
+        model = load_backend(label, args.model, args.threads, Path(settings.embedding_onnx_dir))
+        vectors, elapsed = measure(model, texts, args.batch_size)
+        line = f"  {label:<10} {len(texts) / elapsed:8.1f} texts/s  ({elapsed:.2f}s)"
+        if label == "torch":
+            reference = vectors
+        elif reference is not None:
+            cosine = np.sum(vectors * reference, axis=1) / (
+                np.linalg.norm(vectors, axis=1) * np.linalg.norm(reference, axis=1)
+            )
+            line += f"  cosine vs torch: min {cosine.min():.4f} mean {cosine.mean():.4f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
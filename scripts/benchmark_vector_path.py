@@ -0,0 +1,73 @@
+"""
+Compare memory and time of the legacy list-of-float64 embedding path with the
+float32 ndarray path used by ingestion. No model or Endee server is needed:
+random float32 matrices stand in for SentenceTransformer.encode output.
+Usage: python -m scripts.benchmark_vector_path [--items 20000] [--dim 384] [--batch-size 256]
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+
+def legacy_path(encoded: np.ndarray) -> list:
+    # Old embed_texts: upcast each row to float64 and box every element.
+    return [v.astype(float).tolist() for v in encoded]
+
+
+def ndarray_path(encoded: np.ndarray) -> np.ndarray:
+    # New embed_texts_array: keep the contiguous float32 matrix.
+    return np.ascontiguousarray(encoded, dtype=np.float32)
+
+
+def run(path, batch_sizes, dim) -> list:
+    rng = np.random.default_rng(0)
+    # Every batch is held until the end, as in-flight batches are in the pipeline.
+    return [path(rng.standard_normal((n, dim), dtype=np.float32)) for n in batch_sizes]
+
+
+def measure(path, batch_sizes, dim) -> tuple:
+    start = time.perf_counter()
+    run(path, batch_sizes, dim)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    held = run(path, batch_sizes, dim)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del held
+    return elapsed, current, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    batch_sizes = [
+        min(args.batch_size, args.items - start) for start in range(0, args.items, args.batch_size)
+    ]
+    mib = 1024 * 1024
+    print(f"{args.items} vectors x {args.dim} dims, batches of {args.batch_size}")
+    results = {}
+    for label, path in [("legacy float64 lists", legacy_path), ("float32 ndarray", ndarray_path)]:
+        elapsed, held, peak = measure(path, batch_sizes, args.dim)
+        results[label] = held
+        print(
+            f"  {label:<22} {elapsed * 1000:8.1f} ms  held {held / mib:8.1f} MiB  "
+            f"peak {peak / mib:8.1f} MiB"
+        )
+    ratio = results["legacy float64 lists"] / max(results["float32 ndarray"], 1)
+    print(f"  held-embedding memory reduction: {ratio:.1f}x")
+    print(
+        "  Note: the Endee SDK still takes lists, so one batch at a time is converted "
+        "at upsert in both paths."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Build, prune or inspect the persistent embedding store for the configured model.
+build: embed every item in data/, chunked as ingestion chunks it, so later
+(re)ingestion reads vectors from disk.
+prune: drop stored vectors whose text no longer appears in data/ (after chunking).
+Usage: python -m scripts.embedding_store {build,prune,stats} [--batch-size 256]
+"""
+
+import argparse
+import json
+import sys
+from typing import Iterator, List
+
+from backend.app.services.embedding_store import get_embedding_store, text_hash
+from backend.app.services.embeddings import embed_texts_array
+from backend.app.services.ingestion import batched, chunk_items, iter_sample_items
+
+
+def iter_embedded_texts(batch_size: int) -> Iterator[List[str]]:
+    """
+    Batches of the texts ingestion embeds for data/: the texts of the
+    chunks long items are split into, and of short items as they are.
+    """
+
+    for batch in batched(iter_sample_items(), batch_size):
+        yield [chunk.to_text() for chunk in chunk_items(batch)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["build", "prune", "stats"])
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    store = get_embedding_store()
+    if store is None:
+        print("Embedding store is disabled; set EMBEDDING_STORE_DIR.")
+        sys.exit(1)
+
+    if args.command == "build":
+        total = 0
+        for texts in iter_embedded_texts(args.batch_size):
+            embed_texts_array(texts)
+            total += len(texts)
+        print(f"Embedded {total} texts; store now holds {store.count} vectors.")
+    elif args.command == "prune":
+        keep = [
+            text_hash(text) for texts in iter_embedded_texts(args.batch_size) for text in texts
+        ]
+        removed = store.prune(keep)
+        print(f"Removed {removed} vectors; store now holds {store.count} vectors.")
+
+    print(json.dumps(store.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
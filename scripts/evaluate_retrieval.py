@@ -1,12 +1,14 @@
 """
 Evaluate retrieval quality by calling /search and computing recall@k and MRR.
 Requires the app to be running (e.g. uvicorn) and sample data ingested.
-Usage: python -m scripts.evaluate_retrieval [--base-url http://localhost:8000]
+Usage: python -m scripts.evaluate_retrieval [--base-url http://localhost:8000] [--rerank compare]
+       [--batch-size 200]
 """
 
 import argparse
 import json
 import sys
+import time
 from pathlib import Path
 
 try:
@@ -41,10 +43,123 @@ def mrr(returned_ids: list, expected_ids: list) -> float:
     return 0.0
 
 
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def _payload(entry: dict, k: int, rerank) -> dict:
+    payload = {"query": entry["query"], "top_k": k, "generate_answer": False}
+    if rerank is not None:
+        payload["rerank"] = rerank
+    return payload
+
+
+def _search_one_by_one(client: "httpx.Client", base_url: str, queries: list, k: int, rerank):
+    responses, latencies = [], []
+    for entry in queries:
+        start = time.perf_counter()
+        resp = client.post(f"{base_url}/search", json=_payload(entry, k, rerank))
+        latencies.append((time.perf_counter() - start) * 1000)
+        resp.raise_for_status()
+        responses.append(resp.json())
+    return responses, latencies
+
+
+def _search_batched(
+    client: "httpx.Client", base_url: str, queries: list, k: int, rerank, batch_size: int
+):
+    responses, latencies = [], []
+    for offset in range(0, len(queries), batch_size):
+        chunk = queries[offset : offset + batch_size]
+        start = time.perf_counter()
+        resp = client.post(
+            f"{base_url}/search/batch",
+            json={"requests": [_payload(entry, k, rerank) for entry in chunk]},
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+        resp.raise_for_status()
+        for entry, item in zip(chunk, resp.json()["results"]):
+            if item["status"] != 200:
+                print(f"  query failed ({item['status']}): {entry['query']!r}: {item['error']}")
+            responses.append(item["response"] or {})
+    return responses, latencies
+
+
+def evaluate(
+    client: "httpx.Client",
+    base_url: str,
+    queries: list,
+    k: int,
+    rerank=None,
+    batch_size: int = 0,
+) -> dict:
+    """
+    Run every query once and return mean recall@k and MRR per type, plus
+    client-side latency in milliseconds (per request: one query, or one batch
+    when `batch_size` > 0 sends queries through /search/batch) and throughput.
+    """
+
+    base_url = base_url.rstrip("/")
+    start = time.perf_counter()
+    if batch_size > 0:
+        responses, latencies = _search_batched(client, base_url, queries, k, rerank, batch_size)
+    else:
+        responses, latencies = _search_one_by_one(client, base_url, queries, k, rerank)
+    elapsed = time.perf_counter() - start
+
+    recalls = {"tickets": [], "faqs": [], "runbooks": []}
+    mrrs = {"tickets": [], "faqs": [], "runbooks": []}
+    for entry, data in zip(queries, responses):
+        expected = entry["expected_ids"]
+        for typ in recalls:
+            returned = [x["id"] for x in data.get(typ, [])]
+            recalls[typ].append(recall_at_k(returned, expected.get(typ, []), k))
+            mrrs[typ].append(mrr(returned, expected.get(typ, [])))
+
+    n = len(queries)
+    return {
+        "recall": {typ: sum(values) / n for typ, values in recalls.items()},
+        "mrr": {typ: sum(values) / n for typ, values in mrrs.items()},
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "elapsed_s": elapsed,
+        "qps": n / elapsed if elapsed else 0.0,
+    }
+
+
+def report(label: str, result: dict, k: int, n: int) -> None:
+    print(f"[{label}]")
+    print("Recall@{} (mean over {} queries):".format(k, n))
+    print("  tickets:  {:.3f}".format(result["recall"]["tickets"]))
+    print("  faqs:     {:.3f}".format(result["recall"]["faqs"]))
+    print("  runbooks: {:.3f}".format(result["recall"]["runbooks"]))
+    print("MRR (mean):")
+    print("  tickets:  {:.3f}".format(result["mrr"]["tickets"]))
+    print("  faqs:     {:.3f}".format(result["mrr"]["faqs"]))
+    print("  runbooks: {:.3f}".format(result["mrr"]["runbooks"]))
+    print("Latency: p50={:.1f}ms p95={:.1f}ms".format(result["p50_ms"], result["p95_ms"]))
+    print("Total: {:.2f}s ({:.1f} queries/s)".format(result["elapsed_s"], result["qps"]))
+
+
 def main() -> None:
     parser = argparse.ArgumentParser()
     parser.add_argument("--base-url", default="http://localhost:8000")
     parser.add_argument("--k", type=int, default=5)
+    parser.add_argument(
+        "--rerank",
+        choices=["server", "on", "off", "compare"],
+        default="server",
+        help="Cross-encoder re-ranking: server default, forced on/off, or both side by side.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=0,
+        help="Send queries through /search/batch in batches of this size (0: one /search per query).",
+    )
     args = parser.parse_args()
 
     if not QUERIES_PATH.exists():
@@ -52,46 +167,19 @@ def main() -> None:
         sys.exit(1)
 
     queries = load_queries(QUERIES_PATH)
-    recalls_ticket, recalls_faq, recalls_runbook = [], [], []
-    mrrs_ticket, mrrs_faq, mrrs_runbook = [], [], []
-
-    with httpx.Client(timeout=30.0) as client:
-        for entry in queries:
-            q = entry["query"]
-            expected = entry["expected_ids"]
-            resp = client.post(
-                f"{args.base_url.rstrip('/')}/search",
-                json={"query": q, "top_k": args.k, "generate_answer": False},
-            )
-            resp.raise_for_status()
-            data = resp.json()
-
-            def ids(typ: str) -> list:
-                return [x["id"] for x in data.get(typ, [])]
-
-            rt = recall_at_k(ids("tickets"), expected.get("tickets", []), args.k)
-            rf = recall_at_k(ids("faqs"), expected.get("faqs", []), args.k)
-            rr = recall_at_k(ids("runbooks"), expected.get("runbooks", []), args.k)
-            recalls_ticket.append(rt)
-            recalls_faq.append(rf)
-            recalls_runbook.append(rr)
-
-            mt = mrr(ids("tickets"), expected.get("tickets", []))
-            mf = mrr(ids("faqs"), expected.get("faqs", []))
-            mr = mrr(ids("runbooks"), expected.get("runbooks", []))
-            mrrs_ticket.append(mt)
-            mrrs_faq.append(mf)
-            mrrs_runbook.append(mr)
-
-    n = len(queries)
-    print("Recall@{} (mean over {} queries):".format(args.k, n))
-    print("  tickets:  {:.3f}".format(sum(recalls_ticket) / n))
-    print("  faqs:     {:.3f}".format(sum(recalls_faq) / n))
-    print("  runbooks: {:.3f}".format(sum(recalls_runbook) / n))
-    print("MRR (mean):")
-    print("  tickets:  {:.3f}".format(sum(mrrs_ticket) / n))
-    print("  faqs:     {:.3f}".format(sum(mrrs_faq) / n))
-    print("  runbooks: {:.3f}".format(sum(mrrs_runbook) / n))
+    modes = {
+        "server": [("server default", None)],
+        "on": [("rerank", True)],
+        "off": [("no rerank", False)],
+        "compare": [("no rerank", False), ("rerank", True)],
+    }[args.rerank]
+
+    with httpx.Client(timeout=300.0) as client:
+        for label, rerank in modes:
+            # An untimed query first, so model loading is not counted as latency.
+            evaluate(client, args.base_url, queries[:1], args.k, rerank, args.batch_size)
+            result = evaluate(client, args.base_url, queries, args.k, rerank, args.batch_size)
+            report(label, result, args.k, len(queries))
 
 
 if __name__ == "__main__":
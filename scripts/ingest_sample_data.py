@@ -1,11 +1,31 @@
+"""
+Stream the sample data in data/ into Endee in batches.
+Unchanged items are skipped using the ingest manifest; --force re-embeds everything.
+Usage: python -m scripts.ingest_sample_data [--batch-size 256] [--checkpoint .ingest_checkpoint.json] [--force]
+"""
+
+import argparse
+from pathlib import Path
+
 from backend.app.services.ingestion import ingest_all
 
 
 def main() -> None:
-    ingest_all()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument(
+        "--checkpoint",
+        type=Path,
+        default=None,
+        help="Checkpoint file; an interrupted run resumes after the last upserted item.",
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="Re-embed every item even if unchanged."
+    )
+    args = parser.parse_args()
+
+    ingest_all(batch_size=args.batch_size, checkpoint_path=args.checkpoint, force=args.force)
 
 
 if __name__ == "__main__":
     main()
-
-
@@ -0,0 +1,83 @@
+"""
+Rebuild the support index into a new version (e.g. support_knowledge_v2) from the
+contents of the current one while it keeps serving, check recall@k on
+data/evaluation_queries.json, replay the writes it received meanwhile and switch the
+index alias to it. --rollback points the alias back at the previous version.
+Usage: python -m scripts.rebuild_index [--model NAME] [--precision int8d] [--name INDEX]
+       [--data-dir data] [--batch-size 256] [--checkpoint .rebuild_checkpoint.json] [--no-switch]
+       python -m scripts.rebuild_index --rollback
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from backend.app.services.index_alias import get_index_alias
+from backend.app.services.ingestion import iter_sample_items
+from backend.app.services.reindex import mean_recall, rebuild_index
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default=None, help="Embedding model of the new index.")
+    parser.add_argument(
+        "--precision",
+        default=None,
+        help="Index precision (Endee: binary/int8d/int16d/float16/float32; local: int8/float32).",
+    )
+    parser.add_argument("--name", default=None, help="Index name (default: next _v<n>).")
+    parser.add_argument(
+        "--data-dir",
+        type=Path,
+        default=None,
+        help="Backfill from these source files instead of the active index.",
+    )
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument(
+        "--checkpoint",
+        type=Path,
+        default=None,
+        help="Checkpoint file; an interrupted backfill resumes after the last upserted item.",
+    )
+    parser.add_argument(
+        "--no-switch", action="store_true", help="Build and validate, but leave the alias as is."
+    )
+    parser.add_argument(
+        "--rollback", action="store_true", help="Point the alias back at the previous index."
+    )
+    args = parser.parse_args()
+
+    alias = get_index_alias()
+    if args.rollback:
+        version = alias.rollback()
+        print(f"Index alias now points at '{version.name}' (model {version.model_name}).")
+        return
+
+    items = iter_sample_items(args.data_dir) if args.data_dir else None
+    result = rebuild_index(
+        model_name=args.model,
+        precision=args.precision,
+        name=args.name,
+        items=items,
+        batch_size=args.batch_size,
+        checkpoint_path=args.checkpoint,
+        switch=not args.no_switch,
+    )
+    print(
+        f"Built '{result.version.name}': {result.stats.ingested} items "
+        f"in {result.stats.elapsed_seconds:.1f}s."
+    )
+    for label, recall in (("new", result.recall), ("active", result.baseline)):
+        if recall is not None:
+            values = " ".join(f"{typ}={value:.3f}" for typ, value in recall.items())
+            print(f"Recall@k ({label}): mean={mean_recall(recall):.3f} {values}")
+    if result.switched:
+        print(f"Index alias now points at '{result.version.name}'.")
+        return
+    print(f"Alias unchanged: {result.reason}.")
+    if not args.no_switch:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""
+Run the API with several pre-forked workers sharing one copy of the embedding model (Linux/macOS).
+Usage: python -m scripts.run_server_prefork [--host 0.0.0.0] [--port 8000] [--workers 4]
+"""
+
+import argparse
+
+from backend.app.prefork import serve
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Defaults to SERVER_WORKERS from settings."
+    )
+    args = parser.parse_args()
+
+    serve(host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()